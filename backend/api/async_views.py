@@ -0,0 +1,141 @@
+"""
+Native async read endpoints for listings and service offers.
+
+DRF viewsets are synchronous, so under ASGI every request to them is handed
+to a thread through Django's sync adapter. The views here run on the event
+loop instead: rows are fetched with the async ORM (``aiterator``/``aget``)
+through the same eager-loading plan and keyset pagination as the viewsets,
+so serialization touches no database and runs inline. Responses are the
+same JSON the viewsets render, and listing responses share their cache
+entries' invalidation (``api.cache``).
+
+    GET /api/async/listings/          GET /api/async/listings/{id}/
+    GET /api/async/services/          GET /api/async/services/{id}/
+"""
+import time
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException, NotFound, Throttled
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.throttling import BaseThrottle
+
+from core.models.listings import PropertyListing
+from core.models.services import ServiceOffer
+
+from .auth import CachedJWTAuthentication
+from .cache import LIST_GENERATION, acached_response, detail_generation_key
+from .pagination import KeysetPagination
+from .querysets import eager_load, ordering_columns
+from .serializers.listings_serializer import PropertyListingSerializer
+from .serializers.services_serializer import ServiceOfferSerializer
+from .throttling import atake
+
+
+class AsyncReadView(View):
+    """
+    Read-only list (no ``pk``) and detail endpoint for ``model``. Set
+    ``cached`` to serve it through the listing response cache.
+    """
+    http_method_names = ['get', 'head', 'options']
+    model = None
+    serializer_class = None
+    pagination_class = KeysetPagination
+    cached = False
+    replica_reads = True
+    # Only used to pick the throttle bucket; sessions (the browsable API and
+    # the admin) aren't looked up, so session users count as anonymous.
+    authentication_classes = [CachedJWTAuthentication]
+
+    async def get(self, request, pk=None):
+        try:
+            user = await self.authenticate(request)
+        except APIException as exc:
+            return self.error_response(exc)
+        # The buckets ReadThrottle draws from on the viewsets.
+        if user is not None and user.is_authenticated:
+            scope, ident = 'user', user.pk
+        else:
+            scope, ident = 'anon', BaseThrottle().get_ident(request)
+        wait = await atake(scope, ident)
+        if wait:
+            exc = Throttled(wait)
+            response = self.error_response(exc)
+            response['Retry-After'] = str(exc.wait)
+            return response
+        if not self.cached:
+            return await self.respond(request, pk)
+        generation_key = LIST_GENERATION if pk is None else detail_generation_key(pk)
+        return await acached_response(request, generation_key, lambda: self.respond(request, pk))
+
+    async def authenticate(self, request):
+        """
+        The user of the request's bearer token, or None if it has none.
+        Raises ``AuthenticationFailed`` for a bad token, as the viewsets do.
+        """
+        if 'Authorization' not in request.headers:
+            return None
+        api_request = Request(request, authenticators=[auth() for auth in self.authentication_classes])
+        # Usually answered from the token user cache; a miss queries the ORM.
+        return await sync_to_async(lambda: api_request.user)()
+
+    async def respond(self, request, pk):
+        # DRF's Request only for ``query_params`` and serializer context.
+        api_request = Request(request)
+        self.action = 'list' if pk is None else 'retrieve'
+        try:
+            if pk is None:
+                paginator = self.pagination_class()
+                queryset = self.get_queryset(api_request)
+                page = await paginator.apaginate_queryset(queryset, api_request, view=self)
+                return self.render(api_request, page, many=True, wrap=paginator.get_paginated_data)
+            try:
+                instance = await self.get_queryset(api_request).aget(pk=pk)
+            except self.model.DoesNotExist:
+                raise NotFound(f'No {self.model._meta.object_name} matches the given query.')
+            return self.render(api_request, instance)
+        except APIException as exc:
+            return self.error_response(exc)
+
+    def error_response(self, exc):
+        # Same body as DRF's exception handler.
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = HttpResponse(
+            JSONRenderer().render(data), content_type='application/json', status=exc.status_code,
+        )
+        if exc.status_code == 401:
+            response['WWW-Authenticate'] = self.authentication_classes[0]().authenticate_header(None)
+        return response
+
+    def get_queryset(self, request):
+        serializer = self.serializer_class(context=self.get_serializer_context(request))
+        return eager_load(
+            self.model._default_manager.all(), serializer, extra_only=ordering_columns(self)
+        )
+
+    def get_serializer_context(self, request):
+        return {'request': request, 'view': self, 'format': None}
+
+    def render(self, request, instance, many=False, wrap=None):
+        start = time.perf_counter()
+        serializer = self.serializer_class(
+            instance, many=many, context=self.get_serializer_context(request)
+        )
+        data = serializer.data if wrap is None else wrap(serializer.data)
+        body = JSONRenderer().render(data)
+        # Picked up by InstrumentationMiddleware for Server-Timing.
+        request._request._render_seconds = time.perf_counter() - start
+        return HttpResponse(body, content_type='application/json')
+
+
+class ListingReadView(AsyncReadView):
+    model = PropertyListing
+    serializer_class = PropertyListingSerializer
+    cached = True
+
+
+class ServiceOfferReadView(AsyncReadView):
+    model = ServiceOffer
+    serializer_class = ServiceOfferSerializer
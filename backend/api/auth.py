@@ -0,0 +1,109 @@
+"""
+JWT authentication (djangorestframework-simplejwt) with cached users.
+
+    POST /api/token/            {"username" or "email", "password"} -> {"access", "refresh", "user"}
+    POST /api/token/refresh/    {"refresh"} -> {"access", "refresh"}   (rotated; the old one is blacklisted)
+    POST /api/token/blacklist/  {"refresh"}                            (log out)
+
+Access tokens are verified without touching the database. The ``User`` they
+name is then taken from a per-process TTL cache (``settings.AUTH_USER_CACHE``)
+rather than fetched on every request; saving or deleting a user evicts it
+in this process (``api.signals``), other processes see the change within the
+timeout.
+
+The views live in ``api.views.auth_view``: DRF resolves
+``DEFAULT_AUTHENTICATION_CLASSES`` to this module when its views load.
+"""
+import copy
+import threading
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import serializers
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings as jwt_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+from core.models.users import User
+
+from .cache import LocMemBackend
+from .serializers.users_serializer import UserSerializer
+
+_users = None
+_users_lock = threading.Lock()
+
+
+def get_user_cache():
+    global _users
+    if _users is None:
+        with _users_lock:
+            if _users is None:
+                config = getattr(settings, 'AUTH_USER_CACHE', {})
+                _users = LocMemBackend(**config.get('OPTIONS', {}))
+    return _users
+
+
+@receiver(setting_changed)
+def reset_user_cache(setting, **kwargs):
+    global _users
+    if setting == 'AUTH_USER_CACHE':
+        _users = None
+
+
+def evict_user(pk):
+    # Keyed like the token claim, which simplejwt stores as a string.
+    get_user_cache().delete(str(pk))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """``JWTAuthentication`` that resolves token users through the TTL cache."""
+
+    def get_user(self, validated_token):
+        cache = get_user_cache()
+        user_id = validated_token.get(jwt_settings.USER_ID_CLAIM)
+        user = cache.get(str(user_id)) if user_id is not None else None
+        if user is None:
+            user = super().get_user(validated_token)
+            timeout = getattr(settings, 'AUTH_USER_CACHE', {}).get('TIMEOUT', 60)
+            cache.set(str(getattr(user, jwt_settings.USER_ID_FIELD)), user, timeout)
+        else:
+            # The checks super() makes after fetching the user.
+            if jwt_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+                raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+            if jwt_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+                jwt_settings.REVOKE_TOKEN_CLAIM
+            ) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(
+                    _("The user's password has been changed."), code='password_changed'
+                )
+        # Each request gets its own copy to modify.
+        return copy.copy(user)
+
+
+class LoginSerializer(TokenObtainPairSerializer):
+    """
+    Token pair for ``username`` or ``email`` plus ``password``; the response
+    also carries the user, saving the client a ``/users/me/`` round trip.
+    """
+    email = serializers.EmailField(required=False, write_only=True)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields[self.username_field].required = False
+
+    def validate(self, attrs):
+        if not attrs.get(self.username_field):
+            if not attrs.get('email'):
+                raise serializers.ValidationError({self.username_field: [_('This field is required.')]})
+            # Emails aren't unique; an ambiguous one fails like a wrong password.
+            usernames = list(
+                User.objects.filter(email__iexact=attrs['email']).values_list('username', flat=True)[:2]
+            )
+            attrs[self.username_field] = usernames[0] if len(usernames) == 1 else ''
+        data = super().validate(attrs)
+        data['user'] = UserSerializer(self.user).data
+        return data
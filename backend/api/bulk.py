@@ -0,0 +1,232 @@
+"""
+Batch create/update/delete for viewsets, exposed as ``/<resource>/bulk/``.
+
+``POST`` creates, ``PATCH`` partially updates (every item carries its
+``id``) and ``DELETE`` removes (a list of ids). Bodies are JSON arrays or
+NDJSON streams. Items are validated field-by-field in Python first; foreign
+keys are then checked for the whole batch with one query per relation, and
+valid rows are written with ``bulk_create``/``bulk_update`` in chunked
+transactions (created rows one INSERT each on MySQL, which doesn't return
+the ids of a multi-row INSERT). The response reports errors per item index::
+
+    {"created": 9998, "ids": [...], "errors": [{"index": 17, "errors": {...}}]}
+
+Invalid items are skipped unless ``?atomic=1`` is given, in which case any
+error aborts the whole batch before anything is written.
+"""
+from django.db import connection, transaction
+from django.db.models import AutoField
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
+
+from .parsers import NDJSONParser
+
+
+class BulkMixin:
+    """
+    Viewsets set ``bulk_serializer_class`` (a flat write serializer),
+    ``bulk_owner_field`` (set to the requesting user on create and used to
+    scope updates/deletes for non-staff users) and optionally
+    ``bulk_foreign_keys``, a map of ``<field>_id`` to the related model.
+    ``bulk_written(objs, created)`` runs after every chunk, since bulk writes
+    don't send ``post_save``.
+    """
+    bulk_serializer_class = None
+    bulk_owner_field = None
+    bulk_foreign_keys = {}
+    bulk_chunk_size = 500
+    bulk_max_items = 10_000
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk',
+            parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError({'detail': 'Expected a JSON array or NDJSON stream.'})
+        if len(items) > self.bulk_max_items:
+            raise ValidationError({'detail': f'At most {self.bulk_max_items} items per request.'})
+
+        handler = {
+            'POST': self.bulk_create,
+            'PATCH': self.bulk_update,
+            'DELETE': self.bulk_destroy,
+        }[request.method]
+        if self.bulk_atomic(request):
+            with transaction.atomic():
+                return handler(request, items)
+        return handler(request, items)
+
+    def bulk_written(self, objs, created=False):
+        pass
+
+    # -- create ---------------------------------------------------------------
+
+    def bulk_create(self, request, items):
+        valid, errors = self.bulk_validate(items)
+        if errors and self.bulk_atomic(request):
+            return self.bulk_response('created', [], errors)
+
+        model = self.queryset.model
+        owner = {self.bulk_owner_field: request.user}
+        created = []
+        for chunk in self.chunks([model(**data, **owner) for _, data in valid]):
+            with transaction.atomic():
+                if connection.features.can_return_rows_from_bulk_insert:
+                    objs = model.objects.bulk_create(chunk)
+                else:
+                    objs = self.insert_rows(model, chunk)
+                self.bulk_written(objs, created=True)
+            created.extend(objs)
+        return self.bulk_response('created', [obj.pk for obj in created], errors)
+
+    def insert_rows(self, model, objs):
+        """
+        ``bulk_create`` for backends that don't return primary keys from
+        multi-row INSERTs (MySQL): one INSERT per row, which reports its id
+        the way ``Model.save()`` gets it, but without sending ``post_save``.
+        Ids guessed from a multi-row INSERT could belong to rows another
+        request wrote at the same time.
+        """
+        opts = model._meta
+        fields = [field for field in opts.concrete_fields if not isinstance(field, AutoField)]
+        for obj in objs:
+            obj._prepare_related_fields_for_save(operation_name='bulk_create')
+            row, = model._base_manager._insert(
+                [obj], fields=fields, returning_fields=opts.db_returning_fields, using=connection.alias,
+            )
+            for value, field in zip(row, opts.db_returning_fields):
+                setattr(obj, field.attname, value)
+            obj._state.adding = False
+            obj._state.db = connection.alias
+        return objs
+
+    # -- update ---------------------------------------------------------------
+
+    def bulk_update(self, request, items):
+        errors = []
+        ids = []
+        for index, item in enumerate(items):
+            pk = item.get('id') if isinstance(item, dict) else None
+            if not isinstance(pk, int):
+                errors.append({'index': index, 'errors': {'id': ['This field is required.']}})
+            ids.append(pk)
+
+        instances = self.owned_queryset(request).in_bulk([pk for pk in ids if isinstance(pk, int)])
+        for index, pk in enumerate(ids):
+            if isinstance(pk, int) and pk not in instances:
+                errors.append({'index': index, 'errors': {'id': ['Not found.']}})
+        skip = {error['index'] for error in errors}
+
+        valid, validation_errors = self.bulk_validate(items, partial=True, skip=skip)
+        errors = sorted(errors + validation_errors, key=lambda error: error['index'])
+        if errors and self.bulk_atomic(request):
+            return self.bulk_response('updated', [], errors)
+
+        changed = []
+        fields = set()
+        for index, data in valid:
+            instance = instances[ids[index]]
+            for name, value in data.items():
+                setattr(instance, name, value)
+            fields.update(data)
+            changed.append(instance)
+
+        if fields:
+            # bulk_update() doesn't fill in auto_now fields (updated_at) itself.
+            for field in self.queryset.model._meta.concrete_fields:
+                if getattr(field, 'auto_now', False):
+                    for instance in changed:
+                        field.pre_save(instance, add=False)
+                    fields.add(field.name)
+            for chunk in self.chunks(changed):
+                with transaction.atomic():
+                    self.queryset.model.objects.bulk_update(chunk, sorted(fields))
+                    self.bulk_written(chunk)
+        return self.bulk_response('updated', [obj.pk for obj in changed], errors)
+
+    # -- delete ---------------------------------------------------------------
+
+    def bulk_destroy(self, request, items):
+        ids = [item.get('id') if isinstance(item, dict) else item for item in items]
+        owned = self.owned_queryset(request)
+        found = set()
+        for chunk in self.chunks([pk for pk in ids if isinstance(pk, int)]):
+            found.update(owned.filter(pk__in=chunk).values_list('pk', flat=True))
+
+        errors = []
+        for index, pk in enumerate(ids):
+            if not isinstance(pk, int):
+                errors.append({'index': index, 'errors': {'id': ['A valid integer is required.']}})
+            elif pk not in found:
+                errors.append({'index': index, 'errors': {'id': ['Not found.']}})
+        if errors and self.bulk_atomic(request):
+            return self.bulk_response('deleted', [], errors)
+
+        deleted = sorted(found)
+        for chunk in self.chunks(deleted):
+            with transaction.atomic():
+                # Queryset delete still sends post_delete for every row.
+                owned.filter(pk__in=chunk).delete()
+        return self.bulk_response('deleted', deleted, errors)
+
+    # -- helpers --------------------------------------------------------------
+
+    def bulk_validate(self, items, partial=False, skip=()):
+        """
+        Validate ``items`` and return ``([(index, validated_data)], errors)``.
+        """
+        serializer_class = self.bulk_serializer_class
+        context = self.get_serializer_context()
+        valid = []
+        errors = []
+        for index, item in enumerate(items):
+            if index in skip:
+                continue
+            serializer = serializer_class(data=item, partial=partial, context=context)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                errors.append({'index': index, 'errors': serializer.errors})
+
+        # Foreign keys: one existence query per relation for the whole batch.
+        for field, model in self.bulk_foreign_keys.items():
+            wanted = {data[field] for _, data in valid if field in data}
+            if not wanted:
+                continue
+            existing = set(model.objects.filter(pk__in=wanted).values_list('pk', flat=True))
+            still_valid = []
+            for index, data in valid:
+                if field in data and data[field] not in existing:
+                    errors.append({'index': index, 'errors': {field: ['Object does not exist.']}})
+                else:
+                    still_valid.append((index, data))
+            valid = still_valid
+
+        return valid, sorted(errors, key=lambda error: error['index'])
+
+    def owned_queryset(self, request):
+        queryset = self.queryset.model.objects.all()
+        if not request.user.is_staff:
+            queryset = queryset.filter(**{self.bulk_owner_field: request.user})
+        return queryset
+
+    def chunks(self, rows):
+        for start in range(0, len(rows), self.bulk_chunk_size):
+            yield rows[start:start + self.bulk_chunk_size]
+
+    @staticmethod
+    def bulk_atomic(request):
+        return request.query_params.get('atomic') in ('1', 'true')
+
+    @staticmethod
+    def bulk_response(verb, ids, errors):
+        if not errors:
+            code = status.HTTP_201_CREATED if verb == 'created' else status.HTTP_200_OK
+        elif ids:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({verb: len(ids), 'ids': ids, 'errors': errors}, status=code)
@@ -0,0 +1,465 @@
+"""
+Read-through cache of rendered listing responses.
+
+List and detail GETs on ``PropertyListingViewSet`` are stored as the exact
+JSON bytes the renderer produced, together with an ETag and the time they
+were rendered, so a hit costs no ORM or serializer work and conditional
+requests can be answered with 304.
+
+Keys embed a *generation* token: one for all list pages and one per listing.
+The signal handlers in ``api.signals`` replace those tokens once a change to a
+listing or its seller commits, which orphans exactly the affected entries;
+the LRU bound reclaims them.
+
+Concurrent misses on the same entry are coalesced: one request renders it
+while the others wait and share the bytes, so a popular listing falling out
+of the cache costs one query rather than one per waiting request. Within a
+process this is ``SingleFlight``; with a shared backend a short-lived lock
+entry extends it across processes, and waiters poll for the result for at
+most ``LOCK_TIMEOUT`` seconds before rendering it themselves.
+
+Entries are rendered with their reads on ``default`` even where
+``api.replicas`` would use a replica: an entry built from a lagging replica
+would otherwise keep the stale rows for the whole ``TIMEOUT``, long after
+the generation bump that was meant to drop them.
+
+Configured through ``settings.LISTING_CACHE``::
+
+    LISTING_CACHE = {
+        'BACKEND': 'api.cache.LocMemBackend',   # or 'api.cache.RedisBackend'
+        'TIMEOUT': 300,
+        'LOCK_TIMEOUT': 5,
+        'OPTIONS': {'max_entries': 2048},
+    }
+
+``LocMemBackend`` keeps entries and generations per process, so a bump
+only reaches the process that saw the write; with several workers, use
+``RedisBackend`` or a ``TIMEOUT`` short enough to serve stale for.
+"""
+import asyncio
+import hashlib
+import threading
+import time
+import uuid
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.module_loading import import_string
+from rest_framework.response import Response
+
+from .replicas import primary_reads
+
+
+class LocMemBackend:
+    """Per-process LRU cache of ``bytes`` values, bounded by entry count."""
+
+    # Cheap enough to call straight from the event loop in async views.
+    blocking = False
+    # Visible to this process only.
+    shared = False
+
+    def __init__(self, max_entries=2048):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires is not None and expires <= time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        with self._lock:
+            self._store(key, value, timeout)
+
+    def add(self, key, value, timeout=None):
+        """``set`` unless ``key`` holds a live value; returns whether it did."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None and (entry[1] is None or entry[1] > time.monotonic()):
+                return False
+            self._store(key, value, timeout)
+        return True
+
+    def _store(self, key, value, timeout):
+        self._data[key] = (value, time.monotonic() + timeout if timeout else None)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisBackend:
+    """
+    Shared cache on any Redis-protocol server.
+
+    Values are plain string keys with a TTL. Recency is tracked in a sorted
+    set scored by last access time, and the oldest keys are dropped whenever
+    the set grows past ``max_entries``, so the bound holds regardless of the
+    server's ``maxmemory-policy``.
+    """
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='listing-cache:',
+                 max_entries=100_000, client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as exc:
+                raise ImproperlyConfigured(
+                    'api.cache.RedisBackend requires the "redis" package.'
+                ) from exc
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self.lru_key = prefix + '__lru__'
+
+    blocking = True
+    shared = True
+
+    def get(self, key):
+        key = self.prefix + key
+        value = self.client.get(key)
+        if value is not None:
+            self.client.zadd(self.lru_key, {key: time.time()})
+        return value
+
+    def set(self, key, value, timeout=None):
+        key = self.prefix + key
+        pipe = self.client.pipeline()
+        pipe.set(key, value, ex=timeout or None)
+        pipe.zadd(self.lru_key, {key: time.time()})
+        pipe.zcard(self.lru_key)
+        size = pipe.execute()[-1]
+        if size > self.max_entries:
+            self._evict(size - self.max_entries)
+
+    def add(self, key, value, timeout=None):
+        # Used for short-lived locks, so left out of the LRU set.
+        return bool(self.client.set(self.prefix + key, value, ex=timeout or None, nx=True))
+
+    def delete(self, key):
+        key = self.prefix + key
+        pipe = self.client.pipeline()
+        pipe.delete(key)
+        pipe.zrem(self.lru_key, key)
+        pipe.execute()
+
+    def _evict(self, count):
+        oldest = self.client.zrange(self.lru_key, 0, count - 1)
+        if oldest:
+            pipe = self.client.pipeline()
+            pipe.delete(*oldest)
+            pipe.zrem(self.lru_key, *oldest)
+            pipe.execute()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                config = getattr(settings, 'LISTING_CACHE', {})
+                backend_class = import_string(config.get('BACKEND', 'api.cache.LocMemBackend'))
+                _backend = backend_class(**config.get('OPTIONS', {}))
+    return _backend
+
+
+@receiver(setting_changed)
+def reset_backend(setting, **kwargs):
+    global _backend
+    if setting == 'LISTING_CACHE':
+        _backend = None
+
+
+def get_timeout():
+    return getattr(settings, 'LISTING_CACHE', {}).get('TIMEOUT', 300)
+
+
+def get_lock_timeout():
+    return getattr(settings, 'LISTING_CACHE', {}).get('LOCK_TIMEOUT', 5)
+
+
+# -- generations ------------------------------------------------------------
+
+LIST_GENERATION = 'gen:list'
+
+
+def detail_generation_key(pk):
+    return f'gen:detail:{pk}'
+
+
+def current_generation(key):
+    backend = get_backend()
+    generation = backend.get(key)
+    if generation is None:
+        # Concurrent callers must agree on one token to share entries.
+        backend.add(key, uuid.uuid4().hex.encode())
+        generation = backend.get(key)
+    return generation.decode() if isinstance(generation, bytes) else generation
+
+
+def invalidate_listings(pks=()):
+    """
+    Orphan all cached list pages and the detail entries of ``pks`` when the
+    current transaction commits. Bumped any earlier, a request could render
+    the old rows again under the new generation and keep them cached.
+    """
+    pks = list(pks)
+    transaction.on_commit(lambda: bump_generations(pks))
+
+
+def bump_generations(pks):
+    backend = get_backend()
+    backend.delete(LIST_GENERATION)
+    for pk in pks:
+        backend.delete(detail_generation_key(pk))
+
+
+# -- entries ----------------------------------------------------------------
+
+def encode_entry(etag, rendered_at, content_type, body):
+    header = f'{etag}\n{rendered_at}\n{content_type}\n'.encode()
+    return header + body
+
+
+def decode_entry(value):
+    etag, rendered_at, content_type, body = value.split(b'\n', 3)
+    return etag.decode(), int(rendered_at), content_type.decode(), body
+
+
+def not_modified(request, etag, rendered_at):
+    if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+    if if_none_match is not None:
+        return etag in [tag.strip() for tag in if_none_match.split(',')] or if_none_match.strip() == '*'
+    if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return if_modified_since is not None and rendered_at <= if_modified_since
+
+
+def response_key(generation, uri, media_type):
+    variant = f'{uri}|{media_type}'
+    return 'resp:{}:{}'.format(generation, hashlib.sha1(variant.encode()).hexdigest())
+
+
+def store_response(key, content_type, body):
+    """Cache ``body`` under ``key``; returns its ``(etag, rendered_at)``."""
+    etag = '"{}"'.format(hashlib.sha1(body).hexdigest())
+    rendered_at = int(time.time())
+    get_backend().set(key, encode_entry(etag, rendered_at, content_type, body), get_timeout())
+    return etag, rendered_at
+
+
+def build_response(request, etag, rendered_at, content_type, body):
+    if not_modified(request, etag, rendered_at):
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(body, content_type=content_type)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(rendered_at)
+    response['Cache-Control'] = 'no-cache'
+    patch_vary_headers(response, ['Accept'])
+    return response
+
+
+# -- coalescing -------------------------------------------------------------
+
+class SingleFlight:
+    """
+    Collapses concurrent calls for the same key: the first caller runs
+    ``func`` and the others block until it returns and share the result.
+    If it raises, each waiter runs ``func`` itself.
+    """
+
+    def __init__(self):
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, func):
+        """Returns ``(result, shared)``; ``shared`` is true for waiters."""
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = {'done': threading.Event(), 'ok': False, 'result': None}
+        if not leader:
+            call['done'].wait()
+            if call['ok']:
+                return call['result'], True
+            return func(), False
+        try:
+            call['result'] = func()
+            call['ok'] = True
+            return call['result'], False
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call['done'].set()
+
+
+flights = SingleFlight()
+
+
+def fill_entry(key, render):
+    """
+    Render and store the entry for ``key`` unless another process already is,
+    in which case wait for theirs. ``render`` returns ``(content_type, body)``
+    or, for responses that aren't cached, the response itself; that's
+    returned as is, otherwise the encoded entry.
+    """
+    backend = get_backend()
+    lock_key = None
+    if backend.shared:
+        lock_key = key + ':lock'
+        timeout = get_lock_timeout()
+        if not backend.add(lock_key, b'1', timeout):
+            deadline = time.monotonic() + timeout
+            while time.monotonic() < deadline:
+                time.sleep(0.05)
+                entry = backend.get(key)
+                if entry is not None:
+                    return entry
+            lock_key = None
+    try:
+        rendered = render()
+        if not isinstance(rendered, tuple):
+            return rendered
+        content_type, body = rendered
+        etag, rendered_at = store_response(key, content_type, body)
+        return encode_entry(etag, rendered_at, content_type, body)
+    finally:
+        if lock_key is not None:
+            backend.delete(lock_key)
+
+
+class CachedResponseMixin:
+    """
+    Serve ``list`` and ``retrieve`` from the listing response cache.
+
+    Only JSON renderings are cached; the browsable API always goes through
+    the view.
+    """
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(
+            request, LIST_GENERATION, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        pk = kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        return self.cached_response(
+            request, detail_generation_key(pk),
+            lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs),
+        )
+
+    def cached_response(self, request, generation_key, render):
+        if getattr(request.accepted_renderer, 'format', None) != 'json':
+            return render()
+
+        key = response_key(
+            current_generation(generation_key), request.build_absolute_uri(), request.accepted_media_type
+        )
+        cached = get_backend().get(key)
+        if cached is None:
+            cached, shared = flights.do(key, lambda: fill_entry(key, lambda: self.render_entry(request, render)))
+            if not isinstance(cached, bytes):
+                # Only the caller that rendered an uncached response may return it.
+                return render() if shared else cached
+        return build_response(request, *decode_entry(cached))
+
+    def render_entry(self, request, render):
+        """``(content_type, body)`` of the rendered response, or the response if it isn't a 200."""
+        # Entries outlive the replica pin window, so never fill them with a
+        # lagging replica's rows.
+        with primary_reads():
+            response = render()
+        if response.status_code != 200:
+            return response
+
+        if isinstance(response, Response):
+            body = request.accepted_renderer.render(
+                response.data, request.accepted_media_type, self.get_renderer_context()
+            )
+        else:
+            # Already encoded (api.fastpath).
+            body = response.content
+        content_type = request.accepted_media_type
+        if request.accepted_renderer.charset:
+            content_type += f'; charset={request.accepted_renderer.charset}'
+        return content_type, body
+
+
+# Renders in flight on this event loop, by entry key.
+_async_flights = {}
+
+
+async def acached_response(request, generation_key, render):
+    """
+    ``CachedResponseMixin.cached_response`` for async views. ``render`` is a
+    coroutine function returning an ``HttpResponse`` with a JSON body.
+    Blocking backends (Redis) are called from a worker thread.
+    """
+    backend = get_backend()
+
+    async def call(func, *args):
+        if backend.blocking:
+            return await sync_to_async(func, thread_sensitive=False)(*args)
+        return func(*args)
+
+    generation = await call(current_generation, generation_key)
+    key = response_key(generation, request.build_absolute_uri(), 'application/json')
+    cached = await call(backend.get, key)
+    if cached is not None:
+        return build_response(request, *decode_entry(cached))
+
+    # Coalesced with renders of the same entry on this loop only.
+    flight = _async_flights.get(key)
+    if flight is not None and flight.get_loop() is asyncio.get_running_loop():
+        entry = await asyncio.shield(flight)
+        if entry is not None:
+            return build_response(request, *decode_entry(entry))
+        return await render()
+
+    flight = _async_flights[key] = asyncio.get_running_loop().create_future()
+    entry = None
+    try:
+        with primary_reads():
+            response = await render()
+        if response.status_code != 200:
+            return response
+        content_type = response['Content-Type']
+        etag, rendered_at = await call(store_response, key, content_type, response.content)
+        entry = encode_entry(etag, rendered_at, content_type, response.content)
+        return build_response(request, etag, rendered_at, content_type, response.content)
+    finally:
+        if _async_flights.get(key) is flight:
+            del _async_flights[key]
+        flight.set_result(entry)
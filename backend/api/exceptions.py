@@ -0,0 +1,20 @@
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+class SlotUnavailable(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'This viewing slot is already booked.'
+    default_code = 'slot_unavailable'
+
+
+class SyncTokenExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'Sync token expired; sync from scratch.'
+    default_code = 'sync_token_expired'
+
+
+class SimilarIndexUnavailable(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Similar listings are not available yet.'
+    default_code = 'similar_index_unavailable'
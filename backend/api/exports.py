@@ -0,0 +1,23 @@
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import IsAdminUser
+
+from core.exports import FORMATS, stream_export
+
+
+class ExportMixin:
+    """
+    Staff-only ``GET /<resource>/export/?type=csv|ndjson&gzip=1`` streaming
+    the viewset's queryset (see ``core.exports``).
+
+    ``type`` is used rather than ``format``, which DRF reserves for picking
+    a renderer.
+    """
+
+    @action(detail=False, methods=['get'], permission_classes=[IsAdminUser])
+    def export(self, request):
+        export_type = request.query_params.get('type', 'csv')
+        if export_type not in FORMATS:
+            raise ValidationError({'type': f'Choose one of: {", ".join(FORMATS)}.'})
+        compress = request.query_params.get('gzip') in ('1', 'true')
+        return stream_export(self.get_queryset(), format=export_type, compress=compress)
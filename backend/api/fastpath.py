@@ -0,0 +1,229 @@
+"""
+Fast path for read-only, paginated JSON list responses.
+
+``ModelSerializer`` instantiates a model per row and then walks its field
+objects per row. For list pages the work can be planned once per response
+instead: ``compile_serializer`` turns the serializer's (sparse-aware) field
+set into a flat column list for ``values_list()``, joins included, plus a
+row builder that applies the same ``to_representation`` conversions to the
+raw values. Rows are then encoded straight to bytes with orjson when it is
+installed (``json`` otherwise).
+
+The output is byte-for-byte what ``JSONRenderer`` would produce for the
+serializer's data. Serializers the compiler doesn't understand (method
+fields, reverse relations, dotted sources, float values ...) fall back to
+the regular path.
+"""
+import json
+import time
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from django.http import HttpResponse
+from rest_framework import ISO_8601, serializers
+from rest_framework.relations import PrimaryKeyRelatedField
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speed-up
+    orjson = None
+
+# Field types whose ``to_representation`` is the identity for database values.
+IDENTITY_FIELDS = (serializers.IntegerField, serializers.CharField, serializers.BooleanField)
+# Model fields whose values can't be rendered byte-identically without DRF's encoder.
+UNSUPPORTED_MODEL_FIELDS = (models.FloatField,)
+
+
+class RowPlan:
+    """Columns to select and how to build one output object from a row."""
+
+    def __init__(self):
+        self.columns = []
+        self.entries = []
+
+    def column(self, path):
+        if path not in self.columns:
+            self.columns.append(path)
+        return self.columns.index(path)
+
+    def build(self, row):
+        return _build(self.entries, row)
+
+
+def _build(entries, row):
+    data = {}
+    for key, index, convert, nested in entries:
+        value = row[index]
+        if value is None:
+            data[key] = None
+        elif nested is not None:
+            data[key] = _build(nested, row)
+        else:
+            data[key] = convert(value) if convert is not None else value
+    return data
+
+
+def compile_serializer(serializer, plan=None, prefix=''):
+    """
+    Return a ``RowPlan`` rendering rows as ``serializer`` would, or None if
+    some field can't be read from ``values_list()``.
+    """
+    if plan is None:
+        plan = RowPlan()
+    entries = _compile(serializer, plan, prefix)
+    if entries is None:
+        return None
+    plan.entries = entries
+    return plan
+
+
+def _compile(serializer, plan, prefix):
+    meta = getattr(serializer, 'Meta', None)
+    model = getattr(meta, 'model', None)
+    if model is None:
+        return None
+
+    entries = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if field.source == '*' or len(field.source_attrs) != 1:
+            return None
+        try:
+            model_field = model._meta.get_field(field.source_attrs[0])
+        except FieldDoesNotExist:
+            return None
+        if not model_field.concrete or model_field.many_to_many:
+            return None
+        if isinstance(model_field, UNSUPPORTED_MODEL_FIELDS):
+            return None
+        path = prefix + model_field.name
+        index = plan.column(path)
+
+        if isinstance(field, serializers.ListSerializer):
+            return None
+        if isinstance(field, serializers.BaseSerializer):
+            # Forward relation rendered inline: its columns are joined in.
+            if not model_field.is_relation:
+                return None
+            nested = _compile(field, plan, path + '__')
+            if nested is None:
+                return None
+            entries.append((name, index, None, nested))
+        elif isinstance(field, PrimaryKeyRelatedField):
+            if field.pk_field is not None:
+                return None
+            entries.append((name, index, None, None))
+        elif model_field.is_relation:
+            return None
+        elif isinstance(field, serializers.FileField):
+            entries.append((name, index, _file_url(field, model_field), None))
+        elif type(field) is serializers.DateTimeField:
+            entries.append((name, index, _datetime(field), None))
+        elif type(field) in IDENTITY_FIELDS:
+            entries.append((name, index, None, None))
+        else:
+            entries.append((name, index, field.to_representation, None))
+    return entries
+
+
+def _file_url(field, model_field):
+    """``FileField.to_representation`` for a stored file name."""
+    storage = model_field.storage
+    request = field.context.get('request')
+    use_url = getattr(field, 'use_url', api_settings.UPLOADED_FILES_USE_URL)
+
+    def convert(name):
+        if not name:
+            return None
+        if not use_url:
+            return name
+        url = storage.url(name)
+        return request.build_absolute_uri(url) if request is not None else url
+
+    return convert
+
+
+def _datetime(field):
+    """
+    ``DateTimeField.to_representation`` with the output timezone looked up
+    once rather than per value, for the default ISO 8601 format.
+    """
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if output_format is None or output_format.lower() != ISO_8601 or field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if isinstance(value, str) or value.utcoffset() is None:
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+    return convert
+
+
+def json_settings_match():
+    # encode_json mirrors JSONRenderer's default settings only.
+    return api_settings.UNICODE_JSON and api_settings.COMPACT_JSON and api_settings.STRICT_JSON
+
+
+def encode_json(data):
+    """``JSONRenderer().render(data)`` for plain str/int/bool/None/dict/list data."""
+    if orjson is not None:
+        try:
+            body = orjson.dumps(data)
+        except TypeError:
+            # e.g. lone surrogates, which json escapes.
+            body = None
+        if body is not None:
+            return body.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+    text = json.dumps(data, ensure_ascii=False, allow_nan=False, separators=(',', ':'))
+    return text.replace('\u2028', '\\u2028').replace('\u2029', '\\u2029').encode()
+
+
+class FastListMixin:
+    """
+    Serve ``list`` through the fast path when the client gets plain JSON;
+    ``fast_response(queryset, extra)`` is available to other list-like
+    actions. Requires ``KeysetPagination``.
+    """
+
+    def list(self, request, *args, **kwargs):
+        response = self.fast_response(self.filter_queryset(self.get_queryset()))
+        if response is None:
+            return super().list(request, *args, **kwargs)
+        return response
+
+    def fast_response(self, queryset, extra=None):
+        """
+        Render a page of ``queryset`` (plus the ``extra`` top-level keys) as
+        an ``HttpResponse``, or return None if the fast path doesn't apply.
+        """
+        request = self.request
+        renderer = getattr(request, 'accepted_renderer', None)
+        if (
+            getattr(renderer, 'format', None) != 'json'
+            or request.accepted_media_type != 'application/json'
+            or not json_settings_match()
+            or not hasattr(self.paginator, 'get_paginated_data')
+        ):
+            return None
+        plan = compile_serializer(self.get_serializer())
+        if plan is None:
+            return None
+
+        ordering = [field.lstrip('-') for field in getattr(self, 'pagination_ordering', self.paginator.ordering)]
+        columns = plan.columns + [name for name in ordering if name not in plan.columns]
+        rows = self.paginator.paginate_queryset(
+            queryset.values_list(*columns, named=True), request, view=self
+        )
+        start = time.perf_counter()
+        data = self.paginator.get_paginated_data([plan.build(row) for row in rows])
+        if extra:
+            data.update(extra)
+        body = encode_json(data)
+        # Reported as render time by InstrumentationMiddleware.
+        request._request._render_seconds = time.perf_counter() - start
+        return HttpResponse(body, content_type=request.accepted_media_type)
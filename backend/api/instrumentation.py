@@ -0,0 +1,258 @@
+"""
+Per-endpoint query and latency instrumentation.
+
+Every database connection carries one ``execute_wrapper`` that reports to
+the ``QueryRecorder`` of the current request (a context variable, so it
+follows the ORM into ``sync_to_async`` threads under ASGI).
+``InstrumentationMiddleware`` records, per DRF view action
+(``propertylisting.list``, ``booking.create`` ...) or URL name:
+
+* number of queries and time spent in the database,
+* time spent rendering the response body (serializing to JSON),
+* total latency.
+
+They are returned to the client as a ``Server-Timing`` header and
+aggregated in-process for ``metrics_view`` (Prometheus text format).
+
+``settings.QUERY_BUDGETS`` maps endpoints to a maximum query count. Going
+over budget is logged, and raises ``QueryBudgetExceeded`` when
+``settings.QUERY_BUDGETS_STRICT`` is true (it is while running tests), so an
+N+1 regression fails the suite.
+"""
+import hmac
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse, HttpResponseForbidden
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryRecorder:
+    """``execute_wrapper`` callable counting queries and DB time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.seconds += time.perf_counter() - start
+            self.count += 1
+
+
+_recorder = ContextVar('query_recorder', default=None)
+
+
+def record_queries(execute, sql, params, many, context):
+    recorder = _recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_recorder(connection):
+    if record_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_queries)
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    install_recorder(connection)
+
+
+def install_on_open_connections():
+    """For connections opened before this module was imported (``ready()``)."""
+    for connection in connections.all(initialized_only=True):
+        install_recorder(connection)
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.db_seconds = 0.0
+        self.render_seconds = 0.0
+        self.latency_seconds = 0.0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+        self.budget_violations = 0
+
+
+class MetricsRegistry:
+    """Process-local aggregates, keyed by endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._endpoints = {}
+
+    def record(self, endpoint, queries, db_seconds, render_seconds, latency, over_budget):
+        with self._lock:
+            metrics = self._endpoints.setdefault(endpoint, EndpointMetrics())
+            metrics.requests += 1
+            metrics.queries += queries
+            metrics.db_seconds += db_seconds
+            metrics.render_seconds += render_seconds
+            metrics.latency_seconds += latency
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if latency <= bound:
+                    metrics.latency_buckets[i] += 1
+            metrics.budget_violations += int(over_budget)
+
+    def snapshot(self):
+        with self._lock:
+            return {endpoint: vars(metrics).copy() for endpoint, metrics in self._endpoints.items()}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+
+    def render_prometheus(self):
+        lines = []
+
+        def family(name, kind, help_text, samples):
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+            lines.extend(samples)
+
+        snapshot = sorted(self.snapshot().items())
+        simple = [
+            ('http_requests_total', 'counter', 'Requests handled.', 'requests'),
+            ('db_queries_total', 'counter', 'Database queries executed.', 'queries'),
+            ('db_seconds_total', 'counter', 'Time spent in the database.', 'db_seconds'),
+            ('render_seconds_total', 'counter', 'Time spent rendering response bodies.', 'render_seconds'),
+            ('query_budget_violations_total', 'counter', 'Requests over their query budget.',
+             'budget_violations'),
+        ]
+        for name, kind, help_text, key in simple:
+            family(name, kind, help_text, [
+                f'{name}{{endpoint="{endpoint}"}} {metrics[key]}' for endpoint, metrics in snapshot
+            ])
+
+        samples = []
+        for endpoint, metrics in snapshot:
+            for bound, count in zip(LATENCY_BUCKETS, metrics['latency_buckets']):
+                samples.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="{bound}"}} {count}')
+            samples.append(f'http_request_duration_seconds_bucket{{endpoint="{endpoint}",le="+Inf"}} {metrics["requests"]}')
+            samples.append(f'http_request_duration_seconds_sum{{endpoint="{endpoint}"}} {metrics["latency_seconds"]}')
+            samples.append(f'http_request_duration_seconds_count{{endpoint="{endpoint}"}} {metrics["requests"]}')
+        family('http_request_duration_seconds', 'histogram', 'Request latency.', samples)
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def endpoint_name(request):
+    """
+    ``<basename>.<action>`` for DRF viewsets, else the URL name, else
+    ``unresolved``.
+    """
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    func = match.func
+    actions = getattr(func, 'actions', None)
+    basename = getattr(func, 'initkwargs', {}).get('basename')
+    if actions and basename:
+        action = actions.get(request.method.lower())
+        if action:
+            return f'{basename}.{action}'
+    return match.url_name or match.view_name or 'unresolved'
+
+
+class InstrumentationMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder, start)
+
+    async def __acall__(self, request):
+        recorder = QueryRecorder()
+        token = _recorder.set(recorder)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _recorder.reset(token)
+        return self.finish(request, response, recorder, start)
+
+    def finish(self, request, response, recorder, start):
+        latency = time.perf_counter() - start
+        render_seconds = getattr(request, '_render_seconds', 0.0)
+
+        endpoint = endpoint_name(request)
+        budget = getattr(settings, 'QUERY_BUDGETS', {}).get(endpoint)
+        over_budget = budget is not None and recorder.count > budget
+        registry.record(endpoint, recorder.count, recorder.seconds, render_seconds, latency, over_budget)
+
+        response['Server-Timing'] = ', '.join([
+            f'db;dur={recorder.seconds * 1000:.2f};desc="{recorder.count} queries"',
+            f'render;dur={render_seconds * 1000:.2f}',
+            f'total;dur={latency * 1000:.2f}',
+        ])
+
+        if over_budget:
+            message = f'{endpoint} ran {recorder.count} queries (budget {budget})'
+            if getattr(settings, 'QUERY_BUDGETS_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return response
+
+    def process_template_response(self, request, response):
+        # Being first in MIDDLEWARE, this hook runs last, right before the
+        # handler renders the (DRF) response.
+        start = time.perf_counter()
+
+        def rendered(response):
+            request._render_seconds = time.perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition of ``registry``, for staff sessions or
+    ``Authorization: Bearer <settings.METRICS_TOKEN>``. The peer address
+    isn't trusted: behind a reverse proxy every request comes from it.
+    """
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+    authorized = bool(token) and scheme.lower() == 'bearer' and hmac.compare_digest(
+        credentials.strip().encode(), token.encode()
+    )
+    if not (authorized or request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render_prometheus(), content_type='text/plain; version=0.0.4')
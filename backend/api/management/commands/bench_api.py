@@ -0,0 +1,177 @@
+import datetime
+import json
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max, Min
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.models.users import User
+
+from ...urls import router
+from ._bench import summarize
+
+BENCH_USER = 'bench-admin'
+
+
+def sample_ids(queryset, count, rng):
+    """Up to ``count`` primary keys spread over ``queryset``: one query per random probe."""
+    bounds = queryset.aggregate(low=Min('pk'), high=Max('pk'))
+    if bounds['low'] is None:
+        return []
+    ids = set()
+    for _ in range(count):
+        probe = rng.randint(bounds['low'], bounds['high'])
+        ids.add(queryset.filter(pk__gte=probe).order_by('pk').values_list('pk', flat=True).first())
+    return sorted(ids)
+
+
+def router_endpoints(ids, exports=False):
+    """
+    ``(name, [paths])`` for every GET route of the router in ``api/urls.py``.
+    Detail routes cycle through ``ids[basename]`` and are left out without any.
+    """
+    for prefix, viewset, basename in router.registry:
+        pks = ids.get(basename, [])
+        routes = [(f'{basename}-list', False, '')]
+        routes.append((f'{basename}-detail', True, ''))
+        for action in viewset.get_extra_actions():
+            if 'get' not in action.mapping or (action.url_name == 'export' and not exports):
+                continue
+            routes.append((f'{basename}-{action.url_name}', action.detail, f'{action.url_path}/'))
+        for name, detail, suffix in routes:
+            if not detail:
+                yield name, [f'/api/{prefix}/{suffix}']
+            elif pks:
+                yield name, [f'/api/{prefix}/{pk}/{suffix}' for pk in pks]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark every GET endpoint of the API router through the Django test '
+        'client: throughput, latency percentiles and query counts per endpoint, '
+        'written as JSON so runs can be compared (--compare). Run generate_data '
+        'first. Requests authenticate with a JWT for a staff user, created on '
+        'first use.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Timed requests per endpoint.')
+        parser.add_argument('--warmup', type=int, default=10, help='Untimed requests per endpoint first.')
+        parser.add_argument('--sample', type=int, default=50, help='Objects per detail endpoint.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--endpoint', action='append', help='Only endpoints whose name contains this.')
+        parser.add_argument('--anonymous', action='store_true', help='Send no credentials.')
+        parser.add_argument('--exports', action='store_true', help='Include the CSV export endpoints.')
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='Disable the listing response cache so every request hits the database.',
+        )
+        parser.add_argument('--output', help='JSON results file; defaults to bench-api-<timestamp>.json.')
+        parser.add_argument('--compare', help='Earlier results file to print changes against.')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        ids = {
+            basename: sample_ids(viewset.queryset, options['sample'], rng)
+            for _, viewset, basename in router.registry
+        }
+        endpoints = [
+            (name, paths) for name, paths in router_endpoints(ids, options['exports'])
+            if not options['endpoint'] or any(part in name for part in options['endpoint'])
+        ]
+        if not endpoints:
+            raise CommandError('No endpoints selected.')
+
+        client = Client(HTTP_ACCEPT='application/json')
+        if not options['anonymous']:
+            user, _ = User.objects.get_or_create(
+                username=BENCH_USER, defaults={'is_staff': True, 'role': 'buyer'}
+            )
+            client.defaults['HTTP_AUTHORIZATION'] = f'Bearer {AccessToken.for_user(user)}'
+
+        overrides = {'ALLOWED_HOSTS': ['testserver'], 'DEBUG': False, 'READ_THROTTLE': {}}
+        if options['no_cache']:
+            overrides['LISTING_CACHE'] = {'BACKEND': 'api.cache.LocMemBackend', 'OPTIONS': {'max_entries': 0}}
+
+        results = {}
+        with override_settings(**overrides):
+            for name, paths in endpoints:
+                results[name] = run(client, paths, options['requests'], options['warmup'])
+                self.report(name, results[name])
+
+        output = options['output'] or 'bench-api-{}.json'.format(
+            datetime.datetime.now().strftime('%Y%m%d-%H%M%S')
+        )
+        with open(output, 'w') as f:
+            json.dump({
+                'created_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+                'database': connection.vendor,
+                'rows': {basename: viewset.queryset.count() for _, viewset, basename in router.registry},
+                'options': {key: options[key] for key in (
+                    'requests', 'warmup', 'sample', 'seed', 'anonymous', 'no_cache',
+                )},
+                'endpoints': results,
+            }, f, indent=2)
+        self.stdout.write(f'Wrote {output}')
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.compare(json.load(f)['endpoints'], results)
+
+    def report(self, name, result):
+        self.stdout.write(
+            f'  {name:<32} {result["throughput"]:>9.1f} req/s  p50 {result["p50_ms"]:>8.2f} ms  '
+            f'p99 {result["p99_ms"]:>8.2f} ms  queries {result["queries_max"]:>3}  '
+            f'errors {result["errors"]}'
+        )
+
+    def compare(self, before, after):
+        self.stdout.write('Change against --compare (negative latency is faster):')
+        for name, result in after.items():
+            old = before.get(name)
+            if old is None:
+                continue
+            self.stdout.write(
+                f'  {name:<32} throughput {change(old["throughput"], result["throughput"])}  '
+                f'p50 {change(old["p50_ms"], result["p50_ms"])}  '
+                f'p99 {change(old["p99_ms"], result["p99_ms"])}  '
+                f'queries {old["queries_max"]} -> {result["queries_max"]}'
+            )
+
+
+def run(client, paths, requests, warmup):
+    """Time ``requests`` GETs cycling through ``paths``, after ``warmup`` untimed ones."""
+    for i in range(warmup):
+        client.get(paths[i % len(paths)])
+    samples, queries, errors, statuses = [], [], 0, {}
+    start = time.perf_counter()
+    for i in range(requests):
+        with CaptureQueriesContext(connection) as captured:
+            began = time.perf_counter()
+            response = client.get(paths[i % len(paths)])
+            samples.append(time.perf_counter() - began)
+        queries.append(len(captured))
+        errors += response.status_code >= 400
+        statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+    elapsed = time.perf_counter() - start
+
+    result = summarize(samples)
+    result.update({
+        'throughput': round(requests / elapsed, 1) if elapsed else 0.0,
+        'queries_mean': round(sum(queries) / len(queries), 2) if queries else 0.0,
+        'queries_max': max(queries, default=0),
+        'errors': errors,
+        'statuses': {str(status): n for status, n in sorted(statuses.items())},
+    })
+    return result
+
+
+def change(old, new):
+    if not old:
+        return f'{new}'
+    return f'{(new - old) / old:+.1%}'
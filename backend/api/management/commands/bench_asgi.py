@@ -0,0 +1,254 @@
+import asyncio
+import io
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test.utils import override_settings
+
+from core.models.listings import PropertyListing
+from core.synthetic import add_confirm_argument, confirm_writes, create_listings, create_users
+
+from ._bench import summarize
+
+HOST = 'testserver'
+
+# (label, server, list path, detail path prefix)
+SCENARIOS = [
+    ('WSGI, sync views', 'wsgi', '/api/listings/', '/api/listings/'),
+    ('ASGI, sync views', 'asgi', '/api/listings/', '/api/listings/'),
+    ('ASGI, async views', 'asgi', '/api/async/listings/', '/api/async/listings/'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Load-test the listing read endpoints: sync views under WSGI, the same '
+        'views under ASGI, and the async views under ASGI, with many concurrent '
+        'clients. Runs the handlers in-process unless --wsgi-url/--asgi-url point '
+        'at running servers (e.g. gunicorn and uvicorn). Writes to the configured '
+        'database, which requires --yes, unless --skip-generate is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--skip-generate', action='store_true')
+        add_confirm_argument(parser)
+        parser.add_argument('--concurrency', type=int, default=1000, help='Concurrent clients.')
+        parser.add_argument('--requests', type=int, default=20_000, help='Requests per scenario.')
+        parser.add_argument(
+            '--wsgi-threads', type=int, default=32,
+            help='Worker threads serving the in-process WSGI handler.',
+        )
+        parser.add_argument('--wsgi-url', help='Base URL of a running WSGI server.')
+        parser.add_argument('--asgi-url', help='Base URL of a running ASGI server.')
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='Disable the listing response cache so every request hits the database.',
+        )
+
+    def handle(self, *args, **options):
+        if not options['skip_generate']:
+            confirm_writes(options)
+            seller_ids = create_users(max(1, options['listings'] // 20), 'seller', seed=options['seed'])
+            create_listings(options['listings'], seller_ids, seed=options['seed'],
+                            batch_size=options['batch_size'])
+        ids = list(PropertyListing.objects.values_list('id', flat=True))
+        if not ids:
+            self.stderr.write('No listings to request.')
+            return
+
+        overrides = {'ALLOWED_HOSTS': [HOST, 'localhost', '127.0.0.1'], 'DEBUG': False}
+        if options['no_cache']:
+            overrides['LISTING_CACHE'] = {'BACKEND': 'api.cache.LocMemBackend', 'OPTIONS': {'max_entries': 0}}
+
+        self.stdout.write(
+            f'{options["requests"]} requests per scenario, {options["concurrency"]} concurrent clients, '
+            f'{len(ids)} listings (half list pages, half detail)'
+        )
+        rng = random.Random(options['seed'])
+        with override_settings(**overrides):
+            for label, server, list_path, detail_path in SCENARIOS:
+                paths = [
+                    list_path if rng.random() < 0.5 else f'{detail_path}{rng.choice(ids)}/'
+                    for _ in range(options['requests'])
+                ]
+                url = options[f'{server}_url']
+                if url:
+                    client = lambda url=url: external_client(url)
+                elif server == 'wsgi':
+                    client = lambda: wsgi_client(options['wsgi_threads'])
+                else:
+                    client = asgi_client
+                with persistent_connections(server == 'wsgi'):
+                    elapsed, samples, errors = asyncio.run(
+                        run_load(client, paths, options['concurrency'])
+                    )
+                result = summarize(samples)
+                self.stdout.write(
+                    f'  {label:<20} {len(paths) / elapsed:>9.1f} req/s  '
+                    f'p50 {result["p50_ms"]:>9.2f} ms  p99 {result["p99_ms"]:>9.2f} ms  errors {errors}'
+                )
+
+
+async def run_load(client, paths, concurrency):
+    """
+    Issue ``paths`` from ``concurrency`` clients, each sending its next
+    request as soon as the previous one completes. ``client()`` returns a
+    ``(send, close)`` pair. Returns the wall time, per-request latencies and
+    the number of non-200 responses.
+    """
+    send, close = client()
+    queue = iter(paths)
+    samples = []
+    errors = 0
+
+    async def worker():
+        nonlocal errors
+        for path in queue:
+            start = time.perf_counter()
+            status = await send(path)
+            samples.append(time.perf_counter() - start)
+            errors += status != 200
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    finally:
+        close()
+    return time.perf_counter() - start, samples, errors
+
+
+@contextmanager
+def persistent_connections(enabled):
+    # Under ASGI every request's ORM calls get a fresh thread, so persistent
+    # connections would accumulate; Django recommends turning them off.
+    settings_dict = connections.settings['default']
+    saved = settings_dict.get('CONN_MAX_AGE', 0)
+    if not enabled:
+        settings_dict['CONN_MAX_AGE'] = 0
+    try:
+        yield
+    finally:
+        settings_dict['CONN_MAX_AGE'] = saved
+
+
+def wsgi_client(threads):
+    """Requests queue for a fixed pool of threads, like a threaded WSGI server."""
+    handler = WSGIHandler()
+    pool = ThreadPoolExecutor(max_workers=threads)
+
+    def call(path):
+        status = []
+        environ = {
+            'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': '', 'SCRIPT_NAME': '',
+            'SERVER_NAME': HOST, 'SERVER_PORT': '80', 'SERVER_PROTOCOL': 'HTTP/1.1',
+            'HTTP_HOST': HOST, 'HTTP_ACCEPT': 'application/json', 'REMOTE_ADDR': '127.0.0.1',
+            'wsgi.version': (1, 0), 'wsgi.url_scheme': 'http', 'wsgi.input': io.BytesIO(),
+            'wsgi.errors': io.StringIO(), 'wsgi.multithread': True, 'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        body = handler(environ, lambda line, headers: status.append(int(line.split()[0])))
+        for _ in body:
+            pass
+        body.close()
+        return status[0]
+
+    async def send(path):
+        return await asyncio.get_running_loop().run_in_executor(pool, call, path)
+
+    return send, pool.shutdown
+
+
+def asgi_client():
+    handler = ASGIHandler()
+
+    async def send(path):
+        finished = asyncio.Event()
+        received = False
+        status = None
+
+        async def receive():
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def reply(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif not message.get('more_body'):
+                finished.set()
+
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': path, 'raw_path': path.encode(), 'query_string': b'',
+            'root_path': '', 'headers': [(b'host', HOST.encode()), (b'accept', b'application/json')],
+            'client': ('127.0.0.1', 0), 'server': (HOST, 80),
+        }
+        await handler(scope, receive, reply)
+        return status
+
+    return send, lambda: None
+
+
+def external_client(base_url):
+    """
+    Minimal keep-alive HTTP/1.1 client: one connection per concurrent
+    client, so the server sees ``--concurrency`` open connections.
+    """
+    parts = urlsplit(base_url)
+    host, port = parts.hostname, parts.port or 80
+    prefix = parts.path.rstrip('/')
+    idle = []
+    opened = []
+
+    async def send(path):
+        if idle:
+            reader, writer = idle.pop()
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+            opened.append(writer)
+        writer.write(
+            f'GET {prefix}{path} HTTP/1.1\r\nHost: {parts.netloc}\r\n'
+            f'Accept: application/json\r\n\r\n'.encode()
+        )
+        await writer.drain()
+
+        status = int((await reader.readline()).split()[1])
+        headers = {}
+        while (line := await reader.readline()) not in (b'\r\n', b''):
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip().lower()
+        if 'content-length' in headers:
+            await reader.readexactly(int(headers['content-length']))
+        elif headers.get('transfer-encoding') == 'chunked':
+            while size := int((await reader.readline()).split(b';')[0], 16):
+                await reader.readexactly(size + 2)
+            await reader.readline()
+        else:
+            await reader.read()
+            headers['connection'] = 'close'
+
+        if headers.get('connection') == 'close':
+            writer.close()
+        else:
+            idle.append((reader, writer))
+        return status
+
+    def close():
+        for writer in opened:
+            writer.close()
+
+    return send, close
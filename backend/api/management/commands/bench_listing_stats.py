@@ -0,0 +1,67 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from core import analytics
+from core.models.listings import PropertyListing
+from core.synthetic import add_confirm_argument, confirm_writes, create_listings, create_users
+
+from ._bench import summarize
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark /api/listings/stats/ (core/analytics.py): the time to load '
+        'the listing columns and compute the statistics, then request latency '
+        'while the results are cached. Generates --listings synthetic listings '
+        'first unless --skip-generate; writes to the configured database, so '
+        'point it at a scratch one and pass --yes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=1_000_000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=200, help='Requests per measurement.')
+        parser.add_argument('--skip-generate', action='store_true', help='Reuse the listings in the database.')
+        add_confirm_argument(parser)
+
+    def handle(self, *args, **options):
+        if not options['skip_generate']:
+            confirm_writes(options)
+            start = time.perf_counter()
+            seller_ids = create_users(max(1, options['listings'] // 20), 'seller', seed=options['seed'])
+            create_listings(options['listings'], seller_ids, seed=options['seed'], batch_size=options['batch_size'])
+            self.stdout.write(f'Created {options["listings"]} listings in {time.perf_counter() - start:.1f}s')
+
+        start = time.perf_counter()
+        columns = analytics.load_columns(PropertyListing.objects.all())
+        loaded = time.perf_counter() - start
+        start = time.perf_counter()
+        analytics.compute_stats()
+        self.stdout.write(
+            f'{len(columns)} listings: columns loaded in {loaded * 1000:.0f} ms, '
+            f'statistics (load included) computed in {(time.perf_counter() - start) * 1000:.0f} ms'
+        )
+
+        client = Client(HTTP_ACCEPT='application/json')
+        settings = {**analytics.get_config(), 'TTL': 3600}
+        with override_settings(ALLOWED_HOSTS=['testserver'], READ_THROTTLE={}, LISTING_ANALYTICS=settings):
+            samples = []
+            for _ in range(options['repeat'] + 1):
+                start = time.perf_counter()
+                response = client.get('/api/listings/stats/')
+                samples.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise CommandError(f'/stats/ returned {response.status_code}')
+        self.stdout.write(f'  {"first GET (computes)":<24} {samples[0] * 1000:>8.2f} ms')
+        self.report('GET /stats/ (cached)', samples[1:])
+
+    def report(self, name, samples):
+        result = summarize(samples)
+        self.stdout.write(
+            f'  {name:<24} p50 {result["p50_ms"]:>8.2f} ms  p95 {result["p95_ms"]:>8.2f} ms  '
+            f'p99 {result["p99_ms"]:>8.2f} ms'
+        )
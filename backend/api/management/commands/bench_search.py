@@ -0,0 +1,65 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models.listings import PropertyListing
+from core.synthetic import (
+    add_confirm_argument, confirm_writes, create_listings, create_users, index_new_listings,
+)
+
+from ._bench import time_get
+
+SCENARIOS = [
+    ('price range', '/api/listings/search/?min_price=250000&max_price=400000'),
+    ('bedrooms + bathrooms', '/api/listings/search/?min_bedrooms=3&max_bedrooms=4&min_bathrooms=2'),
+    ('single term', '/api/listings/search/?q=garden'),
+    ('terms + range', '/api/listings/search/?q=riverside+pool&max_price=500000'),
+    ('no filters (facets over all rows)', '/api/listings/search/'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark /api/listings/search/ over a synthetic dataset. '
+        'Writes to the configured database, so it requires --yes unless '
+        '--skip-generate is given; point it at a scratch schema.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=1_000_000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--skip-generate', action='store_true',
+            help='Reuse the listings already in the database.',
+        )
+        add_confirm_argument(parser)
+
+    def handle(self, *args, **options):
+        if not options['skip_generate']:
+            confirm_writes(options)
+            self.generate(options)
+
+        total = PropertyListing.objects.count()
+        self.stdout.write(f'Benchmarking search over {total} listings ({options["repeat"]} runs each)')
+        for name, url in SCENARIOS:
+            result = time_get(url, options['repeat'])
+            self.stdout.write(
+                f'  {name:<36} p50 {result["p50_ms"]:>9.2f} ms  '
+                f'p95 {result["p95_ms"]:>9.2f} ms  queries {result["queries"]}'
+            )
+
+    def generate(self, options):
+        count, seed, batch_size = options['listings'], options['seed'], options['batch_size']
+        last_id = PropertyListing.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+        start = time.perf_counter()
+        seller_ids = create_users(max(1, count // 20), 'seller', seed=seed, batch_size=batch_size)
+        create_listings(count, seller_ids, seed=seed, batch_size=batch_size)
+        self.stdout.write(f'Created {count} listings in {time.perf_counter() - start:.1f}s')
+
+        # bulk_create skips the post_save handler, so index the new rows here.
+        start = time.perf_counter()
+        index_new_listings(last_id, batch_size)
+        self.stdout.write(f'Indexed {count} listings in {time.perf_counter() - start:.1f}s')
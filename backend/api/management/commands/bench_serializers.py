@@ -0,0 +1,104 @@
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory
+
+from core.models.bookings import Booking
+from core.models.listings import PropertyListing
+from core.synthetic import (
+    add_confirm_argument, confirm_writes, create_bookings, create_listings, create_users,
+)
+
+from ...fastpath import compile_serializer, encode_json
+from ...querysets import eager_load
+from ...serializers.bookings_serializer import BookingSerializer
+from ...serializers.listings_serializer import PropertyListingSerializer
+
+MODELS = {
+    'listing': (PropertyListing, PropertyListingSerializer),
+    'booking': (Booking, BookingSerializer),
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare ModelSerializer + JSONRenderer with the values_list() fast path '
+        '(api/fastpath.py) when rendering N rows, and check the bytes match. '
+        'Writes to the configured database, so it requires --yes unless '
+        '--skip-generate is given; point it at a scratch schema.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', default='1000,10000,100000', help='Comma-separated row counts.')
+        parser.add_argument('--model', choices=sorted(MODELS), action='append')
+        parser.add_argument('--repeat', type=int, default=3, help='Best of N runs.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--skip-generate', action='store_true')
+        add_confirm_argument(parser)
+
+    def handle(self, *args, **options):
+        counts = sorted(int(value) for value in options['rows'].split(','))
+        if not options['skip_generate']:
+            confirm_writes(options)
+            self.generate(counts[-1], options['seed'])
+
+        # Absolute URLs need a request in the serializer context.
+        request = APIRequestFactory().get('/api/')
+        with override_settings(ALLOWED_HOSTS=['testserver']):
+            for name in options['model'] or sorted(MODELS):
+                model, serializer_class = MODELS[name]
+                available = model.objects.count()
+                for count in counts:
+                    if count > available:
+                        raise CommandError(f'Only {available} {name} rows; drop --skip-generate.')
+                    self.compare(name, model, serializer_class, request, count, options['repeat'])
+
+    def compare(self, name, model, serializer_class, request, count, repeat):
+        context = {'request': request}
+
+        def drf():
+            queryset = eager_load(model.objects.order_by('id'), serializer_class(context=context))
+            rows = serializer_class(list(queryset[:count]), many=True, context=context).data
+            return JSONRenderer().render(rows)
+
+        def fast():
+            plan = compile_serializer(serializer_class(context=context))
+            rows = model.objects.order_by('id').values_list(*plan.columns)[:count]
+            return encode_json([plan.build(row) for row in rows])
+
+        drf_seconds, drf_body = best_of(drf, repeat)
+        fast_seconds, fast_body = best_of(fast, repeat)
+        if drf_body != fast_body:
+            raise CommandError(f'{name} x {count}: fast path output differs from the serializer.')
+        self.stdout.write(
+            f'  {name:<8} {count:>7} rows  serializer {drf_seconds * 1000:>9.1f} ms  '
+            f'fast path {fast_seconds * 1000:>8.1f} ms  x{drf_seconds / fast_seconds:.1f}  '
+            f'({len(fast_body) / 1024:.0f} KiB, identical)'
+        )
+
+    def generate(self, count, seed):
+        missing = count - PropertyListing.objects.count()
+        if missing > 0:
+            sellers = create_users(max(1, count // 20), 'seller', seed=seed)
+            create_listings(missing, sellers, seed=seed)
+        missing = count - Booking.objects.count()
+        if missing > 0:
+            buyers = create_users(max(1, count // 10), 'buyer', seed=seed)
+            listings = list(PropertyListing.objects.values_list('id', flat=True))
+            # Start after existing bookings' dates so new slots don't collide.
+            last = Booking.objects.order_by('-scheduled_date').values_list('scheduled_date', flat=True).first()
+            start = last + datetime.timedelta(days=1) if last else None
+            create_bookings(missing, buyers, listings, seed=seed, start=start)
+
+
+def best_of(func, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
@@ -0,0 +1,84 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test import Client
+from django.test.utils import override_settings
+
+from core import similar
+from core.models.listings import PropertyListing
+from core.synthetic import add_confirm_argument, confirm_writes, create_listings, create_users
+
+from ._bench import summarize
+from .bench_api import sample_ids
+
+
+class Command(BaseCommand):
+    help = (
+        'Benchmark the "similar listings" index (core/similar.py): build time, '
+        'index size, top-k latency in-process and through '
+        '/api/listings/{id}/similar/. Generates --listings synthetic listings '
+        'first unless --skip-generate; writes to the configured database and '
+        "to SIMILAR_LISTINGS['PATH'], so point both at scratch locations "
+        'and pass --yes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=100_000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=200, help='Queries per measurement.')
+        parser.add_argument('--k', type=int, default=10)
+        parser.add_argument('--skip-generate', action='store_true', help='Reuse the listings in the database.')
+        add_confirm_argument(parser)
+        parser.add_argument('--skip-build', action='store_true', help='Reuse the index already built.')
+
+    def handle(self, *args, **options):
+        if similar.get_config()['PATH'] is None:
+            raise CommandError("SIMILAR_LISTINGS['PATH'] is not set.")
+        if not options['skip_generate']:
+            confirm_writes(options)
+            start = time.perf_counter()
+            seller_ids = create_users(max(1, options['listings'] // 20), 'seller', seed=options['seed'])
+            create_listings(options['listings'], seller_ids, seed=options['seed'], batch_size=options['batch_size'])
+            self.stdout.write(f'Created {options["listings"]} listings in {time.perf_counter() - start:.1f}s')
+        if not options['skip_build']:
+            start = time.perf_counter()
+            count = similar.build(batch_size=options['batch_size'])
+            self.stdout.write(f'Built the index of {count} listings in {time.perf_counter() - start:.1f}s')
+
+        vectors, ids = similar.get_index()
+        self.stdout.write(
+            f'Index: {vectors.shape[0]} rows x {vectors.shape[1]} float32 columns, '
+            f'{(vectors.nbytes + ids.nbytes) / 2 ** 20:.1f} MiB memory-mapped'
+        )
+        ids = sample_ids(PropertyListing.objects.all(), min(options['repeat'], 100), random.Random(options['seed']))
+        listings = list(PropertyListing.objects.filter(pk__in=ids).only(*similar.FEATURE_FIELDS))
+        if not listings:
+            raise CommandError('No listings to query.')
+
+        k, repeat = options['k'], options['repeat']
+        samples = []
+        for i in range(repeat):
+            start = time.perf_counter()
+            similar.similar_to(listings[i % len(listings)], k)
+            samples.append(time.perf_counter() - start)
+        self.report(f'top-{k} in-process', samples)
+
+        client = Client(HTTP_ACCEPT='application/json')
+        samples = []
+        with override_settings(ALLOWED_HOSTS=['testserver'], READ_THROTTLE={}):
+            for i in range(repeat):
+                start = time.perf_counter()
+                response = client.get(f'/api/listings/{listings[i % len(listings)].pk}/similar/?k={k}')
+                samples.append(time.perf_counter() - start)
+                if response.status_code != 200:
+                    raise CommandError(f'/similar/ returned {response.status_code}')
+        self.report(f'GET /similar/?k={k}', samples)
+
+    def report(self, name, samples):
+        result = summarize(samples)
+        self.stdout.write(
+            f'  {name:<24} p50 {result["p50_ms"]:>8.2f} ms  p95 {result["p95_ms"]:>8.2f} ms  '
+            f'p99 {result["p99_ms"]:>8.2f} ms'
+        )
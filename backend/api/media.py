@@ -0,0 +1,173 @@
+"""
+Delivery of uploaded files (``MEDIA_URL``) from ``HashedFileSystemStorage``.
+
+Files with a content hash in their name (see ``core/storage.py``) are sent
+with ``Cache-Control: public, max-age=31536000, immutable`` and the hash as
+their ETag, so browsers and CDNs keep them for a year without revalidating;
+other files get ``MAX_AGE`` and an ETag from their size and mtime.
+``If-None-Match``/``If-Modified-Since`` are answered with 304 and a single
+``Range`` (with ``If-Range``) with 206; multi-range requests get the whole
+file.
+
+``settings.MEDIA_DELIVERY['OFFLOAD']`` picks who moves the bytes:
+
+* ``'x-accel-redirect'``: nginx, through an ``internal`` location at
+  ``ACCEL_PREFIX`` aliased to ``MEDIA_ROOT``. Django only checks the file
+  and sets the headers; nginx handles ranges and sends the file with
+  ``sendfile``.
+* ``'x-sendfile'``: the same for Apache ``mod_xsendfile`` and lighttpd,
+  which take the absolute path.
+* ``None`` (the dev server, or no proxy): Django sends it. Whole files go
+  through ``FileResponse`` and so ``wsgi.file_wrapper``, which gunicorn and
+  uWSGI implement with ``sendfile``; ranges are sliced from a read-only
+  ``mmap`` of the file, which reads only the pages asked for.
+
+With a remote storage (``core.storage.S3Storage``) the file URLs point at
+the bucket or its CDN and this view only redirects there.
+"""
+import mimetypes
+import mmap
+import os
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+from django.views.decorators.http import require_safe
+
+from core.storage import HASHED_NAME, IMMUTABLE_CACHE_CONTROL
+
+DEFAULTS = {
+    'OFFLOAD': None,
+    'ACCEL_PREFIX': '/protected-media/',
+    'MAX_AGE': 3600,
+    'CHUNK_SIZE': 256 * 1024,
+}
+OFFLOADS = (None, 'x-accel-redirect', 'x-sendfile')
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, 'MEDIA_DELIVERY', {})}
+    if config['OFFLOAD'] not in OFFLOADS:
+        raise ValueError(f"MEDIA_DELIVERY['OFFLOAD'] must be one of {OFFLOADS}.")
+    return config
+
+
+def parse_range(header, size):
+    """
+    The inclusive ``(first, last)`` byte positions requested by the
+    ``Range`` header ``header`` of a ``size``-byte file, or None to send the
+    whole file (no header, a malformed one, or several ranges). Raises
+    ``RangeNotSatisfiable`` when the range lies past the end of the file.
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, dash, last = header[len('bytes='):].strip().partition('-')
+    if not dash or not (first + last).isdigit():
+        return None
+    if not first:
+        # ``bytes=-N``: the last N bytes.
+        suffix = int(last)
+        if suffix == 0 or size == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - suffix), size - 1
+    first, last = int(first), int(last) if last else None
+    if last is not None and last < first:
+        return None
+    if first >= size:
+        raise RangeNotSatisfiable
+    return first, size - 1 if last is None else min(last, size - 1)
+
+
+def file_etag(name, st):
+    match = HASHED_NAME.search(name)
+    if match:
+        return quote_etag(match.group(1))
+    return quote_etag(f'{st.st_mtime_ns:x}-{st.st_size:x}')
+
+
+class MappedRange:
+    """Bytes ``first``..``last`` of an open file, read through a read-only mmap."""
+
+    def __init__(self, file, first, last, chunk_size):
+        self.file = file
+        self.map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.first, self.end = first, last + 1
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        for start in range(self.first, self.end, self.chunk_size):
+            yield self.map[start:min(start + self.chunk_size, self.end)]
+
+    def close(self):
+        self.map.close()
+        self.file.close()
+
+
+@require_safe
+def serve_media(request, path):
+    if not isinstance(default_storage, FileSystemStorage):
+        return HttpResponseRedirect(default_storage.url(path))
+    config = get_config()
+    try:
+        full_path = default_storage.path(path)
+        st = os.stat(full_path)
+    except (SuspiciousFileOperation, FileNotFoundError, NotADirectoryError):
+        raise Http404('No such file.')
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404('No such file.')
+
+    etag = file_etag(path, st)
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(st.st_mtime),
+        'Cache-Control': (
+            IMMUTABLE_CACHE_CONTROL if HASHED_NAME.search(path)
+            else f'public, max-age={config["MAX_AGE"]}'
+        ),
+    }
+    not_modified = get_conditional_response(request, etag=etag, last_modified=int(st.st_mtime))
+    if not_modified is not None:
+        for header, value in headers.items():
+            not_modified.headers.setdefault(header, value)
+        return not_modified
+
+    content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+    if config['OFFLOAD'] == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['X-Accel-Redirect'] = config['ACCEL_PREFIX'].rstrip('/') + '/' + quote(path)
+        return response
+    if config['OFFLOAD'] == 'x-sendfile':
+        response = HttpResponse(content_type=content_type, headers=headers)
+        response['X-Sendfile'] = full_path
+        return response
+
+    headers['Accept-Ranges'] = 'bytes'
+    try:
+        byte_range = parse_range(request.headers.get('Range'), st.st_size)
+    except RangeNotSatisfiable:
+        headers['Content-Range'] = f'bytes */{st.st_size}'
+        return HttpResponse(status=416, headers=headers)
+    if_range = request.headers.get('If-Range')
+    if byte_range is not None and if_range and if_range != etag and (
+        parse_http_date_safe(if_range) != int(st.st_mtime)
+    ):
+        byte_range = None
+
+    if byte_range is None:
+        return FileResponse(open(full_path, 'rb'), content_type=content_type, headers=headers)
+    first, last = byte_range
+    headers['Content-Range'] = f'bytes {first}-{last}/{st.st_size}'
+    headers['Content-Length'] = str(last - first + 1)
+    return StreamingHttpResponse(
+        MappedRange(open(full_path, 'rb'), first, last, config['CHUNK_SIZE']),
+        status=206, content_type=content_type, headers=headers,
+    )
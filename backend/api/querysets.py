@@ -0,0 +1,128 @@
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+from .pagination import KeysetPagination
+
+
+class LoadPlan:
+    """
+    The relations and columns a serializer needs, expressed in ORM terms.
+
+    ``only`` is dropped (set to None) as soon as one field cannot be mapped to
+    a concrete column, e.g. a ``SerializerMethodField`` or a dotted source;
+    in that case the whole row is loaded and only the joins are applied.
+    """
+
+    def __init__(self):
+        self.select_related = []
+        self.prefetch_related = []
+        self.only = []
+
+    def add_column(self, path):
+        if self.only is not None and path not in self.only:
+            self.only.append(path)
+
+    def apply(self, queryset):
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.only:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+
+def _nested_model(field):
+    meta = getattr(field, 'Meta', None)
+    return getattr(meta, 'model', None)
+
+
+def build_plan(serializer, plan=None, prefix=''):
+    """
+    Walk ``serializer.fields`` and collect the joins and columns it reads.
+
+    Forward foreign keys rendered by a nested serializer become
+    ``select_related`` paths (and are walked recursively so that e.g.
+    ``property__seller`` is joined too); reverse and many-to-many relations
+    become ``Prefetch`` objects with their own eager-loaded queryset.
+    """
+    if plan is None:
+        plan = LoadPlan()
+    model = serializer.Meta.model
+
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*' or len(field.source_attrs) != 1:
+            plan.only = None
+            continue
+
+        name = field.source_attrs[0]
+        try:
+            model_field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # A model property or method; we can't tell which columns it reads.
+            plan.only = None
+            continue
+
+        path = prefix + name
+        child = field.child if isinstance(field, serializers.ListSerializer) else field
+        nested_model = _nested_model(child)
+
+        if nested_model is not None and model_field.concrete and not model_field.many_to_many:
+            # Forward FK / one-to-one rendered inline: join it in the same query.
+            plan.select_related.append(path)
+            plan.add_column(path)
+            build_plan(child, plan, prefix=path + '__')
+        elif nested_model is not None:
+            # Reverse FK or M2M rendered inline: one extra query per relation.
+            related_queryset = nested_model._default_manager.all()
+            if model_field.one_to_many:
+                related_queryset = eager_load(
+                    related_queryset, child, extra_only=[model_field.field.name]
+                )
+            else:
+                related_queryset = eager_load(related_queryset, child)
+            plan.prefetch_related.append(Prefetch(path, queryset=related_queryset))
+        elif model_field.many_to_many or model_field.one_to_many:
+            plan.prefetch_related.append(path)
+        else:
+            plan.add_column(path)
+
+    return plan
+
+
+def eager_load(queryset, serializer, extra_only=()):
+    """
+    Return ``queryset`` with the joins and column restrictions ``serializer``
+    needs to render every row without further queries.
+
+    ``serializer`` may be a serializer class or an (unbound) instance; pass an
+    instance when the field set depends on the request.
+    """
+    if isinstance(serializer, type):
+        serializer = serializer()
+    plan = build_plan(serializer)
+    if plan.only is not None:
+        for path in extra_only:
+            plan.add_column(path)
+    return plan.apply(queryset)
+
+
+def ordering_columns(view):
+    """Columns keyset pagination reads from each row of ``view``'s pages."""
+    ordering = getattr(view, 'pagination_ordering', KeysetPagination.ordering)
+    return [field.lstrip('-') for field in ordering]
+
+
+class EagerLoadingMixin:
+    """
+    Viewset mixin that eager-loads ``get_queryset()`` according to the
+    serializer used for the current action (and request, see
+    ``api.serializers.sparse``).
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        return eager_load(queryset, self.get_serializer(), extra_only=ordering_columns(self))
@@ -0,0 +1,147 @@
+"""
+Read-replica routing.
+
+``ReplicaRoutingMiddleware`` tracks the current request, and
+``ReplicaRouter`` sends the reads of safe-method (GET/HEAD/OPTIONS)
+requests to views with ``replica_reads = True`` to one of
+``settings.REPLICA_DATABASES``. Everything else uses ``default``.
+
+Read-your-writes:
+
+* within a request, the first write pins all later reads to ``default``;
+* after an unsafe request the client gets a short-lived cookie
+  (``settings.REPLICA_PIN_SECONDS``) that keeps its next reads on
+  ``default`` while replicas catch up.
+
+Reads inside ``primary_reads()`` also go to ``default``. Responses stored
+in the listing cache (api/cache.py) are rendered that way: they outlive the
+pin window, so they mustn't be filled from a replica that is still behind.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+
+PIN_COOKIE = 'pin_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class RoutingState:
+    def __init__(self, request):
+        self.request = request
+        self.replica = None
+        self.pinned = False
+        self.primary_only = 0
+        self.resolved = False
+
+    def choose_replica(self):
+        # Decided on the first read after URL resolution has picked the view;
+        # earlier reads (e.g. session middleware) go to the primary.
+        request = self.request
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return None
+        self.resolved = True
+        view = match.func
+        view_class = getattr(view, 'cls', None) or getattr(view, 'view_class', None)
+        available = replicas()
+        if (
+            available
+            and request.method in SAFE_METHODS
+            and PIN_COOKIE not in request.COOKIES
+            and getattr(view_class, 'replica_reads', False)
+        ):
+            self.replica = random.choice(available)
+        return self.replica
+
+
+_state = ContextVar('replica_routing_state', default=None)
+
+
+def replicas():
+    return list(getattr(settings, 'REPLICA_DATABASES', []))
+
+
+@contextmanager
+def primary_reads():
+    """Send the current request's reads to ``default`` inside the block."""
+    state = _state.get()
+    if state is None:
+        yield
+        return
+    state.primary_only += 1
+    try:
+        yield
+    finally:
+        state.primary_only -= 1
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.pinned or state.primary_only:
+            return 'default'
+        replica = state.replica if state.resolved else state.choose_replica()
+        return replica or 'default'
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        if state is not None:
+            state.pinned = True
+        # Explicit, so rows read from a replica are still saved to default.
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data, so cross-alias relations are fine.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema through replication.
+        if db in replicas():
+            return False
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        state = RoutingState(request)
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(request, response, state)
+
+    async def __acall__(self, request):
+        # The ORM's sync_to_async calls run in a copy of this context, so
+        # they share ``state`` (and can pin it).
+        state = RoutingState(request)
+        token = _state.set(state)
+        try:
+            response = await self.get_response(request)
+        finally:
+            _state.reset(token)
+        return self.pin(request, response, state)
+
+    @staticmethod
+    def pin(request, response, state):
+        if request.method not in SAFE_METHODS and state.pinned:
+            response.set_cookie(
+                PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_PIN_SECONDS', 5),
+                httponly=True, samesite='Lax',
+            )
+        return response
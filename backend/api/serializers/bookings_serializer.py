@@ -1,12 +1,33 @@
 from rest_framework import serializers
+from core.availability import slot_errors
 from core.models.bookings import Booking # Updated import path
+from core.models.listings import PropertyListing
 from .users_serializer import UserSerializer
 from .listings_serializer import PropertyListingSerializer
+from .sparse import SparseFieldsMixin
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     buyer = UserSerializer(read_only=True)
     property = PropertyListingSerializer(read_only=True) # Changed from property_listing to property
+    property_id = serializers.PrimaryKeyRelatedField(
+        source='property', queryset=PropertyListing.objects.all(), write_only=True
+    )
 
     class Meta:
         model = Booking
         fields = '__all__'
+        # Slot uniqueness is left to the database constraint: a validator
+        # would be a racy check-then-insert. Conflicts surface as 409s.
+        validators = []
+
+    def validate(self, attrs):
+        # Rescheduling is checked; editing the message of a past booking isn't.
+        if 'scheduled_date' in attrs or 'scheduled_time' in attrs:
+            errors = slot_errors(
+                attrs.get('scheduled_date', getattr(self.instance, 'scheduled_date', None)),
+                attrs.get('scheduled_time', getattr(self.instance, 'scheduled_time', None)),
+            )
+            if errors:
+                raise serializers.ValidationError(errors)
+        return attrs
+
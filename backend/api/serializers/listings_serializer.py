@@ -1,10 +1,158 @@
+import datetime
+import math
+
+from django.core.files.storage import default_storage
 from rest_framework import serializers
+from core import similar
+from core.images import FORMATS
 from core.models.listings import PropertyListing # Updated import path
+from .sparse import SparseFieldsMixin
 from .users_serializer import UserSerializer
 
-class PropertyListingSerializer(serializers.ModelSerializer):
+FORMAT_KEYS = [key for key, *_ in FORMATS]
+
+
+class RenditionsField(serializers.Field):
+    """
+    Render ``PropertyListing.renditions`` as URLs plus ready-made ``srcset``
+    strings, e.g. ``{"srcset": {"webp": "…/a.webp 320w, …/b.webp 640w"},
+    "thumbnail": {"width": 320, "height": 213, "webp": "…", "jpeg": "…"}}``.
+    """
+
+    def __init__(self, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        representation = {}
+        srcset = {}
+        for label, rendition in (value or {}).items():
+            entry = {'width': rendition['width'], 'height': rendition['height']}
+            for key in FORMAT_KEYS:
+                if key not in rendition:
+                    continue
+                url = default_storage.url(rendition[key])
+                if request is not None:
+                    url = request.build_absolute_uri(url)
+                entry[key] = url
+                srcset.setdefault(key, []).append(f"{url} {rendition['width']}w")
+            representation[label] = entry
+        if representation:
+            representation['srcset'] = {key: ', '.join(urls) for key, urls in srcset.items()}
+        return representation
+
+
+class PropertyListingSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     seller = UserSerializer(read_only=True)
+    renditions = RenditionsField()
 
     class Meta:
         model = PropertyListing
-        fields = '__all__'
+        # The geohash is an index key only, the rest geocoding bookkeeping (see core.geo).
+        exclude = ['geohash', 'geocode_failures', 'geocode_retry_at']
+        # List pages leave out the description; detail has everything.
+        list_fields = [
+            'id', 'seller', 'title', 'address', 'image', 'renditions',
+            'num_bedrooms', 'num_bathrooms', 'price', 'latitude', 'longitude', 'created_at',
+        ]
+        summary_fields = ['id', 'title', 'address', 'image', 'price']
+
+
+class PropertyListingBulkSerializer(serializers.ModelSerializer):
+    """Flat write serializer for ``/api/listings/bulk/``; the seller is the requester."""
+
+    class Meta:
+        model = PropertyListing
+        fields = ['title', 'description', 'address', 'num_bedrooms', 'num_bathrooms', 'price']
+
+
+class ListingSearchSerializer(serializers.Serializer):
+    """Query parameters accepted by ``/api/listings/search/``."""
+    q = serializers.CharField(required=False, allow_blank=True)
+    min_price = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=12, decimal_places=2, required=False)
+    min_bedrooms = serializers.IntegerField(min_value=0, required=False)
+    max_bedrooms = serializers.IntegerField(min_value=0, required=False)
+    min_bathrooms = serializers.IntegerField(min_value=0, required=False)
+    max_bathrooms = serializers.IntegerField(min_value=0, required=False)
+
+
+class CoordinatesField(serializers.Field):
+    """Comma-separated numbers, e.g. ``40.71,-74.0``, as a tuple of floats."""
+
+    def __init__(self, count, **kwargs):
+        self.count = count
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            values = tuple(float(part) for part in str(data).split(','))
+        except ValueError:
+            values = ()
+        if len(values) != self.count or not all(math.isfinite(value) for value in values):
+            raise serializers.ValidationError(f'Expected {self.count} comma-separated numbers.')
+        return values
+
+
+def check_point(latitude, longitude):
+    if not -90 <= latitude <= 90 or not -180 <= longitude <= 180:
+        raise serializers.ValidationError('Latitude must be within ±90 and longitude within ±180.')
+
+
+class LocationQuerySerializer(serializers.Serializer):
+    """
+    Location filters for listing list and search: ``near=lat,lng`` with
+    ``radius`` in km, or ``bbox=south,west,north,east``.
+    """
+    MAX_RADIUS_KM = 500
+
+    near = CoordinatesField(2, required=False)
+    radius = serializers.FloatField(min_value=0, max_value=MAX_RADIUS_KM, default=10)
+    bbox = CoordinatesField(4, required=False)
+
+    def validate_near(self, value):
+        check_point(*value)
+        return value
+
+    def validate_bbox(self, value):
+        south, west, north, east = value
+        check_point(south, west)
+        check_point(north, east)
+        if south > north:
+            raise serializers.ValidationError('South must not be above north.')
+        return value
+
+    def validate(self, attrs):
+        if 'near' in attrs and 'bbox' in attrs:
+            raise serializers.ValidationError('Use either "near" or "bbox", not both.')
+        return attrs
+
+
+class AvailabilityQuerySerializer(serializers.Serializer):
+    """Query parameters accepted by ``/api/listings/{id}/availability/``."""
+    MAX_DAYS = 62
+
+    # ``from`` is a Python keyword, hence the explicit field names.
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+
+    def validate(self, attrs):
+        start = attrs.get('start') or datetime.date.today()
+        end = attrs.get('end') or start + datetime.timedelta(days=6)
+        if end < start:
+            raise serializers.ValidationError({'to': '"to" must not be before "from".'})
+        if (end - start).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({'to': f'At most {self.MAX_DAYS} days per request.'})
+        return {'start': start, 'end': end}
+
+
+class SimilarQuerySerializer(serializers.Serializer):
+    """Query parameters accepted by ``/api/listings/{id}/similar/``."""
+    k = serializers.IntegerField(min_value=1, default=10)
+
+    def validate_k(self, value):
+        most = similar.get_config()['MAX_K']
+        if value > most:
+            raise serializers.ValidationError(f'At most {most}.')
+        return value
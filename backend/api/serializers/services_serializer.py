@@ -1,12 +1,34 @@
 from rest_framework import serializers
+from core.models.listings import PropertyListing
 from core.models.services import ServiceOffer # Updated import path
 from .users_serializer import UserSerializer
 from .listings_serializer import PropertyListingSerializer
+from .sparse import SparseFieldsMixin
 
-class ServiceOfferSerializer(serializers.ModelSerializer):
+class ServiceOfferSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     service_provider = UserSerializer(read_only=True) # Changed from provider
     property = PropertyListingSerializer(read_only=True) # Changed from property_listing
+    property_id = serializers.PrimaryKeyRelatedField(
+        source='property', queryset=PropertyListing.objects.all(), write_only=True
+    )
 
     class Meta:
         model = ServiceOffer
         fields = '__all__'
+
+
+class ServiceOfferBulkSerializer(serializers.ModelSerializer):
+    """
+    Flat write serializer for ``/api/services/bulk/``; the provider is the
+    requester. ``property_id`` existence is checked once per batch by the view.
+    """
+    property_id = serializers.IntegerField(min_value=1)
+
+    class Meta:
+        model = ServiceOffer
+        fields = ['property_id', 'title', 'description']
+
+
+class OfferQuerySerializer(serializers.Serializer):
+    """Query parameters accepted by the service offer lists (pass a plain dict)."""
+    approved = serializers.BooleanField(required=False)
@@ -0,0 +1,86 @@
+"""
+Sparse fieldsets and compact list representations.
+
+For the top-level objects of a GET response, serializers using
+``SparseFieldsMixin`` render:
+
+* in list-like actions (``COMPACT_ACTIONS``): ``Meta.list_fields`` (every
+  field if unset), with nested relations collapsed to the related
+  serializer's ``Meta.summary_fields``, or to the bare primary key when it
+  has none;
+* in every other action (detail, writes): all fields, relations nested in
+  full.
+
+``?fields=a,b`` selects the top-level fields instead, and ``?expand=rel``
+keeps the named relations fully nested in list actions. Since
+``api.querysets.eager_load`` plans the query from the resulting field set,
+only the rendered columns and joins are selected.
+"""
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+COMPACT_ACTIONS = {'list', 'search', 'changes', 'similar'}
+SPARSE_METHODS = ('GET', 'HEAD')
+
+
+def requested_names(request, param):
+    params = getattr(request, 'query_params', None) or request.GET
+    raw = params.get(param, '')
+    return [name.strip() for name in raw.split(',') if name.strip()]
+
+
+def collapse(field):
+    """The compact stand-in for a nested relation; other fields are returned as is."""
+    if not isinstance(field, serializers.BaseSerializer) or isinstance(field, serializers.ListSerializer):
+        return field
+    if isinstance(field, SparseFieldsMixin) and getattr(field.Meta, 'summary_fields', None):
+        return type(field)(read_only=True, source=field.source, summary=True)
+    return serializers.PrimaryKeyRelatedField(read_only=True, source=field.source)
+
+
+class SparseFieldsMixin:
+    """
+    ``ModelSerializer`` mixin; see the module docstring. Pass
+    ``summary=True`` to render only ``Meta.summary_fields``.
+    """
+
+    def __init__(self, *args, summary=False, **kwargs):
+        self.summary = summary
+        super().__init__(*args, **kwargs)
+
+    def get_fields(self):
+        fields = super().get_fields()
+        if self.summary:
+            return {
+                name: collapse(field) for name, field in fields.items()
+                if name in self.Meta.summary_fields
+            }
+
+        request = self.context.get('request')
+        if request is None or request.method not in SPARSE_METHODS or not self.is_top_level():
+            return fields
+
+        requested = requested_names(request, 'fields')
+        expand = requested_names(request, 'expand')
+        for param, names in (('fields', requested), ('expand', expand)):
+            unknown = [name for name in names if name not in fields]
+            if unknown:
+                raise ValidationError({param: [f'Unknown field(s): {", ".join(unknown)}.']})
+
+        compact = getattr(self.context.get('view'), 'action', None) in COMPACT_ACTIONS
+        if requested:
+            keep = requested
+        elif compact:
+            keep = getattr(self.Meta, 'list_fields', fields)
+        else:
+            keep = fields
+        return {
+            name: collapse(field) if compact and name not in expand else field
+            for name, field in fields.items() if name in keep
+        }
+
+    def is_top_level(self):
+        parent = getattr(self, 'parent', None)
+        if isinstance(parent, serializers.ListSerializer):
+            parent = parent.parent
+        return parent is None
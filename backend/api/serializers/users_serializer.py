@@ -1,7 +1,35 @@
 from rest_framework import serializers
+from core.models.stats import ListingStats, UserStats
 from core.models.users import User # Updated import path and model name
+from .sparse import SparseFieldsMixin
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = User # Updated model name
         fields = ['id', 'username', 'email', 'role']
+        # Rendered for nested users in list responses (see .sparse).
+        summary_fields = ['id', 'username']
+
+
+class UserStatsSerializer(serializers.ModelSerializer):
+    """Dashboard counters for ``/api/users/me/stats/``."""
+    offers_pending = serializers.SerializerMethodField()
+
+    class Meta:
+        model = UserStats
+        fields = [
+            'listings', 'bookings_received', 'offers_received', 'bookings_made',
+            'offers', 'offers_approved', 'offers_pending', 'properties_served', 'updated_at',
+        ]
+
+    def get_offers_pending(self, stats):
+        return stats.offers - stats.offers_approved
+
+
+class ListingStatsSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='listing_id')
+    title = serializers.CharField(source='listing.title')
+
+    class Meta:
+        model = ListingStats
+        fields = ['id', 'title', 'bookings', 'offers', 'offers_approved']
@@ -0,0 +1,41 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.geo import locations_changed
+from core.models.listings import PropertyListing
+from core.models.users import User
+
+from .auth import evict_user
+from .cache import invalidate_listings
+from .serializers.users_serializer import UserSerializer
+
+
+@receiver([post_save, post_delete], sender=PropertyListing)
+def invalidate_listing(sender, instance, **kwargs):
+    invalidate_listings([instance.pk])
+
+
+@receiver(locations_changed)
+def invalidate_located_listings(sender, pks, **kwargs):
+    invalidate_listings(pks)
+
+
+@receiver([post_save, post_delete], sender=User)
+def evict_cached_user(sender, instance, **kwargs):
+    evict_user(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_seller_listings(sender, instance, created=False, update_fields=None, **kwargs):
+    """
+    Listings embed their seller, so a change to any serialized user field
+    invalidates that seller's listings. ``last_login`` updates and new users
+    can't affect any cached response and are ignored.
+    """
+    if created:
+        return
+    if update_fields is not None and not set(update_fields) & set(UserSerializer.Meta.fields):
+        return
+    pks = list(PropertyListing.objects.filter(seller=instance).values_list('pk', flat=True))
+    if pks:
+        invalidate_listings(pks)
@@ -1,3 +1,2019 @@
-from django.test import TestCase
+import csv
+import datetime
+import gzip
+import io
+import json
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core import mail
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.db import IntegrityError, OperationalError, connection, connections
+from django.http import HttpResponse
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import ResolverMatch
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken
+
+from core.exports import EXPORT_FIELDS, iter_rows
+from core.geo import set_location
+from core.similar import build as build_similar_index
+from core.models.bookings import Booking
+from core.models.listings import PropertyListing
+from core.models.services import ServiceOffer
+from core.models.stats import UserStats
+from core.models.tasks import Task
+from core.models.users import User
+
+from .auth import get_user_cache
+from . import cache as listing_cache
+from .cache import LocMemBackend, RedisBackend, SingleFlight, fill_entry, get_backend
+from .instrumentation import QueryBudgetExceeded, registry
+from .media import RangeNotSatisfiable, parse_range
+from .management.commands.bench_api import router_endpoints
+from .querysets import eager_load
+from . import fastpath
+from .async_views import ServiceOfferReadView
+from .replicas import PIN_COOKIE, ReplicaRouter, ReplicaRoutingMiddleware
+from .views.bookings_view import BookingViewSet
+from .views.listings_view import PropertyListingViewSet
+from .serializers.bookings_serializer import BookingSerializer
+from .serializers.listings_serializer import PropertyListingSerializer
+from .throttling import LocMemBuckets, RedisBuckets, TAKE_SCRIPT, get_buckets
+
+
+class APITestCase(TestCase):
+    """Shared fixtures for the API tests."""
+
+    def setUp(self):
+        # Rendered responses outlive the per-test transaction rollback.
+        get_backend().clear()
+        self.client = APIClient()
+        self.seller = User.objects.create_user('seller', 'seller@example.com', 'pw', role='seller')
+        self.buyer = User.objects.create_user('buyer', 'buyer@example.com', 'pw', role='buyer')
+        self.provider = User.objects.create_user(
+            'provider', 'provider@example.com', 'pw', role='service_provider'
+        )
+
+    def make_listing(self, seller=None, **kwargs):
+        values = {
+            'seller': seller or self.seller,
+            'title': 'Family home',
+            'description': 'Three bedrooms close to the park.',
+            'address': '1 Main Street',
+            'num_bedrooms': 3,
+            'num_bathrooms': 2,
+            'price': Decimal('350000.00'),
+        }
+        values.update(kwargs)
+        return PropertyListing.objects.create(**values)
+
+    def make_booking(self, listing, buyer=None, **kwargs):
+        values = {
+            'buyer': buyer or self.buyer,
+            'property': listing,
+            'scheduled_date': datetime.date(2030, 1, 1),
+            'scheduled_time': datetime.time(10, 0),
+        }
+        values.update(kwargs)
+        return Booking.objects.create(**values)
+
+    def make_offer(self, listing, provider=None, **kwargs):
+        values = {
+            'service_provider': provider or self.provider,
+            'property': listing,
+            'title': 'Home inspection',
+            'description': 'Full structural inspection.',
+        }
+        values.update(kwargs)
+        return ServiceOffer.objects.create(**values)
+
+
+class EagerLoadingTests(APITestCase):
+    """List endpoints must cost the same number of queries for 1 or N rows."""
+
+    def assertListQueries(self, url, expected, make_rows):
+        with self.captureOnCommitCallbacks(execute=True):
+            make_rows(1)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            make_rows(20)
+        with self.assertNumQueries(expected):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+    def test_listings_list(self):
+        def make_rows(n):
+            for i in range(n):
+                seller = User.objects.create_user(f'seller-{User.objects.count()}', role='seller')
+                self.make_listing(seller=seller)
+
+        self.assertListQueries('/api/listings/', 1, make_rows)
+
+    def test_bookings_list(self):
+        self.client.force_authenticate(self.buyer)
+
+        def make_rows(n):
+            for i in range(n):
+                seller = User.objects.create_user(f'seller-{User.objects.count()}', role='seller')
+                self.make_booking(self.make_listing(seller=seller))
+
+        self.assertListQueries('/api/bookings/', 1, make_rows)
+
+    def test_services_list(self):
+        def make_rows(n):
+            for i in range(n):
+                provider = User.objects.create_user(
+                    f'provider-{User.objects.count()}', role='service_provider'
+                )
+                self.make_offer(self.make_listing(), provider=provider)
+
+        self.assertListQueries('/api/services/', 1, make_rows)
+
+    def test_only_serialized_user_columns_are_loaded(self):
+        self.make_listing()
+        listing = eager_load(PropertyListing.objects.all(), PropertyListingSerializer).get()
+        self.assertEqual(listing.seller.get_deferred_fields() & {'username', 'email', 'role'}, set())
+        self.assertIn('password', listing.seller.get_deferred_fields())
+
+
+class KeysetPaginationTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.listings = [self.make_listing(title=f'Listing {i}') for i in range(7)]
+        # Force ties on created_at so the id tie-breaker is exercised.
+        PropertyListing.objects.filter(pk__in=[l.pk for l in self.listings[:4]]).update(
+            created_at=self.listings[0].created_at
+        )
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids.extend(row['id'] for row in response.json()['results'])
+            url = response.json()['next']
+        return ids
+
+    def test_pages_cover_every_row_once_in_order(self):
+        expected = list(
+            PropertyListing.objects.order_by('-created_at', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(self.walk('/api/listings/?page_size=2'), expected)
+
+    def test_previous_link_returns_the_earlier_page(self):
+        first = self.client.get('/api/listings/?page_size=3').json()
+        second = self.client.get(first['next']).json()
+        self.assertIsNotNone(second['previous'])
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(
+            [row['id'] for row in back['results']],
+            [row['id'] for row in first['results']],
+        )
+
+    def test_deep_page_costs_one_query(self):
+        url = self.client.get('/api/listings/?page_size=2').json()['next']
+        url = self.client.get(url).json()['next']
+        with self.assertNumQueries(1):
+            self.client.get(url)
+
+    def test_user_pages_load_their_ordering_columns(self):
+        # Users page by date_joined, which the list serializer doesn't show.
+        url = self.client.get('/api/users/?page_size=1').json()['next']
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertIsNotNone(response.json()['next'])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/listings/?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, 404)
+
+
+class ListingSearchTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.garden = self.make_listing(
+            title='Cottage with garden', num_bedrooms=2, price=Decimal('180000.00')
+        )
+        self.pool = self.make_listing(
+            title='Villa with pool and garden', num_bedrooms=5, price=Decimal('900000.00')
+        )
+        self.flat = self.make_listing(
+            title='City flat', description='Top floor.', num_bedrooms=1, price=Decimal('95000.00')
+        )
+
+    def search(self, query=''):
+        response = self.client.get(f'/api/listings/search/?{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def ids(self, data):
+        return {row['id'] for row in data['results']}
+
+    def test_text_terms_must_all_match(self):
+        self.assertEqual(self.ids(self.search('q=garden')), {self.garden.id, self.pool.id})
+        self.assertEqual(self.ids(self.search('q=Garden+POOL')), {self.pool.id})
+        self.assertEqual(self.ids(self.search('q=garden+basement')), set())
+
+    def test_range_filters(self):
+        self.assertEqual(self.ids(self.search('max_price=200000')), {self.garden.id, self.flat.id})
+        self.assertEqual(self.ids(self.search('min_bedrooms=2&max_bedrooms=4')), {self.garden.id})
+        self.assertEqual(self.ids(self.search('q=garden&min_price=500000')), {self.pool.id})
+
+    def test_facets_cover_the_filtered_set(self):
+        facets = self.search('q=garden')['facets']
+        bedrooms = {bucket['bedrooms']: bucket['count'] for bucket in facets['bedrooms']}
+        self.assertEqual(bedrooms, {'0': 0, '1': 0, '2': 1, '3': 0, '4': 0, '5+': 1})
+        self.assertEqual(sum(bucket['count'] for bucket in facets['price']), 2)
+        self.assertEqual(facets['price'][1], {'min': '100000', 'max': '250000', 'count': 1})
+
+    def test_search_costs_a_fixed_number_of_queries(self):
+        # One query for the page, one aggregate for all facets.
+        with self.assertNumQueries(2):
+            self.search('q=garden&max_price=1000000')
+
+    def test_invalid_parameters(self):
+        response = self.client.get('/api/listings/search/?min_bedrooms=-1')
+        self.assertEqual(response.status_code, 400)
+
+
+class ListingLocationTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.midtown = self.located(40.7549, -73.9840, title='Midtown loft')
+        self.brooklyn = self.located(40.6782, -73.9442, title='Brooklyn house')
+        self.boston = self.located(42.3601, -71.0589, title='Boston condo')
+        self.fiji = self.located(-17.7134, 179.9, title='Fiji garden villa')
+        self.samoa = self.located(-13.7590, -172.1046, title='Samoa garden bungalow')
+        self.unknown = self.make_listing(title='Somewhere')
+
+    def located(self, latitude, longitude, **kwargs):
+        listing = self.make_listing(**kwargs)
+        set_location(listing, (latitude, longitude))
+        listing.save()
+        return listing
+
+    def ids(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200, response.content)
+        return {row['id'] for row in response.json()['results']}
+
+    def test_near(self):
+        near_midtown = '/api/listings/?near=40.7580,-73.9855'
+        self.assertEqual(self.ids(near_midtown + '&radius=1'), {self.midtown.id})
+        self.assertEqual(self.ids(near_midtown), {self.midtown.id, self.brooklyn.id})
+        self.assertEqual(self.ids(near_midtown + '&radius=400'), {self.midtown.id, self.brooklyn.id, self.boston.id})
+
+    def test_bbox(self):
+        self.assertEqual(self.ids('/api/listings/?bbox=40.5,-74.1,41,-73.9'), {self.midtown.id, self.brooklyn.id})
+        # West > east: the box spans the antimeridian.
+        self.assertEqual(self.ids('/api/listings/?bbox=-20,179,-10,-170'), {self.fiji.id, self.samoa.id})
+        self.assertEqual(self.ids('/api/listings/?bbox=-90,-180,90,180'), {
+            self.midtown.id, self.brooklyn.id, self.boston.id, self.fiji.id, self.samoa.id,
+        })
+
+    def test_combined_with_search(self):
+        response = self.client.get('/api/listings/search/?q=garden&near=-17.7,179.95&radius=50')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual({row['id'] for row in data['results']}, {self.fiji.id})
+        self.assertEqual(data['results'][0]['latitude'], '-17.713400')
+        self.assertEqual(sum(bucket['count'] for bucket in data['facets']['price']), 1)
+
+    def test_invalid_parameters(self):
+        for query in ['near=40.7', 'near=91,0', 'near=a,b', 'near=40,-73&radius=-1',
+                      'near=40,-73&radius=100000', 'bbox=1,2,3', 'bbox=41,-74,40,-73',
+                      'near=40,-73&bbox=40,-74,41,-73']:
+            with self.subTest(query=query):
+                self.assertEqual(self.client.get(f'/api/listings/?{query}').status_code, 400)
+
+    def test_detail_ignores_location_filters(self):
+        response = self.client.get(f'/api/listings/{self.boston.id}/?near=0,0&radius=1')
+        self.assertEqual(response.status_code, 200)
+
+    def test_bulk_address_change_clears_location(self):
+        self.client.force_authenticate(self.seller)
+        response = self.client.patch('/api/listings/bulk/', [
+            {'id': self.midtown.id, 'address': '2 Other Street'},
+            {'id': self.brooklyn.id, 'title': 'Brooklyn townhouse'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertEqual(self.ids('/api/listings/?near=40.7580,-73.9855'), {self.brooklyn.id})
+
+
+class FakeRedis:
+    """The subset of the redis-py client used by ``RedisBackend``."""
+
+    def __init__(self):
+        self.values = {}
+        self.zsets = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def set(self, key, value, ex=None, nx=False):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key, None)
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    def zrange(self, key, start, end):
+        members = sorted(self.zsets.get(key, {}).items(), key=lambda item: item[1])
+        return [member for member, _ in members[start:end + 1]]
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.zsets.get(key, {}).pop(member, None)
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class CacheBackendTests(TestCase):
+
+    def test_locmem_evicts_least_recently_used(self):
+        backend = LocMemBackend(max_entries=2)
+        backend.set('a', b'1')
+        backend.set('b', b'2')
+        backend.get('a')
+        backend.set('c', b'3')
+        self.assertEqual((backend.get('a'), backend.get('b'), backend.get('c')), (b'1', None, b'3'))
+
+    def test_locmem_expiry(self):
+        backend = LocMemBackend()
+        backend.set('a', b'1', timeout=-1)
+        self.assertIsNone(backend.get('a'))
+
+    def test_redis_evicts_least_recently_used(self):
+        backend = RedisBackend(client=FakeRedis(), max_entries=2)
+        backend.set('a', b'1')
+        time.sleep(0.001)
+        backend.set('b', b'2')
+        time.sleep(0.001)
+        backend.get('a')
+        time.sleep(0.001)
+        backend.set('c', b'3')
+        self.assertEqual((backend.get('a'), backend.get('b'), backend.get('c')), (b'1', None, b'3'))
+
+    def test_locmem_add(self):
+        backend = LocMemBackend()
+        self.assertTrue(backend.add('lock', b'1', timeout=5))
+        self.assertFalse(backend.add('lock', b'2', timeout=5))
+        backend.set('expired', b'1', timeout=-1)
+        self.assertTrue(backend.add('expired', b'2'))
+
+    def test_redis_add(self):
+        backend = RedisBackend(client=FakeRedis())
+        self.assertTrue(backend.add('lock', b'1', timeout=5))
+        self.assertFalse(backend.add('lock', b'2', timeout=5))
+        self.assertEqual(backend.get('lock'), b'1')
+
+
+class CoalescingTests(TestCase):
+
+    def test_concurrent_calls_share_one_result(self):
+        flight = SingleFlight()
+        calls = []
+        started = threading.Event()
+        release = threading.Event()
+
+        def render():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return b'body'
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            leader = pool.submit(flight.do, 'key', render)
+            started.wait(5)
+            waiters = [pool.submit(flight.do, 'key', render) for _ in range(7)]
+            time.sleep(0.05)
+            release.set()
+            results = [leader.result()] + [waiter.result() for waiter in waiters]
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results[0], (b'body', False))
+        self.assertEqual(set(results[1:]), {(b'body', True)})
+
+    def test_waiters_retry_after_failure(self):
+        flight = SingleFlight()
+        started = threading.Event()
+        release = threading.Event()
+
+        def fail():
+            started.set()
+            release.wait(5)
+            raise ValueError
+
+        with ThreadPoolExecutor(max_workers=2) as pool:
+            leader = pool.submit(flight.do, 'key', fail)
+            started.wait(5)
+            waiter = pool.submit(flight.do, 'key', lambda: b'body')
+            time.sleep(0.05)
+            release.set()
+            with self.assertRaises(ValueError):
+                leader.result()
+            self.assertEqual(waiter.result(), (b'body', False))
+
+    def test_shared_backend_waits_for_other_process(self):
+        backend = RedisBackend(client=FakeRedis())
+        key = 'resp:gen:abc'
+        # Another process holds the lock and stores its render shortly.
+        backend.add(key + ':lock', b'1', timeout=5)
+        threading.Timer(0.1, backend.set, (key, b'theirs')).start()
+        render = mock.Mock(return_value=('application/json', b'ours'))
+        with mock.patch.object(listing_cache, 'get_backend', return_value=backend):
+            self.assertEqual(fill_entry(key, render), b'theirs')
+        render.assert_not_called()
+
+    @override_settings(LISTING_CACHE={'LOCK_TIMEOUT': 0.1})
+    def test_shared_backend_lock_timeout(self):
+        backend = RedisBackend(client=FakeRedis())
+        backend.add('resp:gen:abc:lock', b'1', timeout=5)
+        with mock.patch.object(listing_cache, 'get_backend', return_value=backend):
+            entry = fill_entry('resp:gen:abc', lambda: ('application/json', b'ours'))
+        self.assertEqual(listing_cache.decode_entry(entry)[3], b'ours')
+        self.assertEqual(backend.get('resp:gen:abc'), entry)
+
+    def test_view_renders_once_for_concurrent_misses(self):
+        calls = []
+        release = threading.Event()
+
+        def render():
+            calls.append(1)
+            release.wait(5)
+            return HttpResponse(b'[]', content_type='application/json')
+
+        class View(listing_cache.CachedResponseMixin):
+            def get_renderer_context(self):
+                return {}
+
+        request = APIRequestFactory().get('/api/listings/')
+        request.accepted_renderer = mock.Mock(format='json', charset=None)
+        request.accepted_media_type = 'application/json'
+        with ThreadPoolExecutor(max_workers=4) as pool:
+            responses = [pool.submit(View().cached_response, request, 'gen:test', render) for _ in range(4)]
+            time.sleep(0.1)
+            release.set()
+            bodies = {response.result().content for response in responses}
+        self.assertEqual(bodies, {b'[]'})
+        self.assertEqual(len(calls), 1)
+
+
+class FakeScript:
+    """``register_script`` result that records its calls."""
+
+    def __init__(self, result=b'0'):
+        self.result = result
+        self.calls = []
+
+    def __call__(self, keys, args):
+        self.calls.append((keys, args))
+        return self.result
+
+
+class ThrottleTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        get_buckets().clear()
+
+    def test_bucket_refills(self):
+        buckets = LocMemBuckets()
+        with mock.patch('api.throttling.time.monotonic', return_value=100.0):
+            self.assertEqual([buckets.take('a', 1, 2) for _ in range(2)], [0, 0])
+            self.assertAlmostEqual(buckets.take('a', 1, 2), 1.0)
+            self.assertEqual(buckets.take('b', 1, 2), 0)
+        with mock.patch('api.throttling.time.monotonic', return_value=100.5):
+            self.assertAlmostEqual(buckets.take('a', 1, 2), 0.5)
+        with mock.patch('api.throttling.time.monotonic', return_value=101.0):
+            self.assertEqual(buckets.take('a', 1, 2), 0)
+
+    def test_redis_buckets_run_the_script(self):
+        client = mock.Mock()
+        client.register_script.return_value = script = FakeScript(b'1.5')
+        buckets = RedisBuckets(client=client)
+        client.register_script.assert_called_once_with(TAKE_SCRIPT)
+        self.assertEqual(buckets.take('anon:1.2.3.4', 2.0, 10), 1.5)
+        self.assertEqual(script.calls, [(['throttle:anon:1.2.3.4'], [2.0, 10])])
+
+    @override_settings(READ_THROTTLE={'RATES': {'anon': {'rate': '1/min', 'burst': 2}}})
+    def test_anonymous_reads_are_limited_per_ip(self):
+        for _ in range(2):
+            self.assertEqual(self.client.get('/api/services/').status_code, 200)
+        response = self.client.get('/api/services/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(self.client.get('/api/listings/').status_code, 429)
+        self.assertEqual(self.client.get('/api/services/', REMOTE_ADDR='10.0.0.2').status_code, 200)
+
+        # Writes and authenticated users aren't drawn from the anonymous bucket.
+        self.client.force_authenticate(self.provider)
+        self.assertEqual(self.client.get('/api/services/').status_code, 200)
+        response = self.client.post('/api/services/bulk/', [
+            {'property_id': self.make_listing().id, 'title': 'Cleaning', 'description': 'Deep clean.'},
+        ], format='json')
+        self.assertEqual(response.status_code, 201)
+
+    @override_settings(READ_THROTTLE={'RATES': {'anon': {'rate': '1/min', 'burst': 1}}})
+    async def test_forwarded_for_does_not_pick_the_bucket(self):
+        for url, forwarded_for, status in [
+            ('/api/services/', '1.1.1.1', 200),
+            ('/api/services/', '2.2.2.2', 429),
+            ('/api/async/services/', '3.3.3.3', 429),
+        ]:
+            response = await self.async_client.get(url, headers={'X-Forwarded-For': forwarded_for})
+            self.assertEqual(response.status_code, status, forwarded_for)
+
+    @override_settings(
+        READ_THROTTLE={'RATES': {'anon': {'rate': '1/min', 'burst': 1}}},
+        REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1},
+    )
+    def test_behind_a_proxy_only_its_entry_counts(self):
+        def get(forwarded_for):
+            return self.client.get('/api/services/', HTTP_X_FORWARDED_FOR=forwarded_for).status_code
+
+        self.assertEqual(get('9.9.9.9, 1.1.1.1'), 200)
+        # The client's own entries changed; the one the proxy appended didn't.
+        self.assertEqual(get('8.8.8.8, 1.1.1.1'), 429)
+        self.assertEqual(get('9.9.9.9, 2.2.2.2'), 200)
+
+    @override_settings(READ_THROTTLE={'RATES': {'user': {'rate': '1/min', 'burst': 1}}})
+    def test_users_have_their_own_buckets(self):
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(self.client.get('/api/listings/').status_code, 200)
+        self.assertEqual(self.client.get('/api/listings/').status_code, 429)
+        self.client.force_authenticate(self.seller)
+        self.assertEqual(self.client.get('/api/listings/').status_code, 200)
+
+    @override_settings(READ_THROTTLE={'RATES': {'anon': {'rate': '1/min', 'burst': 1}}})
+    async def test_async_views(self):
+        self.assertEqual((await self.async_client.get('/api/async/services/')).status_code, 200)
+        response = await self.async_client.get('/api/async/listings/')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertIn('throttled', response.json()['detail'])
+
+    @override_settings(READ_THROTTLE={'RATES': {
+        'anon': {'rate': '1/min', 'burst': 1}, 'user': {'rate': '1/min', 'burst': 1},
+    }})
+    async def test_async_views_throttle_token_users_per_user(self):
+        buyer = {'Authorization': f'Bearer {AccessToken.for_user(self.buyer)}'}
+        seller = {'Authorization': f'Bearer {AccessToken.for_user(self.seller)}'}
+        self.assertEqual((await self.async_client.get('/api/async/services/')).status_code, 200)
+        # Same IP, but the users' own buckets.
+        self.assertEqual((await self.async_client.get('/api/async/services/', headers=buyer)).status_code, 200)
+        self.assertEqual((await self.async_client.get('/api/async/services/', headers=seller)).status_code, 200)
+        self.assertEqual((await self.async_client.get('/api/async/services/', headers=buyer)).status_code, 429)
+        # Shared with the viewsets, as for anonymous clients.
+        self.client.force_authenticate(self.seller)
+        self.assertEqual(self.client.get('/api/services/').status_code, 429)
+
+        response = await self.async_client.get('/api/async/services/', headers={'Authorization': 'Bearer bogus'})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response['WWW-Authenticate'], 'Bearer realm="api"')
+
+
+class ListingCacheTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.listing = self.make_listing()
+        self.url = f'/api/listings/{self.listing.pk}/'
+
+    def test_hits_skip_the_database(self):
+        for url in ('/api/listings/', self.url):
+            first = self.client.get(url)
+            with self.assertNumQueries(0):
+                second = self.client.get(url)
+            self.assertEqual(first.content, second.content)
+            self.assertEqual(first['ETag'], second['ETag'])
+
+    def test_conditional_requests(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_listing_change_invalidates_list_and_detail(self):
+        self.client.get('/api/listings/')
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.title = 'Renamed'
+            self.listing.save()
+        self.assertEqual(self.client.get(self.url).json()['title'], 'Renamed')
+        self.assertEqual(self.client.get('/api/listings/').json()['results'][0]['title'], 'Renamed')
+
+    def test_seller_change_invalidates_embedded_seller(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.seller.username = 'renamed-seller'
+            self.seller.save()
+        self.assertEqual(self.client.get(self.url).json()['seller']['username'], 'renamed-seller')
+
+    def test_deleted_listing_is_not_served(self):
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.delete()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+    def test_generation_bumped_when_the_change_commits(self):
+        key = listing_cache.detail_generation_key(self.listing.pk)
+        generation = listing_cache.current_generation(key)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.listing.title = 'Renamed'
+            self.listing.save()
+            self.assertEqual(listing_cache.current_generation(key), generation)
+        self.assertNotEqual(listing_cache.current_generation(key), generation)
+
+    def test_unrelated_login_keeps_entries(self):
+        self.client.get(self.url)
+        self.seller.last_login = timezone.now()
+        self.seller.save(update_fields=['last_login'])
+        with self.assertNumQueries(0):
+            self.client.get(self.url)
+
+
+class RenditionsFieldTests(APITestCase):
+
+    def test_renditions_rendered_as_urls_and_srcset(self):
+        listing = self.make_listing()
+        listing.renditions = {
+            'thumbnail': {'width': 320, 'height': 160, 'webp': 'r/a.webp', 'jpeg': 'r/a.jpg'},
+            'card': {'width': 640, 'height': 320, 'webp': 'r/b.webp', 'jpeg': 'r/b.jpg'},
+        }
+        listing.save(update_fields=['renditions'])
+
+        renditions = self.client.get(f'/api/listings/{listing.pk}/').json()['renditions']
+        self.assertEqual(renditions['card']['jpeg'], 'http://testserver/media/r/b.jpg')
+        self.assertEqual(
+            renditions['srcset']['webp'],
+            'http://testserver/media/r/a.webp 320w, http://testserver/media/r/b.webp 640w',
+        )
+
+    def test_no_image(self):
+        listing = self.make_listing()
+        self.assertEqual(self.client.get(f'/api/listings/{listing.pk}/').json()['renditions'], {})
+
+
+class MediaDeliveryTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.name = default_storage.save('property_images/house.jpg', ContentFile(b'0123456789'))
+        self.url = f'/media/{self.name}'
+
+    def body(self, response):
+        return b''.join(response.streaming_content)
+
+    def test_uploads_get_content_hashed_immutable_urls(self):
+        self.assertRegex(self.name, r'^property_images/house\.[0-9a-f]{16}\.jpg$')
+        other = default_storage.save('property_images/other.jpg', ContentFile(b'0123456789'))
+        self.assertEqual(other.split('.')[1], self.name.split('.')[1])
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), b'0123456789')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response['ETag'], '"%s"' % self.name.split('.')[1])
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+
+    def test_identical_content_is_stored_once(self):
+        self.assertEqual(default_storage.save('property_images/house.jpg', ContentFile(b'0123456789')), self.name)
+
+    def test_if_none_match(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH='"other"').status_code, 200)
+
+    def test_range_requests(self):
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(self.body(response), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+        self.assertEqual(response['Content-Length'], '4')
+        self.assertEqual(self.body(self.client.get(self.url, HTTP_RANGE='bytes=-3')), b'789')
+        self.assertEqual(self.body(self.client.get(self.url, HTTP_RANGE='bytes=7-')), b'789')
+
+        response = self.client.get(self.url, HTTP_RANGE='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_stale_if_range_sends_whole_file(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE=etag)
+        self.assertEqual(response.status_code, 206)
+        response = self.client.get(self.url, HTTP_RANGE='bytes=2-5', HTTP_IF_RANGE='"old"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.body(response), b'0123456789')
+
+    def test_parse_range(self):
+        self.assertIsNone(parse_range(None, 10))
+        self.assertIsNone(parse_range('bytes=0-1,4-5', 10))
+        self.assertIsNone(parse_range('bytes=5-2', 10))
+        self.assertIsNone(parse_range('items=0-1', 10))
+        self.assertEqual(parse_range('bytes=4-99', 10), (4, 9))
+        self.assertEqual(parse_range('bytes=-99', 10), (0, 9))
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=-0', 10)
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=0-', 0)
+
+    def test_files_without_hash_are_revalidated(self):
+        path = default_storage.path('legacy.png')
+        with open(path, 'wb') as file:
+            file.write(b'png')
+        response = self.client.get('/media/legacy.png')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600')
+        self.assertEqual(self.client.get('/media/legacy.png', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_missing_and_outside_files(self):
+        self.assertEqual(self.client.get('/media/property_images/nope.jpg').status_code, 404)
+        self.assertEqual(self.client.get('/media/property_images').status_code, 404)
+        self.assertEqual(self.client.get('/media/%2e%2e/manage.py').status_code, 404)
+        self.assertEqual(self.client.post(self.url).status_code, 405)
+
+    def test_offload_to_proxy(self):
+        with override_settings(MEDIA_DELIVERY={'OFFLOAD': 'x-accel-redirect'}):
+            response = self.client.get(self.url, HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=31536000, immutable')
+        self.assertEqual(response.content, b'')
+
+        with override_settings(MEDIA_DELIVERY={'OFFLOAD': 'x-sendfile'}):
+            response = self.client.get(self.url)
+        self.assertEqual(response['X-Sendfile'], default_storage.path(self.name))
+
+
+class BulkEndpointTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.client.force_authenticate(self.seller)
+
+    def listing_item(self, **kwargs):
+        item = {
+            'title': 'Bulk home', 'description': 'Imported.', 'address': '9 Import Way',
+            'num_bedrooms': 2, 'num_bathrooms': 1, 'price': '200000.00',
+        }
+        item.update(kwargs)
+        return item
+
+    def test_create_json_array_reports_errors_per_item(self):
+        items = [self.listing_item(title=f'Home {i}') for i in range(5)]
+        items[2]['num_bedrooms'] = -1
+        response = self.client.post('/api/listings/bulk/', items, format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['created'], 4)
+        self.assertEqual([error['index'] for error in response.data['errors']], [2])
+        self.assertIn('num_bedrooms', response.data['errors'][0]['errors'])
+        self.assertEqual(PropertyListing.objects.filter(seller=self.seller).count(), 4)
+
+    def test_interleaved_creates_without_bulk_returning(self):
+        # As on MySQL, with another create for the same seller landing right
+        # after this batch's first INSERT.
+        written = []
+        bulk_written = PropertyListingViewSet.bulk_written
+
+        def record(view, objs, created=False):
+            written.extend(obj.title for obj in objs)
+            bulk_written(view, objs, created=created)
+
+        def interleave(execute, sql, params, many, context):
+            if inserted and not interleaved:
+                interleaved.append(True)
+                self.make_listing(title='Concurrent')
+            if sql.startswith('INSERT INTO "core_propertylisting"'):
+                inserted.append(True)
+            return execute(sql, params, many, context)
+
+        inserted, interleaved = [], []
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False), \
+                mock.patch.object(PropertyListingViewSet, 'bulk_chunk_size', 2), \
+                mock.patch.object(PropertyListingViewSet, 'bulk_written', record), \
+                connection.execute_wrapper(interleave):
+            response = self.client.post(
+                '/api/listings/bulk/', [self.listing_item(title=f'A{i}') for i in range(3)], format='json',
+            )
+
+        self.assertEqual(len(interleaved), 1)
+        titles = dict(PropertyListing.objects.values_list('pk', 'title'))
+        self.assertEqual([titles[pk] for pk in response.data['ids']], ['A0', 'A1', 'A2'])
+        self.assertEqual(written, ['A0', 'A1', 'A2'])
+        self.assertEqual(UserStats.objects.get(pk=self.seller.pk).listings, 4)
+
+    def test_create_ndjson_stream_is_searchable_and_invalidates_cache(self):
+        self.client.get('/api/listings/')
+        body = '\n'.join(json.dumps(self.listing_item(title=f'Lakeside {i}')) for i in range(3))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                '/api/listings/bulk/', body, content_type='application/x-ndjson'
+            )
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(len(self.client.get('/api/listings/').json()['results']), 3)
+        self.assertEqual(len(self.client.get('/api/listings/search/?q=lakeside').json()['results']), 3)
+
+    def test_create_query_count_does_not_grow_with_items(self):
+        def post(n):
+            items = [self.listing_item() for _ in range(n)]
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.post('/api/listings/bulk/', items, format='json').status_code, 201)
+            return len(queries)
+
+        self.assertEqual(post(2), post(40))
+
+    def test_atomic_batch_writes_nothing_on_error(self):
+        items = [self.listing_item(), self.listing_item(price='not a price')]
+        response = self.client.post('/api/listings/bulk/?atomic=1', items, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(PropertyListing.objects.exists())
+
+    def test_update_only_own_rows(self):
+        mine = self.make_listing()
+        other = self.make_listing(seller=self.buyer)
+        response = self.client.patch('/api/listings/bulk/', [
+            {'id': mine.pk, 'price': '1.00'},
+            {'id': other.pk, 'price': '1.00'},
+            {'price': '1.00'},
+        ], format='json')
+
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['ids'], [mine.pk])
+        self.assertEqual([error['index'] for error in response.data['errors']], [1, 2])
+        mine.refresh_from_db()
+        other.refresh_from_db()
+        self.assertEqual(mine.price, Decimal('1.00'))
+        self.assertEqual(other.price, Decimal('350000.00'))
+
+    def test_delete(self):
+        mine = [self.make_listing() for _ in range(3)]
+        other = self.make_listing(seller=self.buyer)
+        response = self.client.delete(
+            '/api/listings/bulk/', [mine[0].pk, mine[1].pk, other.pk], format='json'
+        )
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['deleted'], 2)
+        self.assertEqual(set(PropertyListing.objects.values_list('pk', flat=True)), {mine[2].pk, other.pk})
+
+    def test_service_offers_check_properties_in_one_query(self):
+        self.client.force_authenticate(self.provider)
+        listing = self.make_listing()
+        items = [
+            {'property_id': listing.pk, 'title': 'Staging', 'description': 'Furniture.'},
+            {'property_id': 999999, 'title': 'Cleaning', 'description': 'Deep clean.'},
+        ]
+        response = self.client.post('/api/services/bulk/', items, format='json')
+        self.assertEqual(response.status_code, 207)
+        self.assertEqual(response.data['errors'], [
+            {'index': 1, 'errors': {'property_id': ['Object does not exist.']}},
+        ])
+        offer = ServiceOffer.objects.get()
+        self.assertEqual((offer.property, offer.service_provider), (listing, self.provider))
+
+    def test_requires_authentication(self):
+        self.client.force_authenticate(None)
+        response = self.client.post('/api/listings/bulk/', [self.listing_item()], format='json')
+        self.assertIn(response.status_code, (401, 403))
+
+
+class DashboardStatsTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.home = self.make_listing(title='Home')
+        self.flat = self.make_listing(title='Flat')
+        self.make_booking(self.flat)
+        self.make_booking(self.flat, scheduled_time=datetime.time(11, 0))
+        self.make_offer(self.home, approved=True)
+        self.make_offer(self.home)
+
+    def stats(self, user, query=''):
+        self.client.force_authenticate(user)
+        response = self.client.get(f'/api/users/me/stats/{query}')
+        self.assertEqual(response.status_code, 200, response.content)
+        return response.json()
+
+    def test_requires_authentication(self):
+        self.assertIn(self.client.get('/api/users/me/stats/').status_code, (401, 403))
+
+    def test_one_query(self):
+        self.client.force_authenticate(self.provider)
+        with self.assertNumQueries(1):
+            self.client.get('/api/users/me/stats/')
+
+    def test_counters(self):
+        seller = self.stats(self.seller)
+        self.assertEqual(
+            {key: seller[key] for key in ('listings', 'bookings_received', 'offers_received')},
+            {'listings': 2, 'bookings_received': 2, 'offers_received': 2},
+        )
+        provider = self.stats(self.provider)
+        self.assertEqual(
+            {key: provider[key] for key in ('offers', 'offers_approved', 'offers_pending', 'properties_served')},
+            {'offers': 2, 'offers_approved': 1, 'offers_pending': 1, 'properties_served': 1},
+        )
+        self.assertEqual(self.stats(self.buyer)['bookings_made'], 2)
+
+    def test_per_listing_counts(self):
+        self.assertNotIn('by_listing', self.stats(self.seller))
+        listings = self.stats(self.seller, '?listings=1')['by_listing']
+        self.assertEqual(listings, [
+            {'id': self.flat.id, 'title': 'Flat', 'bookings': 2, 'offers': 0, 'offers_approved': 0},
+            {'id': self.home.id, 'title': 'Home', 'bookings': 0, 'offers': 2, 'offers_approved': 1},
+        ])
+
+    @override_settings(QUERY_BUDGETS_STRICT=False)
+    def test_missing_row_is_built(self):
+        # Only for users created in bulk since the last reconcile_stats run.
+        UserStats.objects.filter(pk=self.seller.pk).delete()
+        self.assertEqual(self.stats(self.seller)['bookings_received'], 2)
+
+    def test_bulk_writes_update_counters(self):
+        self.client.force_authenticate(self.provider)
+        response = self.client.post('/api/services/bulk/', [
+            {'property_id': self.flat.id, 'title': 'Cleaning', 'description': 'Deep clean.'},
+        ], format='json')
+        self.assertEqual(response.status_code, 201, response.content)
+        offer_id = response.json()['ids'][0]
+        self.assertEqual(self.stats(self.provider)['properties_served'], 2)
+        self.assertEqual(self.stats(self.seller)['offers_received'], 3)
+
+        self.client.force_authenticate(self.provider)
+        self.client.delete('/api/services/bulk/', [offer_id], format='json')
+        self.assertEqual(self.stats(self.provider)['properties_served'], 1)
+
+
+class ListingChangesTests(APITestCase):
+
+    def sync(self, since=None, status=200):
+        query = f'?since={since}' if since else ''
+        response = self.client.get(f'/api/listings/changes/{query}')
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()
+
+    def ids(self, feed):
+        return sorted(listing['id'] for listing in feed['changes'])
+
+    def test_initial_sync_then_nothing_new(self):
+        listings = [self.make_listing(title=f'Home {i}') for i in range(3)]
+        feed = self.sync()
+        self.assertEqual(self.ids(feed), [listing.pk for listing in listings])
+        self.assertEqual(feed['deleted'], [])
+        self.assertFalse(feed['has_more'])
+        # Compact list representation.
+        self.assertEqual(feed['changes'][0]['seller'], {'id': self.seller.pk, 'username': 'seller'})
+        self.assertNotIn('description', feed['changes'][0])
+
+        again = self.sync(feed['next'])
+        self.assertEqual((again['changes'], again['deleted']), ([], []))
+
+    def test_updates_deletes_and_seller_renames(self):
+        home, flat, other = self.make_listing(), self.make_listing(), self.make_listing(seller=self.buyer)
+        token = self.sync()['next']
+
+        home.price = Decimal('1.00')
+        home.save()
+        flat_pk = flat.pk
+        flat.delete()
+        feed = self.sync(token)
+        self.assertEqual(self.ids(feed), [home.pk])
+        self.assertEqual(feed['deleted'], [flat_pk])
+
+        self.buyer.username = 'renamed'
+        self.buyer.save()
+        feed = self.sync(feed['next'])
+        self.assertEqual(self.ids(feed), [other.pk])
+        self.assertEqual(feed['changes'][0]['seller']['username'], 'renamed')
+
+    def test_bulk_writes_are_picked_up(self):
+        self.client.force_authenticate(self.seller)
+        first, second = self.make_listing(), self.make_listing()
+        token = self.sync()['next']
+
+        self.client.patch('/api/listings/bulk/', [{'id': first.pk, 'price': '2.00'}], format='json')
+        self.client.delete('/api/listings/bulk/', [second.pk], format='json')
+        feed = self.sync(token)
+        self.assertEqual(self.ids(feed), [first.pk])
+        self.assertEqual(feed['deleted'], [second.pk])
+
+    @override_settings(LISTING_CHANGES={'SETTLE_SECONDS': 0, 'RETENTION_DAYS': 30, 'PAGE_SIZE': 2})
+    def test_pages_through_every_change_once(self):
+        listings = [self.make_listing(title=f'Home {i}') for i in range(5)]
+        listings.pop().delete()
+        seen, deleted, token, pages = [], [], None, 0
+        while True:
+            feed = self.sync(token)
+            seen += [listing['id'] for listing in feed['changes']]
+            deleted += feed['deleted']
+            token, pages = feed['next'], pages + 1
+            if not feed['has_more']:
+                break
+        self.assertEqual(sorted(seen), [listing.pk for listing in listings])
+        self.assertEqual(len(deleted), 1)
+        self.assertEqual(pages, 3)
+
+    def test_query_count_does_not_grow_with_changes(self):
+        def count(n):
+            token = self.sync()['next']
+            for _ in range(n):
+                self.make_listing()
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(len(self.sync(token)['changes']), n)
+            return len(queries)
+
+        self.assertEqual(count(1), count(20))
+
+    def test_settle_window_holds_back_recent_changes(self):
+        token = self.sync()['next']
+        self.make_listing()
+        with override_settings(LISTING_CHANGES={'SETTLE_SECONDS': 60}):
+            feed = self.sync(token)
+        self.assertEqual(feed['changes'], [])
+        # The held-back row comes with the next poll.
+        self.assertEqual(len(self.sync(feed['next'])['changes']), 1)
+
+    def test_bad_and_expired_tokens(self):
+        self.assertIn('since', self.sync('not-a-token', status=400))
+        token = self.sync()['next']
+        with mock.patch('django.utils.timezone.now', return_value=timezone.now() + datetime.timedelta(days=31)):
+            self.sync(token, status=410)
+
+
+class SimilarListingsTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_override = override_settings(SIMILAR_LISTINGS={'PATH': directory})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.home = self.make_listing(title='Garden cottage', description='Quiet garden and orchard.',
+                                      price=Decimal('300000'), num_bedrooms=3)
+        self.twin = self.make_listing(title='Garden cottage', description='Garden with an orchard.',
+                                      price=Decimal('305000'), num_bedrooms=3)
+        self.near = self.make_listing(title='City flat', description='Close to the station.',
+                                      price=Decimal('310000'), num_bedrooms=3)
+        self.far = self.make_listing(title='Manor', description='Stables and a lake.',
+                                     price=Decimal('2500000'), num_bedrooms=8, num_bathrooms=5)
+
+    def similar(self, listing, query='', status=200):
+        response = self.client.get(f'/api/listings/{listing.pk}/similar/{query}')
+        self.assertEqual(response.status_code, status, response.content)
+        return response.json()
+
+    def test_unavailable_until_built(self):
+        self.similar(self.home, status=503)
+
+    def test_nearest_first_without_the_listing_itself(self):
+        build_similar_index()
+        data = self.similar(self.home)
+        self.assertEqual(data['property'], self.home.pk)
+        self.assertEqual([listing['id'] for listing in data['results']], [self.twin.pk, self.near.pk, self.far.pk])
+        self.assertNotIn('description', data['results'][0])
+        self.assertEqual(len(self.similar(self.home, '?k=1')['results']), 1)
+        self.assertIn('k', self.similar(self.home, '?k=500', status=400))
+        self.similar(PropertyListing(pk=999_999), status=404)
+
+    def test_two_queries(self):
+        build_similar_index()
+        with self.assertNumQueries(2):
+            self.similar(self.home)
+
+    def test_saves_and_deletes_update_the_index(self):
+        build_similar_index()
+        with self.captureOnCommitCallbacks(execute=True):
+            closer = self.make_listing(title='Garden cottage', description='Quiet garden and orchard.',
+                                       price=Decimal('300000'), num_bedrooms=3)
+        self.assertEqual(self.similar(self.home)['results'][0]['id'], closer.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.far.price = Decimal('300000')
+            self.far.num_bedrooms, self.far.num_bathrooms = 3, 2
+            self.far.save()
+            closer.delete()
+        ids = [listing['id'] for listing in self.similar(self.home)['results']]
+        self.assertNotIn(closer.pk, ids)
+        self.assertLess(ids.index(self.far.pk), ids.index(self.near.pk))
+
+
+class ListingStatsTests(APITestCase):
+
+    def test_stats(self):
+        self.make_listing(price=Decimal('300000'), num_bedrooms=3)
+        self.make_listing(price=Decimal('500000'), num_bedrooms=3)
+        self.make_listing(price=Decimal('90000'), num_bedrooms=0, num_bathrooms=1)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/listings/stats/')
+        self.assertEqual(response.status_code, 200, response.content)
+        self.assertIn('public', response['Cache-Control'])
+        data = response.json()
+
+        self.assertEqual(data['count'], 3)
+        self.assertEqual(data['price']['percentiles']['p50'], 300000)
+        self.assertEqual(sum(data['price']['histogram']['counts']) + data['price']['histogram']['above'], 3)
+        self.assertEqual(data['bedrooms'], [
+            {'bedrooms': 0, 'count': 1, 'median_price': 90000, 'median_price_per_bedroom': None},
+            {'bedrooms': 3, 'count': 2, 'median_price': 400000, 'median_price_per_bedroom': 133333.33},
+        ])
+        self.assertEqual([(row['bedrooms'], row['bathrooms'], row['count']) for row in data['rooms']],
+                         [(0, 1, 1), (3, 2, 2)])
+        self.assertEqual(data['weekly'][-1]['count'], 3)
+        self.assertEqual(data['weekly'][-1]['median_price'], 300000)
+
+    def test_empty(self):
+        data = self.client.get('/api/listings/stats/').json()
+        self.assertEqual(data['count'], 0)
+        self.assertEqual(data['bedrooms'], [])
+        self.assertEqual({week['count'] for week in data['weekly']}, {0})
+
+
+class ServiceOfferCreateTests(APITestCase):
+
+    def test_create_sets_provider_and_queues_approval(self):
+        User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        listing = self.make_listing()
+        self.client.force_authenticate(self.provider)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/api/services/', {
+                'property_id': listing.pk, 'title': 'Cleaning', 'description': 'Deep clean.',
+            }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        self.assertEqual(response.data['service_provider']['id'], self.provider.pk)
+        self.assertEqual(response.data['property']['id'], listing.pk)
+        offer = ServiceOffer.objects.get(pk=response.data['id'])
+        self.assertEqual((offer.service_provider, offer.property), (self.provider, listing))
+        self.assertEqual(Task.objects.filter(idempotency_key=f'offer:{offer.pk}:flag').count(), 1)
+        self.assertEqual([message.to for message in mail.outbox], [['staff@example.com']])
+
+    def test_create_needs_an_existing_listing(self):
+        self.client.force_authenticate(self.provider)
+        response = self.client.post('/api/services/', {
+            'property_id': 999999, 'title': 'Cleaning', 'description': 'Deep clean.',
+        }, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('property_id', response.data)
+
+
+class NestedRouteTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.home = self.make_listing(title='Home')
+        self.flat = self.make_listing(title='Flat', seller=self.buyer)
+        self.other_provider = User.objects.create_user('other', role='service_provider')
+        self.approved = self.make_offer(self.home, approved=True)
+        self.pending = self.make_offer(self.home)
+        self.elsewhere = self.make_offer(self.flat, provider=self.other_provider)
+
+    def ids(self, url, status=200):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status, response.content)
+        return sorted(row['id'] for row in response.json()['results']) if status == 200 else None
+
+    def test_listing_services(self):
+        self.assertEqual(self.ids(f'/api/listings/{self.home.pk}/services/'), [self.approved.pk, self.pending.pk])
+        self.assertEqual(self.ids(f'/api/listings/{self.home.pk}/services/?approved=true'), [self.approved.pk])
+        self.assertEqual(self.ids(f'/api/listings/{self.home.pk}/services/?approved=false'), [self.pending.pk])
+        self.assertEqual(self.ids('/api/listings/999999/services/'), [])
+        self.ids(f'/api/listings/{self.home.pk}/services/?approved=maybe', status=400)
+
+    def test_provider_services_and_approved_filter(self):
+        self.assertEqual(self.ids(f'/api/users/{self.other_provider.pk}/services/'), [self.elsewhere.pk])
+        self.assertEqual(self.ids(f'/api/users/{self.provider.pk}/services/?approved=false'), [self.pending.pk])
+        self.assertEqual(self.ids('/api/services/?approved=false'), [self.pending.pk, self.elsewhere.pk])
+
+    def test_seller_listings(self):
+        self.assertEqual(self.ids(f'/api/users/{self.seller.pk}/listings/'), [self.home.pk])
+        self.assertEqual(self.ids(f'/api/users/{self.buyer.pk}/listings/'), [self.flat.pk])
+        self.assertEqual(self.ids('/api/users/999999/listings/'), [])
+
+    def test_listing_bookings_visible_to_seller_and_own_buyer(self):
+        mine = self.make_booking(self.home)
+        theirs = self.make_booking(self.home, buyer=self.provider, scheduled_time=datetime.time(11, 0))
+        self.make_booking(self.flat, buyer=self.provider)
+        url = f'/api/listings/{self.home.pk}/bookings/'
+        self.ids(url, status=401)
+
+        self.client.force_authenticate(self.seller)
+        self.assertEqual(self.ids(url), [mine.pk, theirs.pk])
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(self.ids(url), [mine.pk])
+
+    def test_query_count_does_not_grow_with_rows(self):
+        self.client.force_authenticate(self.seller)
+        urls = [
+            f'/api/listings/{self.home.pk}/services/?approved=false',
+            f'/api/users/{self.provider.pk}/services/',
+            f'/api/listings/{self.home.pk}/bookings/',
+            f'/api/users/{self.seller.pk}/listings/',
+        ]
+
+        def counts():
+            result = []
+            for url in urls:
+                with CaptureQueriesContext(connection) as queries:
+                    self.assertEqual(self.client.get(url).status_code, 200)
+                result.append(len(queries))
+            return result
+
+        before = counts()
+        with self.captureOnCommitCallbacks(execute=True):
+            for hour in range(9, 17):
+                self.make_offer(self.home)
+                self.make_booking(self.home, scheduled_time=datetime.time(hour, 30))
+                self.make_listing(title=f'Listing {hour}')
+        self.assertEqual(counts(), before)
+
+
+class JWTAuthTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        get_user_cache().clear()
+
+    def login(self, **credentials):
+        return self.client.post('/api/token/', {'password': 'pw', **credentials}, format='json')
+
+    def bearer(self, access):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {access}')
+
+    def test_login_with_username_or_email(self):
+        for credentials in ({'username': 'seller'}, {'email': 'SELLER@example.com'}):
+            with self.subTest(**credentials):
+                response = self.login(**credentials)
+                self.assertEqual(response.status_code, 200, response.content)
+                body = response.json()
+                self.assertEqual(body['user']['id'], self.seller.id)
+                self.assertIn('access', body)
+                self.assertIn('refresh', body)
+
+    def test_bad_credentials(self):
+        self.assertEqual(self.login(username='seller', password='nope').status_code, 401)
+        User.objects.create_user('other', 'seller@example.com', 'pw')
+        # An email shared by two accounts names neither.
+        self.assertEqual(self.login(email='seller@example.com').status_code, 401)
+        self.assertEqual(self.login().status_code, 400)
+
+    def test_refresh_rotates_and_blacklists(self):
+        refresh = self.login(username='buyer').json()['refresh']
+        response = self.client.post('/api/token/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.json()['refresh'], refresh)
+        again = self.client.post('/api/token/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(again.status_code, 401)
+
+    def test_logout_blacklists_refresh(self):
+        refresh = self.login(username='buyer').json()['refresh']
+        response = self.client.post('/api/token/blacklist/', {'refresh': refresh}, format='json')
+        self.assertEqual(response.status_code, 200)
+        again = self.client.post('/api/token/refresh/', {'refresh': refresh}, format='json')
+        self.assertEqual(again.status_code, 401)
+
+    def test_user_is_cached(self):
+        self.bearer(self.login(username='buyer').json()['access'])
+        with CaptureQueriesContext(connection) as first:
+            self.assertEqual(self.client.get('/api/bookings/').status_code, 200)
+        with CaptureQueriesContext(connection) as second:
+            self.assertEqual(self.client.get('/api/bookings/').status_code, 200)
+        self.assertEqual(len(second), len(first) - 1)
+
+    def test_saving_user_evicts(self):
+        self.bearer(self.login(username='buyer').json()['access'])
+        self.client.get('/api/users/me/')
+        self.buyer.role = 'seller'
+        self.buyer.save()
+        self.assertEqual(self.client.get('/api/users/me/').json()['role'], 'seller')
+
+        self.buyer.is_active = False
+        self.buyer.save()
+        self.assertEqual(self.client.get('/api/users/me/').status_code, 401)
+
+
+class BenchApiTests(APITestCase):
+
+    def test_every_get_route_is_covered(self):
+        names = {name for name, _ in router_endpoints({'propertylisting': [5]})}
+        self.assertIn('propertylisting-availability', names)
+        self.assertIn('user-stats', names)
+        self.assertNotIn('booking-detail', names)
+        self.assertFalse(any(name.endswith(('-bulk', '-export')) for name in names))
+        paths = dict(router_endpoints({'propertylisting': [5]}))
+        self.assertEqual(paths['propertylisting-availability'], ['/api/listings/5/availability/'])
+
+    def test_writes_results(self):
+        self.make_offer(self.make_listing())
+        with tempfile.TemporaryDirectory() as directory:
+            path = f'{directory}/results.json'
+            call_command(
+                'bench_api', '--requests', '2', '--warmup', '0', '--output', path,
+                '--endpoint', 'serviceoffer', stdout=io.StringIO(),
+            )
+            with open(path) as f:
+                results = json.load(f)
+            out = io.StringIO()
+            call_command(
+                'bench_api', '--requests', '2', '--warmup', '0', '--output', f'{directory}/2.json',
+                '--endpoint', 'serviceoffer', '--compare', path, stdout=out,
+            )
+        self.assertEqual(set(results['endpoints']), {'serviceoffer-list', 'serviceoffer-detail'})
+        result = results['endpoints']['serviceoffer-list']
+        self.assertEqual((result['count'], result['errors'], result['statuses']), (2, 0, {'200': 2}))
+        self.assertIn('serviceoffer-detail', out.getvalue())
+
+    def test_generating_benchmarks_require_confirmation(self):
+        for command in ('bench_search', 'bench_listing_stats', 'bench_serializers', 'bench_asgi'):
+            with self.subTest(command=command):
+                with self.assertRaisesMessage(CommandError, '--yes'):
+                    call_command(command, stdout=io.StringIO())
+        self.assertEqual(User.objects.count(), 3)
+
+
+class BookingAvailabilityTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.listing = self.make_listing()
+        self.client.force_authenticate(self.buyer)
+
+    def book(self, client=None, **kwargs):
+        data = {'property_id': self.listing.pk, 'scheduled_date': '2030-01-01', 'scheduled_time': '10:00'}
+        data.update(kwargs)
+        return (client or self.client).post('/api/bookings/', data, format='json')
+
+    def test_double_booking_is_a_conflict(self):
+        self.assertEqual(self.book().status_code, 201)
+        response = self.book()
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Booking.objects.count(), 1)
+        self.assertEqual(self.book(scheduled_time='11:00').status_code, 201)
+
+    def test_booking_emails_are_sent_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.book().status_code, 201)
+            self.assertEqual(self.book().status_code, 409)
+            self.assertEqual(mail.outbox, [])
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox), ['buyer@example.com', 'seller@example.com'],
+        )
+        self.assertEqual(Task.objects.filter(status=Task.DONE).count(), 2)
+
+    def test_rescheduling_onto_a_booked_slot_is_a_conflict(self):
+        self.book()
+        other = self.book(scheduled_time='11:00').data['id']
+        response = self.client.patch(f'/api/bookings/{other}/', {'scheduled_time': '10:00'}, format='json')
+        self.assertEqual(response.status_code, 409)
+
+    def test_times_must_be_future_slots(self):
+        for kwargs in ({'scheduled_time': '10:30'}, {'scheduled_time': '08:00'}, {'scheduled_time': '17:00'}):
+            response = self.book(**kwargs)
+            self.assertEqual(response.status_code, 400, kwargs)
+            self.assertIn('scheduled_time', response.data)
+        response = self.book(scheduled_date='2020-01-01')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('scheduled_date', response.data)
+        self.assertFalse(Booking.objects.exists())
+
+        booking = self.book().data['id']
+        response = self.client.patch(f'/api/bookings/{booking}/', {'scheduled_time': '10:30'}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_other_integrity_errors_are_not_conflicts(self):
+        with mock.patch.object(BookingSerializer, 'save', side_effect=IntegrityError('NOT NULL constraint failed')):
+            with self.assertRaises(IntegrityError):
+                self.book()
+
+    def test_off_grid_bookings_take_their_slot(self):
+        self.make_booking(self.listing, scheduled_date=datetime.date(2030, 1, 1), scheduled_time=datetime.time(10, 30))
+        response = self.client.get(f'/api/listings/{self.listing.pk}/availability/?from=2030-01-01&to=2030-01-01')
+        self.assertNotIn('10:00', response.data['days'][0]['free'])
+        self.assertIn('11:00', response.data['days'][0]['free'])
+
+    def test_availability_lists_free_slots_in_one_query(self):
+        self.make_booking(self.listing, scheduled_date=datetime.date(2030, 1, 1), scheduled_time=datetime.time(9))
+        self.make_booking(self.listing, scheduled_date=datetime.date(2030, 1, 2), scheduled_time=datetime.time(16))
+        self.make_booking(self.listing, scheduled_date=datetime.date(2030, 1, 5), scheduled_time=datetime.time(9))
+
+        url = f'/api/listings/{self.listing.pk}/availability/?from=2030-01-01&to=2030-01-02'
+        with self.assertNumQueries(1):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        days = response.data['days']
+        self.assertEqual([day['date'] for day in days], [datetime.date(2030, 1, 1), datetime.date(2030, 1, 2)])
+        self.assertEqual(days[0]['free'], ['10:00', '11:00', '12:00', '13:00', '14:00', '15:00', '16:00'])
+        self.assertEqual(days[1]['free'], ['09:00', '10:00', '11:00', '12:00', '13:00', '14:00', '15:00'])
+
+    def test_availability_omits_past_slots(self):
+        url = f'/api/listings/{self.listing.pk}/availability/'
+        response = self.client.get(url + '?from=2020-01-01&to=2020-01-02')
+        self.assertEqual([day['free'] for day in response.data['days']], [[], []])
+
+        now = timezone.make_aware(datetime.datetime(2030, 1, 1, 12, 0))
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            response = self.client.get(url + '?from=2030-01-01&to=2030-01-01')
+            self.assertEqual(response.data['days'][0]['free'], ['13:00', '14:00', '15:00', '16:00'])
+            # What is offered can be booked; the slot starting now can't.
+            self.assertEqual(self.book(scheduled_time='13:00').status_code, 201)
+            self.assertEqual(self.book(scheduled_time='12:00').status_code, 400)
+
+    def test_availability_errors(self):
+        self.assertEqual(self.client.get('/api/listings/999999/availability/').status_code, 404)
+        url = f'/api/listings/{self.listing.pk}/availability/'
+        self.assertEqual(self.client.get(url + '?from=2030-01-05&to=2030-01-01').status_code, 400)
+        self.assertEqual(self.client.get(url + '?from=2030-01-01&to=2030-12-31').status_code, 400)
+
+
+class ConcurrentBookingTests(TransactionTestCase):
+    """Many simultaneous creates for one slot: exactly one wins."""
+
+    CLIENTS = 12
+
+    def test_racing_creates_for_the_same_slot(self):
+        seller = User.objects.create_user('seller', role='seller')
+        listing = PropertyListing.objects.create(
+            seller=seller, title='Popular', description='Everyone wants it.', address='1 Hot Street',
+            num_bedrooms=2, num_bathrooms=1, price=Decimal('100000'),
+        )
+        buyers = [User.objects.create_user(f'buyer-{i}', role='buyer') for i in range(self.CLIENTS)]
+        view = BookingViewSet.as_view({'post': 'create'})
+        factory = APIRequestFactory()
+        barrier = threading.Barrier(self.CLIENTS)
+
+        def attempt(buyer):
+            request = factory.post('/api/bookings/', {
+                'property_id': listing.pk, 'scheduled_date': '2030-06-01', 'scheduled_time': '10:00',
+            }, format='json')
+            force_authenticate(request, user=buyer)
+            barrier.wait()
+            try:
+                while True:
+                    try:
+                        return view(request).status_code
+                    except OperationalError:
+                        # SQLite serialises writers with "database is locked";
+                        # retry like a client would. MySQL blocks instead.
+                        time.sleep(0.01)
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(self.CLIENTS) as pool:
+            codes = list(pool.map(attempt, buyers))
+
+        self.assertEqual(sorted(codes), [201] + [409] * (self.CLIENTS - 1))
+        self.assertEqual(Booking.objects.count(), 1)
+
+
+class ExportTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        self.staff = User.objects.create_user('staff', role='buyer', is_staff=True)
+        self.client.force_authenticate(self.staff)
+        self.listing = self.make_listing(title='Semi, "detached"')
+        for hour in range(9, 14):
+            self.make_booking(self.listing, scheduled_time=datetime.time(hour))
+
+    def read(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        return b''.join(response.streaming_content)
+
+    def test_csv(self):
+        response = self.client.get('/api/bookings/export/')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(io.StringIO(self.read(response).decode())))
+        self.assertEqual(rows[0], EXPORT_FIELDS[Booking])
+        self.assertEqual(len(rows), 6)
+        self.assertEqual(rows[1][rows[0].index('property__title')], 'Semi, "detached"')
+
+    def test_ndjson_gzip(self):
+        response = self.client.get('/api/listings/export/?type=ndjson&gzip=1')
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        self.assertIn('.ndjson.gz', response['Content-Disposition'])
+        lines = gzip.decompress(self.read(response)).decode().splitlines()
+        self.assertEqual(json.loads(lines[0])['title'], 'Semi, "detached"')
+        self.assertEqual(json.loads(lines[0])['price'], '350000.00')
+
+    def test_batches_cover_every_row_once(self):
+        batches = list(iter_rows(Booking.objects.all(), ['scheduled_time'], batch_size=2))
+        self.assertEqual([len(batch) for batch in batches], [2, 2, 1])
+        self.assertEqual(
+            [row[0].hour for batch in batches for row in batch], [9, 10, 11, 12, 13]
+        )
+
+    def test_staff_only(self):
+        self.client.force_authenticate(self.buyer)
+        self.assertEqual(self.client.get('/api/bookings/export/').status_code, 403)
+
+    def test_unknown_type(self):
+        self.assertEqual(self.client.get('/api/services/export/?type=xml').status_code, 400)
+
+
+class InstrumentationTests(APITestCase):
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.make_listing()
+
+    def test_server_timing_header(self):
+        response = self.client.get('/api/listings/')
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn('desc="1 queries"', timing)
+        self.assertIn('render;dur=', timing)
+        self.assertIn('total;dur=', timing)
+
+    def test_metrics_are_aggregated_per_action(self):
+        self.client.get('/api/listings/')
+        self.client.get('/api/listings/search/?q=home')
+        metrics = registry.snapshot()
+        self.assertEqual(metrics['propertylisting.list']['requests'], 1)
+        self.assertEqual(metrics['propertylisting.list']['queries'], 1)
+        self.assertEqual(metrics['propertylisting.search']['queries'], 2)
+
+    @override_settings(QUERY_BUDGETS={'propertylisting.list': 0}, QUERY_BUDGETS_STRICT=True)
+    def test_budget_overrun_fails_in_strict_mode(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get('/api/listings/')
+
+    @override_settings(QUERY_BUDGETS={'propertylisting.list': 0}, QUERY_BUDGETS_STRICT=False)
+    def test_budget_overrun_is_counted_otherwise(self):
+        with self.assertLogs('api.instrumentation', 'WARNING'):
+            self.assertEqual(self.client.get('/api/listings/').status_code, 200)
+        self.assertEqual(registry.snapshot()['propertylisting.list']['budget_violations'], 1)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_prometheus_endpoint(self):
+        self.client.get('/api/listings/')
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer scrape-secret')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('http_requests_total{endpoint="propertylisting.list"} 1', body)
+        self.assertIn('db_queries_total{endpoint="propertylisting.list"} 1', body)
+        self.assertIn('http_request_duration_seconds_bucket{endpoint="propertylisting.list",le="+Inf"} 1', body)
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_prometheus_endpoint_is_restricted(self):
+        # Proxied requests all come from the proxy's address.
+        self.assertEqual(self.client.get('/api/metrics/', REMOTE_ADDR='127.0.0.1').status_code, 403)
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer wrong')
+        self.assertEqual(response.status_code, 403)
+        self.buyer.is_staff = True
+        self.buyer.save()
+        self.client.force_login(self.buyer)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 200)
+
+    def test_prometheus_endpoint_without_token(self):
+        response = self.client.get('/api/metrics/', HTTP_AUTHORIZATION='Bearer ')
+        self.assertEqual(response.status_code, 403)
+
+
+LISTING_VIEW = PropertyListingViewSet.as_view({'get': 'list', 'post': 'create'})
+BOOKING_VIEW = BookingViewSet.as_view({'get': 'list'})
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaRoutingTests(APITestCase):
+    """
+    Routing decisions only: the test database has no ``replica`` alias, so
+    anything routed there by mistake fails with ConnectionDoesNotExist.
+    ``ReplicaDatabaseTests`` runs requests against a real one.
+    """
+
+    def route(self, request, view, work):
+        request.resolver_match = ResolverMatch(view, (), {})
+        seen = {}
+
+        def get_response(request):
+            seen['result'] = work()
+            return HttpResponse()
+
+        response = ReplicaRoutingMiddleware(get_response)(request)
+        return seen['result'], response
+
+    def test_safe_reads_go_to_replica(self):
+        request = APIRequestFactory().get('/api/listings/')
+        db, _ = self.route(request, LISTING_VIEW, lambda: PropertyListing.objects.all().db)
+        self.assertEqual(db, 'replica')
+
+    def test_views_without_opt_in_read_primary(self):
+        request = APIRequestFactory().get('/api/bookings/')
+        db, _ = self.route(request, BOOKING_VIEW, lambda: Booking.objects.all().db)
+        self.assertEqual(db, 'default')
+
+    def test_unsafe_requests_read_primary(self):
+        request = APIRequestFactory().post('/api/listings/')
+        db, _ = self.route(request, LISTING_VIEW, lambda: PropertyListing.objects.all().db)
+        self.assertEqual(db, 'default')
+
+    def test_pin_cookie_keeps_reads_on_primary(self):
+        request = APIRequestFactory().get('/api/listings/')
+        request.COOKIES[PIN_COOKIE] = '1'
+        db, _ = self.route(request, LISTING_VIEW, lambda: PropertyListing.objects.all().db)
+        self.assertEqual(db, 'default')
+
+    def test_async_views_opt_in(self):
+        request = APIRequestFactory().get('/api/async/services/')
+        db, _ = self.route(request, ServiceOfferReadView.as_view(), lambda: ServiceOffer.objects.all().db)
+        self.assertEqual(db, 'replica')
+
+    def test_reads_before_resolution_use_primary(self):
+        request = APIRequestFactory().get('/api/listings/')
+        seen = {}
+
+        def get_response(request):
+            seen['early'] = PropertyListing.objects.all().db
+            request.resolver_match = ResolverMatch(LISTING_VIEW, (), {})
+            seen['late'] = PropertyListing.objects.all().db
+            return HttpResponse()
+
+        ReplicaRoutingMiddleware(get_response)(request)
+        self.assertEqual(seen, {'early': 'default', 'late': 'replica'})
+
+    def test_write_pins_later_reads_in_request(self):
+        router = ReplicaRouter()
+        request = APIRequestFactory().get('/api/listings/')
+
+        def work():
+            before = router.db_for_read(PropertyListing)
+            router.db_for_write(PropertyListing)
+            return before, router.db_for_read(PropertyListing)
+
+        (before, after), _ = self.route(request, LISTING_VIEW, work)
+        self.assertEqual((before, after), ('replica', 'default'))
+
+    def test_outside_requests_use_primary(self):
+        self.assertEqual(ReplicaRouter().db_for_read(PropertyListing), 'default')
+        self.assertFalse(ReplicaRouter().allow_migrate('replica', 'core'))
+        self.assertIsNone(ReplicaRouter().allow_migrate('default', 'core'))
+
+    def test_write_sets_pin_cookie(self):
+        self.client.force_authenticate(self.seller)
+        response = self.client.post('/api/listings/bulk/', [{
+            'title': 'Flat', 'description': 'Small', 'address': '2 Side Street',
+            'num_bedrooms': 1, 'num_bathrooms': 1, 'price': '100000.00',
+        }], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertIn(PIN_COOKIE, response.cookies)
+
+        # Pinned by the cookie, so this read doesn't touch the replica alias.
+        self.assertEqual(self.client.get('/api/listings/').status_code, 200)
+
+    def test_reads_set_no_cookie(self):
+        self.assertEqual(self.client.get('/api/bookings/').status_code, 401)
+        response = self.client.get('/api/listings/', HTTP_COOKIE=f'{PIN_COOKIE}=1')
+        self.assertNotIn(PIN_COOKIE, response.cookies)
+
+
+@override_settings(REPLICA_DATABASES=['replica'])
+class ReplicaDatabaseTests(APITestCase):
+    """
+    ``replica`` is a second SQLite database holding a copy of the test
+    database taken in ``setUpTestData``; rows written afterwards only exist
+    on ``default``, as on a replica that hasn't caught up yet.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        directory = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, directory)
+        cls.replica_path = f'{directory}/replica.sqlite3'
+        connections.settings['replica'] = {**connections.settings['default'], 'NAME': cls.replica_path}
+        cls.addClassCleanup(cls.drop_replica)
+        # Set here rather than on the class: the runner checks the aliases in
+        # ``databases`` before any test runs, when ``replica`` doesn't exist.
+        cls.databases = {'default', 'replica'}
+        super().setUpClass()
+
+    @classmethod
+    def drop_replica(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+
+    @classmethod
+    def setUpTestData(cls):
+        seller = User.objects.create_user('replicated-seller', 'rs@example.com', 'pw', role='seller')
+        provider = User.objects.create_user(
+            'replicated-provider', 'rp@example.com', 'pw', role='service_provider'
+        )
+        cls.listing = PropertyListing.objects.create(
+            seller=seller, title='Replicated', description='Copied', address='3 Copy Lane',
+            num_bedrooms=2, num_bathrooms=1, price=Decimal('200000.00'),
+        )
+        ServiceOffer.objects.create(
+            service_provider=provider, property=cls.listing, title='Replicated offer',
+            description='Copied',
+        )
+        # iterdump() reads through the test transaction, which backup() can't.
+        copy = sqlite3.connect(cls.replica_path)
+        copy.executescript('\n'.join(connection.connection.iterdump()))
+        copy.close()
+
+    def setUp(self):
+        super().setUp()
+        self.make_offer(self.listing, title='Lagging offer')
+
+    def offer_titles(self, **kwargs):
+        response = self.client.get('/api/services/', **kwargs)
+        self.assertEqual(response.status_code, 200)
+        return sorted(offer['title'] for offer in response.json()['results'])
+
+    def test_reads_are_served_by_replica(self):
+        self.assertEqual(self.offer_titles(), ['Replicated offer'])
+
+    def test_pinned_reads_use_primary(self):
+        self.assertEqual(
+            self.offer_titles(HTTP_COOKIE=f'{PIN_COOKIE}=1'), ['Lagging offer', 'Replicated offer'],
+        )
+
+    def test_writes_go_to_primary(self):
+        self.client.force_authenticate(self.seller)
+        response = self.client.post('/api/listings/bulk/', [{
+            'title': 'Flat', 'description': 'Small', 'address': '2 Side Street',
+            'num_bedrooms': 1, 'num_bathrooms': 1, 'price': '100000.00',
+        }], format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertTrue(PropertyListing.objects.using('default').filter(title='Flat').exists())
+        self.assertFalse(PropertyListing.objects.using('replica').filter(title='Flat').exists())
+
+    def test_cached_responses_are_rendered_from_primary(self):
+        self.make_listing(title='Lagging')
+        titles = [listing['title'] for listing in self.client.get('/api/listings/').json()['results']]
+        self.assertEqual(sorted(titles), ['Lagging', 'Replicated'])
+
+        # Served from the cache, still without the replica's lag.
+        response = self.client.get('/api/listings/')
+        self.assertEqual(sorted(listing['title'] for listing in response.json()['results']), sorted(titles))
+        # The replica itself is behind.
+        self.assertEqual(
+            list(PropertyListing.objects.using('replica').values_list('title', flat=True)), ['Replicated'],
+        )
+
+
+class AsyncReadViewTests(APITestCase):
+    """The async endpoints, driven through the ASGI handler."""
+
+    def setUp(self):
+        super().setUp()
+        self.listings = [self.make_listing(title=f'Home {i}') for i in range(3)]
+        self.make_offer(self.listings[0])
+
+    async def test_list_matches_viewset(self):
+        expected = (await self.async_client.get('/api/listings/?page_size=2')).json()
+        response = await self.async_client.get('/api/async/listings/?page_size=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        body = response.json()
+        self.assertEqual(body['results'], expected['results'])
+        self.assertEqual(
+            body['next'].split('?')[1], expected['next'].split('?')[1],
+        )
+
+        rest = (await self.async_client.get(body['next'])).json()
+        self.assertEqual([item['title'] for item in rest['results']], ['Home 0'])
+        self.assertIsNone(rest['next'])
+
+    async def test_detail_matches_viewset(self):
+        pk = self.listings[1].pk
+        expected = await self.async_client.get(f'/api/listings/{pk}/')
+        response = await self.async_client.get(f'/api/async/listings/{pk}/')
+        self.assertEqual(response.content, expected.content)
+
+        missing = await self.async_client.get('/api/async/listings/999999/')
+        self.assertEqual(missing.status_code, 404)
+        self.assertEqual(missing.json(), (await self.async_client.get('/api/listings/999999/')).json())
+
+    async def test_services_match_viewset(self):
+        expected = (await self.async_client.get('/api/services/')).json()
+        response = await self.async_client.get('/api/async/services/')
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        self.assertEqual(response.json()['results'], expected['results'])
+
+    async def test_invalid_cursor(self):
+        response = await self.async_client.get('/api/async/listings/?cursor=bogus')
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'detail': 'Invalid cursor'})
+
+    async def test_listings_are_cached_and_invalidated(self):
+        first = await self.async_client.get('/api/async/listings/')
+        again = await self.async_client.get('/api/async/listings/', headers={'If-None-Match': first['ETag']})
+        self.assertEqual(again.status_code, 304)
+        self.assertIn('desc="0 queries"', again['Server-Timing'])
+
+        listing = self.listings[0]
+
+        def rename():
+            with self.captureOnCommitCallbacks(execute=True):
+                listing.title = 'Renamed'
+                listing.save()
+
+        await sync_to_async(rename)()
+        response = await self.async_client.get('/api/async/listings/')
+        self.assertIn('Renamed', [item['title'] for item in response.json()['results']])
+
+
+class SparseFieldsTests(APITestCase):
+    def setUp(self):
+        super().setUp()
+        self.listing = self.make_listing()
+        self.make_offer(self.listing)
+
+    def test_list_is_compact(self):
+        with CaptureQueriesContext(connection) as queries:
+            item = self.client.get('/api/listings/').json()['results'][0]
+        self.assertNotIn('description', item)
+        self.assertEqual(item['seller'], {'id': self.seller.pk, 'username': 'seller'})
+        sql = queries[0]['sql']
+        self.assertNotIn('"description"', sql)
+        self.assertNotIn('"email"', sql)
+
+    def test_detail_is_full(self):
+        item = self.client.get(f'/api/listings/{self.listing.pk}/').json()
+        self.assertEqual(item['description'], self.listing.description)
+        self.assertEqual(item['seller']['email'], 'seller@example.com')
+
+    def test_nested_listing_is_summarized(self):
+        item = self.client.get('/api/services/').json()['results'][0]
+        self.assertEqual(item['service_provider'], {'id': self.provider.pk, 'username': 'provider'})
+        self.assertEqual(set(item['property']), {'id', 'title', 'address', 'image', 'price'})
+
+    def test_booking_list_collapses_relations(self):
+        self.make_booking(self.listing)
+        self.client.force_authenticate(self.buyer)
+        item = self.client.get('/api/bookings/').json()['results'][0]
+        self.assertEqual(item['buyer'], {'id': self.buyer.pk, 'username': 'buyer'})
+        self.assertNotIn('description', item['property'])
+
+        expanded = self.client.get('/api/bookings/?expand=property').json()['results'][0]
+        self.assertEqual(expanded['property']['seller']['email'], 'seller@example.com')
+        self.assertEqual(expanded['property']['description'], self.listing.description)
+
+    def test_fields_selects_columns(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/listings/?fields=id,title')
+        self.assertEqual(response.json()['results'], [{'id': self.listing.pk, 'title': 'Family home'}])
+        sql = queries[0]['sql']
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('"price"', sql)
+        # Keyset pagination still reads created_at without a per-row query.
+        self.assertEqual(len(queries), 1)
+
+    def test_fields_on_detail(self):
+        response = self.client.get(f'/api/listings/{self.listing.pk}/?fields=price,seller')
+        self.assertEqual(set(response.json()), {'price', 'seller'})
+        self.assertEqual(response.json()['seller']['role'], 'seller')
+
+    def test_expand_in_list(self):
+        item = self.client.get('/api/listings/?expand=seller').json()['results'][0]
+        self.assertEqual(item['seller']['email'], 'seller@example.com')
+
+    def test_unknown_names_are_rejected(self):
+        response = self.client.get('/api/listings/?fields=id,password')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'fields': ['Unknown field(s): password.']})
+        self.assertEqual(self.client.get('/api/listings/?expand=nope').status_code, 400)
+
+    def test_writes_render_in_full(self):
+        self.client.force_authenticate(self.buyer)
+        response = self.client.post('/api/bookings/?fields=id', {
+            'property_id': self.listing.pk, 'scheduled_date': '2030-02-01', 'scheduled_time': '10:00',
+        }, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()['property']['description'], self.listing.description)
+
+    async def test_async_views_match(self):
+        for query in ('', '?fields=id,title', '?expand=seller'):
+            expected = (await self.async_client.get(f'/api/listings/{query}')).json()
+            response = (await self.async_client.get(f'/api/async/listings/{query}')).json()
+            self.assertEqual(response['results'], expected['results'])
+        response = await self.async_client.get('/api/async/services/?fields=bogus')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'fields': ['Unknown field(s): bogus.']})
+
+
+class FastPathTests(APITestCase):
+    """List responses must be byte-identical with and without the fast path."""
+
+    def setUp(self):
+        super().setUp()
+        staff = User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        self.client.force_authenticate(staff)
+        tricky = 'Caf\u00e9 \u201cquoted\u201d \\ / \u2028 \u2029 \x07 \U0001f3e1'
+        plain = self.make_listing()
+        fancy = self.make_listing(title=tricky, description=tricky, address='\u00dcber Stra\u00dfe 1')
+        PropertyListing.objects.filter(pk=fancy.pk).update(
+            image='property_images/house.jpg', latitude=Decimal('-33.868800'),
+            longitude=Decimal('151.209300'), geohash='r3gx2f77bn44',
+            renditions={'thumbnail': {'width': 320, 'height': 213, 'webp': 'r/a.webp', 'jpeg': 'r/a.jpg'}},
+        )
+        self.make_booking(plain, message=tricky)
+        self.make_booking(fancy, scheduled_time=datetime.time(11, 30), message=None)
+        self.make_offer(fancy, title=tricky, approved=True)
+
+    def assertIdentical(self, url):
+        get_backend().clear()
+        with mock.patch.object(fastpath, 'encode_json', wraps=fastpath.encode_json) as encode:
+            fast = self.client.get(url)
+        encode.assert_called_once()
+        get_backend().clear()
+        with mock.patch.object(fastpath.FastListMixin, 'fast_response', return_value=None):
+            slow = self.client.get(url)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast['Content-Type'], slow['Content-Type'])
+        self.assertEqual(fast.content, slow.content)
+        return fast
+
+    def test_byte_identical(self):
+        for url in [
+            '/api/listings/', '/api/listings/?page_size=1', '/api/listings/?expand=seller',
+            '/api/listings/?fields=id,title,image,renditions,created_at',
+            '/api/listings/search/?q=quoted', '/api/listings/search/?min_price=1',
+            '/api/listings/?near=-33.87,151.21&radius=5',
+            '/api/bookings/', '/api/bookings/?expand=property,buyer',
+            '/api/services/', '/api/services/?expand=property,service_provider',
+            '/api/users/',
+        ]:
+            with self.subTest(url=url):
+                self.assertIdentical(url)
+
+    def test_cursor_pages_match(self):
+        first = self.assertIdentical('/api/listings/?page_size=1').json()
+        self.assertIdentical(first['next'])
+
+    def test_without_orjson(self):
+        with mock.patch.object(fastpath, 'orjson', None):
+            self.assertIdentical('/api/listings/?expand=seller')
+
+    def test_fast_path_is_one_query(self):
+        response = self.client.get('/api/services/')
+        self.assertIn('desc="1 queries"', response['Server-Timing'])
+        self.assertIsInstance(response, HttpResponse)
+
+    def test_other_renderers_use_serializers(self):
+        with mock.patch.object(fastpath, 'compile_serializer') as compile_serializer:
+            response = self.client.get('/api/listings/?format=api')
+        self.assertEqual(response.status_code, 200)
+        compile_serializer.assert_not_called()
+
+    def test_unsupported_fields_fall_back(self):
+        class WithMethod(PropertyListingSerializer):
+            extra = serializers.SerializerMethodField()
+
+            def get_extra(self, obj):
+                return 1
+
+        self.assertIsNone(fastpath.compile_serializer(WithMethod()))
+        self.assertIsNotNone(fastpath.compile_serializer(PropertyListingSerializer()))
@@ -0,0 +1,181 @@
+"""
+Token-bucket throttling for the public read endpoints.
+
+Each client (the user for authenticated requests, otherwise the client IP
+as DRF resolves it from ``REST_FRAMEWORK['NUM_PROXIES']``, so only the
+entries our own proxies appended to X-Forwarded-For count) owns a bucket of ``burst``
+tokens that refills at ``rate``. A request takes one token or is refused
+with 429 and a ``Retry-After`` of the time until the next token. Unlike a
+fixed window, short bursts up to ``burst`` pass immediately while the
+sustained rate stays bounded.
+
+Configured through ``settings.READ_THROTTLE``::
+
+    READ_THROTTLE = {
+        'BACKEND': 'api.throttling.LocMemBuckets',   # or 'api.throttling.RedisBuckets'
+        'RATES': {
+            'anon': {'rate': '120/min', 'burst': 60},
+            'user': {'rate': '600/min', 'burst': 120},
+        },
+        'OPTIONS': {'max_entries': 100_000},
+    }
+
+A scope whose entry is ``None`` is not throttled. Buckets in
+``LocMemBuckets`` are per process, so the effective limit is multiplied by
+the worker count; ``RedisBuckets`` shares them.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.throttling import BaseThrottle
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def parse_rate(rate):
+    """``'120/min'`` -> tokens per second."""
+    count, period = rate.split('/')
+    return int(count) / PERIODS[period[0]]
+
+
+class LocMemBuckets:
+    """Per-process buckets, least recently used dropped past ``max_entries``."""
+
+    blocking = False
+
+    def __init__(self, max_entries=100_000):
+        self.max_entries = max_entries
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst):
+        """
+        Take a token from ``key``'s bucket. Returns ``0`` if one was
+        available, otherwise the seconds until one is.
+        """
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            wait = 0 if tokens >= 1 else (1 - tokens) / rate
+            self._buckets[key] = (tokens - 1 if not wait else tokens, now)
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_entries:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# KEYS[1] bucket; ARGV rate, burst. Server time keeps processes consistent.
+TAKE_SCRIPT = """
+local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or burst
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBuckets:
+    """
+    Buckets shared through any Redis-protocol server. Each take is one
+    atomic script call; idle buckets expire once they would be full again.
+    """
+
+    blocking = True
+
+    def __init__(self, url='redis://localhost:6379/0', prefix='throttle:', client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as exc:
+                raise ImproperlyConfigured(
+                    'api.throttling.RedisBuckets requires the "redis" package.'
+                ) from exc
+            client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self.script = client.register_script(TAKE_SCRIPT)
+
+    def take(self, key, rate, burst):
+        return float(self.script(keys=[self.prefix + key], args=[rate, burst]))
+
+
+_buckets = None
+_buckets_lock = threading.Lock()
+
+
+def get_buckets():
+    global _buckets
+    if _buckets is None:
+        with _buckets_lock:
+            if _buckets is None:
+                config = getattr(settings, 'READ_THROTTLE', {})
+                backend_class = import_string(config.get('BACKEND', 'api.throttling.LocMemBuckets'))
+                _buckets = backend_class(**config.get('OPTIONS', {}))
+    return _buckets
+
+
+@receiver(setting_changed)
+def reset_buckets(setting, **kwargs):
+    global _buckets
+    if setting == 'READ_THROTTLE':
+        _buckets = None
+
+
+def get_limit(scope):
+    """``(tokens per second, burst)`` for ``scope``, or ``None`` if unthrottled."""
+    limit = getattr(settings, 'READ_THROTTLE', {}).get('RATES', {}).get(scope)
+    if limit is None:
+        return None
+    return parse_rate(limit['rate']), limit.get('burst', 1)
+
+
+def take(scope, ident):
+    """Seconds to wait before ``ident`` may make a ``scope`` request; ``0`` if now."""
+    limit = get_limit(scope)
+    if limit is None:
+        return 0
+    return get_buckets().take(f'{scope}:{ident}', *limit)
+
+
+async def atake(scope, ident):
+    """``take`` for async views; blocking stores run in a worker thread."""
+    if get_limit(scope) is not None and get_buckets().blocking:
+        return await sync_to_async(take, thread_sensitive=False)(scope, ident)
+    return take(scope, ident)
+
+
+class ReadThrottle(BaseThrottle):
+    """Token bucket per user or IP on safe (read) requests; writes pass."""
+
+    def allow_request(self, request, view):
+        self.wait_seconds = 0
+        if request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return True
+        if request.user and request.user.is_authenticated:
+            scope, ident = 'user', request.user.pk
+        else:
+            scope, ident = 'anon', self.get_ident(request)
+        self.wait_seconds = take(scope, ident)
+        return not self.wait_seconds
+
+    def wait(self):
+        return math.ceil(self.wait_seconds) or None
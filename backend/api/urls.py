@@ -5,6 +5,10 @@ from .views.listings_view import PropertyListingViewSet
 from .views.bookings_view import BookingViewSet
 from .views.services_view import ServiceOfferViewSet
 from .views.users_view import UserViewSet
+from .views.auth_view import LoginView
+from rest_framework_simplejwt.views import TokenBlacklistView, TokenRefreshView
+from .async_views import ListingReadView, ServiceOfferReadView
+from .instrumentation import metrics_view
 
 # Create a router and register our viewsets with it.
 router = DefaultRouter()
@@ -15,7 +19,40 @@ router.register(r'users', UserViewSet, basename='user')
 
 # The API URLs are now determined automatically by the router.
 # Additionally, we include the login URLs for the browsable API.
+# Lists scoped to one listing or provider, served by the same viewsets.
+nested_list = {'get': 'list'}
+
 urlpatterns = [
     path('', include(router.urls)),
+    path(
+        'listings/<int:listing_pk>/services/',
+        ServiceOfferViewSet.as_view(nested_list, basename='listing-serviceoffer'),
+        name='listing-serviceoffer-list',
+    ),
+    path(
+        'listings/<int:listing_pk>/bookings/',
+        BookingViewSet.as_view(nested_list, basename='listing-booking'),
+        name='listing-booking-list',
+    ),
+    path(
+        'users/<int:seller_pk>/listings/',
+        PropertyListingViewSet.as_view(nested_list, basename='user-propertylisting'),
+        name='user-propertylisting-list',
+    ),
+    path(
+        'users/<int:provider_pk>/services/',
+        ServiceOfferViewSet.as_view(nested_list, basename='user-serviceoffer'),
+        name='user-serviceoffer-list',
+    ),
+    path('metrics/', metrics_view, name='metrics'),
+    # JWT login, refresh (rotating) and logout; see api/auth.py.
+    path('token/', LoginView.as_view(), name='token_obtain_pair'),
+    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/blacklist/', TokenBlacklistView.as_view(), name='token_blacklist'),
+    # Event-loop versions of the hot read endpoints, for ASGI deployments.
+    path('async/listings/', ListingReadView.as_view(), name='async-listing-list'),
+    path('async/listings/<int:pk>/', ListingReadView.as_view(), name='async-listing-detail'),
+    path('async/services/', ServiceOfferReadView.as_view(), name='async-serviceoffer-list'),
+    path('async/services/<int:pk>/', ServiceOfferReadView.as_view(), name='async-serviceoffer-detail'),
     path('api-auth/', include('rest_framework.urls', namespace='rest_framework')) # For browsable API
 ]
\ No newline at end of file
@@ -0,0 +1,6 @@
+from rest_framework_simplejwt.views import TokenObtainPairView
+from ..auth import LoginSerializer
+
+class LoginView(TokenObtainPairView):
+    """``POST /api/token/`` with a username or email; see ``api.auth``."""
+    serializer_class = LoginSerializer
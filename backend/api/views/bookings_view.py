@@ -1,9 +1,16 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Q
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
 from core.models.bookings import Booking
+from core.notifications import booking_created
+from ..exports import ExportMixin
+from ..exceptions import SlotUnavailable
+from ..fastpath import FastListMixin
+from ..querysets import EagerLoadingMixin
 from ..serializers.bookings_serializer import BookingSerializer
 
-class BookingViewSet(viewsets.ModelViewSet):
+class BookingViewSet(ExportMixin, FastListMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = Booking.objects.all()
     serializer_class = BookingSerializer
     permission_classes = [IsAuthenticated]
@@ -11,13 +18,48 @@ class BookingViewSet(viewsets.ModelViewSet):
     def get_queryset(self):
         """
         Restricts the returned bookings to the current authenticated user,
-        or all bookings if the user is staff.
+        or all bookings if the user is staff. Under ``/listings/{id}/bookings/``
+        only that listing's, all of them for its seller.
         """
         user = self.request.user
+        queryset = super().get_queryset()
+        if 'listing_pk' in self.kwargs:
+            queryset = queryset.filter(property_id=self.kwargs['listing_pk'])
+            if not user.is_staff:
+                return queryset.filter(Q(buyer=user) | Q(property__seller=user))
         if user.is_staff:
-            return Booking.objects.all()
-        return Booking.objects.filter(buyer=user)
+            return queryset
+        return queryset.filter(buyer=user)
 
     def perform_create(self, serializer):
         # Automatically set the buyer to the current authenticated user
-        serializer.save(buyer=self.request.user)
\ No newline at end of file
+        self.save_slot(serializer, on_saved=booking_created, buyer=self.request.user)
+
+    def perform_update(self, serializer):
+        self.save_slot(serializer)
+
+    def save_slot(self, serializer, on_saved=None, **kwargs):
+        # The unique (property, date, time) constraint decides races; the
+        # savepoint keeps the outer transaction usable after a conflict.
+        try:
+            with transaction.atomic():
+                instance = serializer.save(**kwargs)
+                if on_saved is not None:
+                    # Queued in the same transaction, so never for a lost race.
+                    on_saved(instance)
+        except IntegrityError:
+            # Only a lost race for the slot is a 409; anything else is a bug.
+            if self.slot_taken(serializer):
+                raise SlotUnavailable()
+            raise
+
+    def slot_taken(self, serializer):
+        data, instance = serializer.validated_data, serializer.instance
+        slot = {
+            field: data[field] if field in data else getattr(instance, field)
+            for field in ('property', 'scheduled_date', 'scheduled_time')
+        }
+        taken = Booking.objects.filter(**slot)
+        if instance is not None:
+            taken = taken.exclude(pk=instance.pk)
+        return taken.exists()
\ No newline at end of file
@@ -1,10 +1,186 @@
+from django.utils.cache import patch_cache_control
 from rest_framework import viewsets
+from rest_framework.decorators import action
+from rest_framework.generics import get_object_or_404
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from rest_framework.response import Response
+from core.analytics import get_config as analytics_config, listing_stats
+from core.availability import free_slots, slot_config
+from core.changes import ExpiredToken, InvalidToken, changes_since
+from core.geo import address_changed, clear_locations, within_bbox, within_radius
 from core.models.listings import PropertyListing
-from ..serializers.listings_serializer import PropertyListingSerializer
+from core.search import facet_counts, filter_listings, index_listings
+from core.similar import FEATURE_FIELDS, IndexUnavailable, schedule_refresh, similar_to
+from core.stats import record_changes
+from ..bulk import BulkMixin
+from ..cache import CachedResponseMixin, invalidate_listings
+from ..exceptions import SimilarIndexUnavailable, SyncTokenExpired
+from ..exports import ExportMixin
+from ..fastpath import FastListMixin
+from ..querysets import EagerLoadingMixin, eager_load
+from ..serializers.listings_serializer import (
+    AvailabilityQuerySerializer, ListingSearchSerializer, LocationQuerySerializer,
+    PropertyListingBulkSerializer, PropertyListingSerializer, SimilarQuerySerializer,
+)
+from ..throttling import ReadThrottle
 
 
-class PropertyListingViewSet(viewsets.ModelViewSet):
+class PropertyListingViewSet(
+    ExportMixin, BulkMixin, CachedResponseMixin, FastListMixin, EagerLoadingMixin,
+    viewsets.ModelViewSet,
+):
     queryset = PropertyListing.objects.all()
     serializer_class = PropertyListingSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    throttle_classes = [ReadThrottle]
+    replica_reads = True
+    bulk_serializer_class = PropertyListingBulkSerializer
+    bulk_owner_field = 'seller'
+
+    def bulk_written(self, objs, created=False):
+        # Bulk writes bypass the post_save handlers that keep these in sync.
+        index_listings(objs)
+        record_changes(objs, created=created)
+        clear_locations([obj.pk for obj in objs if address_changed(obj)])
+        invalidate_listings([obj.pk for obj in objs])
+        schedule_refresh([obj.pk for obj in objs])
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if 'seller_pk' in self.kwargs:
+            queryset = queryset.filter(seller_id=self.kwargs['seller_pk'])
+        return queryset
+
+    def filter_queryset(self, queryset):
+        """
+        ``?near=lat,lng&radius=km`` (default 10 km) or
+        ``?bbox=south,west,north,east`` on list and search; only geocoded
+        listings match.
+        """
+        queryset = super().filter_queryset(queryset)
+        if self.action not in ('list', 'search'):
+            return queryset
+        params = LocationQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        location = params.validated_data
+        if 'near' in location:
+            return within_radius(queryset, *location['near'], location['radius'])
+        if 'bbox' in location:
+            return within_bbox(queryset, *location['bbox'])
+        return queryset
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Server-side listing search.
+
+        Accepts ``q`` (all terms must match title, description or address)
+        and ``min_``/``max_`` bounds for ``price``, ``bedrooms`` and
+        ``bathrooms``, plus the ``near``/``bbox`` location filters. Returns
+        a page of results plus facet counts for the whole filtered set.
+        """
+        params = ListingSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        queryset = filter_listings(self.filter_queryset(self.get_queryset()), **params.validated_data)
+        extra = {'facets': facet_counts(queryset)}
+
+        response = self.fast_response(queryset, extra)
+        if response is None:
+            page = self.paginate_queryset(queryset)
+            response = self.get_paginated_response(self.get_serializer(page, many=True).data)
+            response.data.update(extra)
+        return response
+
+    @action(detail=False, methods=['get'])
+    def changes(self, request):
+        """
+        Listings created, updated or deleted since ``?since=<token>``, for
+        clients keeping a local copy (see core.changes)::
+
+            {"changes": [...], "deleted": [ids], "next": "<token>", "has_more": false}
+
+        Without ``since`` the feed starts from the beginning. Pass ``next``
+        as ``since`` to continue; with ``has_more`` poll again right away.
+        An expired token answers 410: drop the copy and sync from scratch.
+        """
+        queryset = eager_load(PropertyListing.objects.all(), self.get_serializer(), extra_only=['updated_at'])
+        try:
+            rows, deleted, token, has_more = changes_since(queryset, request.query_params.get('since'))
+        except InvalidToken as exc:
+            raise ValidationError({'since': [str(exc)]})
+        except ExpiredToken:
+            raise SyncTokenExpired()
+        return Response({
+            'changes': self.get_serializer(rows, many=True).data,
+            'deleted': deleted,
+            'next': token,
+            'has_more': has_more,
+        })
+
+    @action(detail=False, methods=['get'])
+    def stats(self, request):
+        """
+        Price percentiles and histogram, median price (and price per
+        bedroom) by bedroom count, price percentiles by bedroom/bathroom
+        bucket and weekly listing volume, over all listings. Computed in
+        core.analytics and up to ``LISTING_ANALYTICS['TTL']`` seconds old.
+        """
+        response = Response(listing_stats())
+        patch_cache_control(response, public=True, max_age=analytics_config()['TTL'])
+        return response
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """
+        The ``?k=`` (default 10) listings most like this one by price, rooms
+        and description, nearest first, from the precomputed index in
+        core.similar.
+        """
+        params = SimilarQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        listing = get_object_or_404(PropertyListing.objects.only(*FEATURE_FIELDS), pk=pk)
+        try:
+            neighbours = similar_to(listing, params.validated_data['k'])
+        except IndexUnavailable:
+            raise SimilarIndexUnavailable()
+
+        ids = [neighbour for neighbour, _ in neighbours]
+        found = eager_load(PropertyListing.objects.all(), self.get_serializer()).in_bulk(ids)
+        # The index can briefly list a listing deleted by another process.
+        results = [found[neighbour] for neighbour in ids if neighbour in found]
+        return Response({
+            'property': listing.pk,
+            'results': self.get_serializer(results, many=True).data,
+        })
+
+    @action(detail=True, methods=['get'])
+    def availability(self, request, pk=None):
+        """
+        Free viewing slots between ``?from=`` and ``?to=`` (ISO dates,
+        inclusive; default the next seven days), computed in one query.
+        """
+        params = AvailabilityQuerySerializer(data={
+            field: request.query_params[param]
+            for field, param in (('start', 'from'), ('end', 'to'))
+            if param in request.query_params
+        })
+        params.is_valid(raise_exception=True)
+        start, end = params.validated_data['start'], params.validated_data['end']
+
+        try:
+            days = free_slots(int(pk), start, end)
+        except ValueError:
+            days = None
+        if days is None:
+            raise NotFound()
+        return Response({
+            'property': int(pk),
+            'from': start,
+            'to': end,
+            'slot_minutes': slot_config()[2],
+            'days': [
+                {'date': day, 'free': [t.strftime('%H:%M') for t in times]}
+                for day, times in days.items()
+            ],
+        })
@@ -1,22 +1,62 @@
+from django.db import transaction
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticatedOrReadOnly
+from core.models.listings import PropertyListing
 from core.models.services import ServiceOffer
-from ..serializers.services_serializer import ServiceOfferSerializer
+from core.notifications import offers_created
+from core.stats import record_changes
+from ..bulk import BulkMixin
+from ..exports import ExportMixin
+from ..fastpath import FastListMixin
+from ..querysets import EagerLoadingMixin
+from ..serializers.services_serializer import (
+    OfferQuerySerializer, ServiceOfferBulkSerializer, ServiceOfferSerializer,
+)
+from ..throttling import ReadThrottle
 
-class ServiceOfferViewSet(viewsets.ModelViewSet):
+class ServiceOfferViewSet(ExportMixin, BulkMixin, FastListMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = ServiceOffer.objects.all()
     serializer_class = ServiceOfferSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    throttle_classes = [ReadThrottle]
+    replica_reads = True
+    bulk_serializer_class = ServiceOfferBulkSerializer
+    bulk_owner_field = 'service_provider'
+    bulk_foreign_keys = {'property_id': PropertyListing}
 
-    # TODO: Add logic to filter offers for a specific property or by provider if needed
-    # def get_queryset(self):
-    #     user = self.request.user
-    #     if user.is_staff:
-    #         return ServiceOffer.objects.all()
-    #     # Example: return offers created by the user or related to their properties
-    #     return ServiceOffer.objects.filter(service_provider=user) # Or other logic
+    def bulk_written(self, objs, created=False):
+        # Bulk writes bypass the post_save handler that keeps these in sync.
+        record_changes(objs, created=created)
+        if created:
+            offers_created(objs)
 
-    # TODO: Add logic for setting service_provider if not part of request data
-    # def perform_create(self, serializer):
-    #     # Example: serializer.save(service_provider=self.request.user)
-    #     serializer.save()
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            offers_created([serializer.save(service_provider=self.request.user)])
+
+    def get_queryset(self):
+        """
+        Scoped by the nested routes ``/listings/{id}/services/`` and
+        ``/users/{id}/services/`` (see api/urls.py); each page is then a
+        range scan of ``offer_property_approved_idx`` or
+        ``offer_provider_created_idx``.
+        """
+        queryset = super().get_queryset()
+        if 'listing_pk' in self.kwargs:
+            queryset = queryset.filter(property_id=self.kwargs['listing_pk'])
+        if 'provider_pk' in self.kwargs:
+            queryset = queryset.filter(service_provider_id=self.kwargs['provider_pk'])
+        return queryset
+
+    def filter_queryset(self, queryset):
+        """``?approved=true|false`` on lists."""
+        queryset = super().filter_queryset(queryset)
+        if self.action != 'list':
+            return queryset
+        params = OfferQuerySerializer(data=self.request.query_params.dict())
+        params.is_valid(raise_exception=True)
+        if 'approved' in params.validated_data:
+            # ``approved=False`` compiles to ``NOT approved``, which can't seek
+            # the (..., approved, created_at) indexes; ``IN (0)`` can.
+            queryset = queryset.filter(approved__in=[params.validated_data['approved']])
+        return queryset
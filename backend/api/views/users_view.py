@@ -3,14 +3,23 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, IsAuthenticatedOrReadOnly
+from core.models.stats import ListingStats, UserStats
 from core.models.users import User # Correct path to the User model
-from ..serializers.users_serializer import UserSerializer  # Correct path to the UserSerializer
+from core.stats import reconcile_users
+from ..fastpath import FastListMixin
+from ..querysets import EagerLoadingMixin
+from ..serializers.users_serializer import (  # Correct path to the UserSerializer
+    ListingStatsSerializer, UserSerializer, UserStatsSerializer,
+)
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(FastListMixin, EagerLoadingMixin, viewsets.ModelViewSet):
     queryset = User.objects.all()
     serializer_class = UserSerializer
     # Apply IsAuthenticatedOrReadOnly by default, but specific actions can override
     permission_classes = [IsAuthenticatedOrReadOnly] 
+    replica_reads = True
+    # Users have no created_at; page them by join date instead.
+    pagination_ordering = ('-date_joined', '-id')
 
     @action(detail=False, methods=['get'], permission_classes=[IsAuthenticated])
     def me(self, request):
@@ -20,6 +29,27 @@ class UserViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(request.user)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+    @action(detail=False, methods=['get'], url_path='me/stats', permission_classes=[IsAuthenticated])
+    def stats(self, request):
+        """
+        Dashboard counters for the authenticated user, read from one
+        denormalized row (see core.stats). ``?listings=1`` adds
+        ``by_listing``, the counts for each of the user's own listings.
+        """
+        row = UserStats.objects.filter(pk=request.user.pk).first()
+        if row is None:
+            reconcile_users([request.user.pk])
+            row = UserStats.objects.get(pk=request.user.pk)
+        data = UserStatsSerializer(row).data
+        if request.query_params.get('listings') in ('1', 'true'):
+            listings = (
+                ListingStats.objects.filter(listing__seller=request.user)
+                .select_related('listing').only('bookings', 'offers', 'offers_approved', 'listing__title')
+                .order_by('-bookings', 'listing_id')
+            )
+            data['by_listing'] = ListingStatsSerializer(listings, many=True).data
+        return Response(data)
+
     # Potentially adjust default permissions based on action for production
     # For example, list might be IsAdminUser, create might be AllowAny (for registration)
     # For now, IsAuthenticatedOrReadOnly is a general setting.
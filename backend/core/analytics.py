@@ -0,0 +1,222 @@
+"""
+Market statistics over all listings (``GET /api/listings/stats/``).
+
+The price, room and ``created_at`` columns are loaded in one query into
+NumPy arrays and every statistic is computed over the arrays at once:
+
+* price percentiles and a histogram;
+* per bedroom count, the median price and median price per bedroom;
+* price percentiles per bedroom/bathroom bucket;
+* listings created per week (weeks start on Monday) and their median price,
+  for the last ``WEEKS`` weeks.
+
+Bedroom and bathroom counts above ``MAX_BEDROOMS``/``MAX_BATHROOMS`` are
+counted in the top bucket. Grouped percentiles come from a single sort by
+``(group, price)``: each group is then a sorted run, and every percentile
+of every group is read at its offset within the run, interpolated like
+``np.percentile``.
+
+The rows are read through a plain cursor rather than model instances or
+``values_list`` iteration, whose per-value conversions (``Decimal``,
+time zones) cost more than all the arithmetic. Results are kept for
+``TTL`` seconds. When they expire, one caller recomputes them while the
+others keep getting the previous result, so only the first request after
+a process starts waits for the computation.
+"""
+import datetime
+import threading
+import time
+
+import numpy as np
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models.listings import PropertyListing
+
+DEFAULTS = {
+    'TTL': 300,
+    'PERCENTILES': (10, 25, 50, 75, 90),
+    'MAX_BEDROOMS': 6,
+    'MAX_BATHROOMS': 4,
+    'HISTOGRAM_BINS': 20,
+    'WEEKS': 26,
+}
+FIRST_MONDAY = datetime.date(1970, 1, 5)
+COLUMNS = np.dtype([
+    ('price', 'f8'), ('bedrooms', 'i4'), ('bathrooms', 'i4'), ('created_at', 'M8[us]'),
+])
+
+_cached = None  # (expires, stats)
+_lock = threading.Lock()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'LISTING_ANALYTICS', {})}
+
+
+@receiver(setting_changed)
+def reset_cache(setting, **kwargs):
+    global _cached
+    if setting == 'LISTING_ANALYTICS':
+        _cached = None
+
+
+def load_columns(queryset):
+    """The rows of ``queryset`` as a structured array of ``COLUMNS``."""
+    queryset = queryset.annotate(price_float=Cast('price', FloatField())).values_list(
+        'price_float', 'num_bedrooms', 'num_bathrooms', 'created_at'
+    ).order_by()
+    sql, params = queryset.query.sql_with_params()
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        rows = cursor
+        if settings.USE_TZ and connection.features.supports_timezones:
+            # Aware datetimes in UTC; NumPy only takes naive ones.
+            rows = ((*row[:3], row[3].replace(tzinfo=None)) for row in cursor)
+        return np.fromiter(rows, dtype=COLUMNS)
+
+
+def grouped_percentiles(keys, values, percentiles, presorted=False):
+    """
+    ``(groups, counts, table)``: the distinct ``keys``, how many values
+    each has, and ``table[i, j]``, the ``percentiles[j]`` (0-100)
+    percentile of the ``values`` of ``groups[i]``. ``presorted`` says
+    ``values`` are already in ascending order.
+    """
+    if not presorted:
+        order = np.argsort(values)
+        keys, values = keys[order], values[order]
+    # A stable sort by key keeps each group's values in order.
+    order = np.argsort(keys, kind='stable')
+    keys, values = keys[order], values[order]
+    groups, starts, counts = np.unique(keys, return_index=True, return_counts=True)
+    positions = (counts[:, None] - 1) * (np.asarray(percentiles, dtype=np.float64) / 100)
+    below = np.floor(positions).astype(np.int64)
+    above = np.minimum(below + 1, counts[:, None] - 1)
+    low, high = values[starts[:, None] + below], values[starts[:, None] + above]
+    return groups, counts, low + (high - low) * (positions - below)
+
+
+def money(values):
+    return [round(float(value), 2) for value in values]
+
+
+def price_summary(prices, config):
+    percentiles = config['PERCENTILES']
+    if not len(prices):
+        return {'mean': None, 'percentiles': {}, 'histogram': {'edges': [], 'counts': [], 'above': 0}}
+    # Cut the histogram at the 99th percentile so a few outliers don't
+    # squeeze everything else into the first bin.
+    lowest = prices.min()
+    counts, edges = np.histogram(
+        prices, bins=config['HISTOGRAM_BINS'], range=(lowest, max(lowest, np.percentile(prices, 99))),
+    )
+    return {
+        'mean': round(float(prices.mean()), 2),
+        'percentiles': dict(zip((f'p{p}' for p in percentiles), money(np.percentile(prices, percentiles)))),
+        'histogram': {
+            'edges': money(edges),
+            'counts': counts.tolist(),
+            'above': int((prices > edges[-1]).sum()),
+        },
+    }
+
+
+def by_bedrooms(columns, config):
+    bedrooms = np.minimum(columns['bedrooms'], config['MAX_BEDROOMS'])
+    groups, counts, medians = grouped_percentiles(bedrooms, columns['price'], [50], presorted=True)
+    some = columns['bedrooms'] > 0
+    per_bedroom = columns['price'][some] / columns['bedrooms'][some]
+    with_bedrooms, _, per_bedroom = grouped_percentiles(bedrooms[some], per_bedroom, [50])
+    per_bedroom = dict(zip(with_bedrooms.tolist(), per_bedroom[:, 0]))
+    return [
+        {
+            'bedrooms': group,
+            'count': count,
+            'median_price': round(float(median), 2),
+            'median_price_per_bedroom': (
+                round(float(per_bedroom[group]), 2) if group in per_bedroom else None
+            ),
+        }
+        for group, count, median in zip(groups.tolist(), counts.tolist(), medians[:, 0])
+    ]
+
+
+def by_rooms(columns, config):
+    percentiles = config['PERCENTILES']
+    width = config['MAX_BATHROOMS'] + 1
+    keys = (
+        np.minimum(columns['bedrooms'], config['MAX_BEDROOMS']).astype(np.int64) * width
+        + np.minimum(columns['bathrooms'], config['MAX_BATHROOMS'])
+    )
+    return [
+        {
+            'bedrooms': int(key // width),
+            'bathrooms': int(key % width),
+            'count': int(count),
+            'percentiles': dict(zip((f'p{p}' for p in percentiles), money(row))),
+        }
+        for key, count, row in zip(*grouped_percentiles(keys, columns['price'], percentiles, presorted=True))
+    ]
+
+
+def weekly(columns, config, today):
+    # Week 0 starts on Monday 1970-01-05, day 4 of the epoch.
+    weeks = (columns['created_at'].astype('datetime64[D]').astype(np.int64) - 4) // 7
+    this_week = (today - FIRST_MONDAY).days // 7
+    first = this_week - config['WEEKS'] + 1
+    recent = (weeks >= first) & (weeks <= this_week)
+    index = weeks[recent] - first
+    counts = np.bincount(index, minlength=config['WEEKS'])
+    groups, _, medians = grouped_percentiles(index, columns['price'][recent], [50], presorted=True)
+    medians = dict(zip(groups.tolist(), medians[:, 0]))
+    return [
+        {
+            'week': FIRST_MONDAY + datetime.timedelta(weeks=first + i),
+            'count': int(counts[i]),
+            'median_price': round(float(medians[i]), 2) if i in medians else None,
+        }
+        for i in range(config['WEEKS'])
+    ]
+
+
+def compute_stats(queryset=None):
+    config = get_config()
+    columns = load_columns(PropertyListing.objects.all() if queryset is None else queryset)
+    # Sorted by price once here, so the groupings only sort by their keys.
+    order = np.argsort(columns['price'])
+    columns = {name: columns[name][order] for name in COLUMNS.names}
+    now = timezone.now()
+    return {
+        'count': len(order),
+        'generated_at': now,
+        'price': price_summary(columns['price'], config),
+        'bedrooms': by_bedrooms(columns, config),
+        'rooms': by_rooms(columns, config),
+        'weekly': weekly(columns, config, now.date()),
+    }
+
+
+def listing_stats():
+    """The statistics of all listings, at most ``TTL`` seconds old."""
+    global _cached
+    cached = _cached
+    if cached is not None and cached[0] > time.monotonic():
+        return cached[1]
+    # While another caller recomputes, serve the stale result; with nothing
+    # cached yet, wait for theirs.
+    if not _lock.acquire(blocking=cached is None):
+        return cached[1]
+    try:
+        if _cached is None or _cached[0] <= time.monotonic():
+            stats = compute_stats()
+            _cached = (time.monotonic() + get_config()['TTL'], stats)
+        return _cached[1]
+    finally:
+        _lock.release()
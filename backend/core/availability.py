@@ -0,0 +1,107 @@
+"""
+Viewing-slot availability for listings.
+
+Bookings are made on a fixed daily grid (``settings.BOOKING_SLOTS``):
+``slot_errors`` rejects times that are off the grid, outside opening hours
+or in the past. Double booking is then prevented by the
+``unique_booking_slot`` constraint on ``(property, scheduled_date,
+scheduled_time)``, which also serves as the index that ``free_slots`` scans.
+"""
+import datetime
+
+from django.conf import settings
+from django.db.models import FilteredRelation, Q
+from django.utils import timezone
+
+from .models.listings import PropertyListing
+
+DEFAULT_SLOTS = {'start': '09:00', 'end': '17:00', 'minutes': 60}
+
+
+def slot_config():
+    config = dict(DEFAULT_SLOTS, **getattr(settings, 'BOOKING_SLOTS', {}))
+    return (
+        datetime.time.fromisoformat(config['start']),
+        datetime.time.fromisoformat(config['end']),
+        int(config['minutes']),
+    )
+
+
+def slot_times():
+    """Start times of the bookable slots in one day."""
+    start, end, minutes = slot_config()
+    day = datetime.date.min
+    current = datetime.datetime.combine(day, start)
+    last = datetime.datetime.combine(day, end)
+    step = datetime.timedelta(minutes=minutes)
+    times = []
+    while current + step <= last:
+        times.append(current.time())
+        current += step
+    return times
+
+
+def slot_start(time):
+    """Start of the slot that ``time`` falls in, or None outside opening hours."""
+    start, _, minutes = slot_config()
+    opening = start.hour * 60 + start.minute
+    elapsed = time.hour * 60 + time.minute - opening
+    if elapsed < 0:
+        return None
+    minute = opening + elapsed // minutes * minutes
+    candidate = datetime.time(minute // 60, minute % 60)
+    return candidate if candidate in slot_times() else None
+
+
+def slot_errors(day, time, now=None):
+    """``{field: message}`` for why ``day`` at ``time`` can't be booked; empty if it can."""
+    times = slot_times()
+    if time not in times:
+        listed = ', '.join(t.strftime('%H:%M') for t in times)
+        return {'scheduled_time': f'Viewings start at {listed}.'}
+    now = timezone.localtime(now)
+    if datetime.datetime.combine(day, time) <= now.replace(tzinfo=None):
+        return {'scheduled_date': 'This slot is in the past.'}
+    return {}
+
+
+def free_slots(listing_id, start_date, end_date, now=None):
+    """
+    Return ``{date: [free slot times]}`` for ``start_date..end_date``
+    inclusive, or None if the listing doesn't exist. Slots starting at or
+    before ``now`` (default: the current local time) aren't free, as
+    ``slot_errors`` refuses to book them.
+
+    One query: the listing LEFT JOINed to its bookings in the range, which
+    the database answers from the ``(property, date, time)`` index.
+    """
+    rows = (
+        PropertyListing.objects.filter(pk=listing_id)
+        .annotate(slot=FilteredRelation(
+            'bookings',
+            condition=Q(bookings__scheduled_date__range=(start_date, end_date)),
+        ))
+        .values_list('slot__scheduled_date', 'slot__scheduled_time')
+    )
+    booked = set()
+    found = False
+    for booked_date, booked_time in rows:
+        found = True
+        if booked_date is not None:
+            # Bookings made before times were checked can be off the grid;
+            # they still take the slot they fall in.
+            booked.add((booked_date, slot_start(booked_time)))
+    if not found:
+        return None
+
+    now = timezone.localtime(now).replace(tzinfo=None)
+    times = slot_times()
+    days = {}
+    day = start_date
+    while day <= end_date:
+        days[day] = [
+            t for t in times
+            if (day, t) not in booked and datetime.datetime.combine(day, t) > now
+        ]
+        day += datetime.timedelta(days=1)
+    return days
@@ -0,0 +1,137 @@
+"""
+Change feed for listings (``GET /api/listings/changes/?since=<token>``).
+
+Clients keep a local copy of the listings and poll for what changed since
+their last sync instead of re-downloading everything. Every write to a
+listing bumps ``PropertyListing.updated_at`` and every delete leaves a
+``ListingTombstone``; the feed is the two merged in
+``(timestamp, kind, id)`` order, each read as a range scan on its
+``(timestamp, id)`` index, so a poll costs the number of changes it
+returns rather than the size of the table.
+
+Sync tokens are opaque to clients: they encode the position of the last
+change returned. Changes newer than ``SETTLE_SECONDS`` are held back until
+the next poll, since a transaction can commit after later ones and its
+rows would otherwise land behind a token that was already handed out.
+Tombstones are kept for ``RETENTION_DAYS`` (``manage.py
+prune_tombstones``); a token older than that can no longer be served and
+the client has to sync from scratch.
+"""
+import base64
+import datetime
+import heapq
+import json
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from .models.listings import ListingTombstone
+
+DEFAULTS = {
+    'SETTLE_SECONDS': 2,
+    'RETENTION_DAYS': 30,
+    'PAGE_SIZE': 500,
+}
+LISTING, TOMBSTONE, END = 0, 1, 2
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+
+class InvalidToken(ValueError):
+    pass
+
+
+class ExpiredToken(Exception):
+    pass
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'LISTING_CHANGES', {})}
+
+
+def encode_token(position):
+    moment, kind, pk = position
+    micros = (moment - EPOCH) // datetime.timedelta(microseconds=1)
+    payload = json.dumps([micros, kind, pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_token(token):
+    """The ``(datetime, kind, id)`` position encoded in ``token``; ``InvalidToken`` if malformed."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        micros, kind, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not all(type(value) is int for value in (micros, kind, pk)) or kind not in (LISTING, TOMBSTONE, END):
+            raise ValueError
+        return EPOCH + datetime.timedelta(microseconds=micros), kind, pk
+    except (TypeError, ValueError, OverflowError):
+        raise InvalidToken('Invalid sync token.')
+
+
+def after(field, kind, position):
+    """Rows of stream ``kind`` ordered after ``position`` by ``(field, kind, id)``."""
+    moment, position_kind, pk = position
+    if kind > position_kind:
+        return Q(**{f'{field}__gte': moment})
+    if kind < position_kind:
+        return Q(**{f'{field}__gt': moment})
+    # Spelled with a separate lower bound so the index is entered at
+    # ``moment`` instead of scanned from the start.
+    return Q(**{f'{field}__gte': moment}) & (Q(**{f'{field}__gt': moment}) | Q(id__gt=pk))
+
+
+def changes_since(queryset, token=None, limit=None):
+    """
+    Listings changed and deleted after ``token`` (from the start without
+    one), at most ``limit`` in total. ``queryset`` selects the listing
+    columns to load. Returns ``(listings, deleted_ids, next_token,
+    has_more)``; raises ``InvalidToken`` or ``ExpiredToken``.
+    """
+    config = get_config()
+    limit = limit or config['PAGE_SIZE']
+    now = timezone.now()
+    horizon = now - datetime.timedelta(seconds=config['SETTLE_SECONDS'])
+    if token:
+        position = decode_token(token)
+        if position[0] < now - datetime.timedelta(days=config['RETENTION_DAYS']):
+            raise ExpiredToken('Sync token expired; sync from scratch.')
+    else:
+        position = (EPOCH, LISTING, 0)
+
+    listings = queryset.filter(after('updated_at', LISTING, position), updated_at__lte=horizon)
+    listings = listings.order_by('updated_at', 'id')[:limit + 1]
+    tombstones = ListingTombstone.objects.filter(after('deleted_at', TOMBSTONE, position), deleted_at__lte=horizon)
+    tombstones = tombstones.order_by('deleted_at', 'id').only('listing_id', 'deleted_at')[:limit + 1]
+
+    merged = list(heapq.merge(
+        (((listing.updated_at, LISTING, listing.pk), listing) for listing in listings),
+        (((tombstone.deleted_at, TOMBSTONE, tombstone.pk), tombstone) for tombstone in tombstones),
+        key=lambda item: item[0],
+    ))
+    has_more = len(merged) > limit
+    merged = merged[:limit]
+    if has_more:
+        last = merged[-1][0]
+    else:
+        # Everything up to the horizon has been seen, so the next poll can
+        # start there even if nothing changed.
+        last = max(position, (horizon, END, 0))
+    return (
+        [row for (_, kind, _), row in merged if kind == LISTING],
+        [row.listing_id for (_, kind, _), row in merged if kind == TOMBSTONE],
+        encode_token(last),
+        has_more,
+    )
+
+
+def record_deletes(pks):
+    ListingTombstone.objects.bulk_create([ListingTombstone(listing_id=pk) for pk in pks])
+
+
+def prune_tombstones(older_than_days=None):
+    """Delete tombstones older than the retention period; returns how many."""
+    days = get_config()['RETENTION_DAYS'] if older_than_days is None else older_than_days
+    deleted, _ = ListingTombstone.objects.filter(
+        deleted_at__lt=timezone.now() - datetime.timedelta(days=days)
+    ).delete()
+    return deleted
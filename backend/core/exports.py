@@ -0,0 +1,107 @@
+"""
+Streaming CSV/NDJSON exports.
+
+Rows are read in primary-key ordered batches (``WHERE id > last ORDER BY id
+LIMIT n``) and encoded batch by batch into a ``StreamingHttpResponse``, so
+memory use is bounded by one batch whatever the table size. Keyset batches
+are used instead of ``QuerySet.iterator()`` because the MySQL drivers
+buffer the whole result set client-side even when iterating.
+"""
+import csv
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+from .models.bookings import Booking
+from .models.listings import PropertyListing
+from .models.services import ServiceOffer
+
+# Flat columns per model; ``__`` paths are single JOINs in the batch query.
+EXPORT_FIELDS = {
+    Booking: [
+        'id', 'buyer_id', 'buyer__username', 'property_id', 'property__title',
+        'scheduled_date', 'scheduled_time', 'message', 'created_at',
+    ],
+    PropertyListing: [
+        'id', 'seller_id', 'seller__username', 'title', 'description', 'address',
+        'num_bedrooms', 'num_bathrooms', 'price', 'image', 'created_at',
+    ],
+    ServiceOffer: [
+        'id', 'service_provider_id', 'service_provider__username', 'property_id',
+        'title', 'description', 'approved', 'created_at',
+    ],
+}
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+BATCH_SIZE = 2000
+
+
+def iter_rows(queryset, fields, batch_size=BATCH_SIZE):
+    """Yield lists of value tuples for ``fields``, one list per batch."""
+    queryset = queryset.order_by('pk').values_list('pk', *fields)
+    last_pk = None
+    while True:
+        batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+        rows = list(batch[:batch_size])
+        if not rows:
+            return
+        last_pk = rows[-1][0]
+        yield [row[1:] for row in rows]
+
+
+class _Line:
+    """File-like object for ``csv.writer`` that hands back what was written."""
+
+    def write(self, value):
+        return value
+
+
+def encode_csv(batches, fields):
+    writer = csv.writer(_Line())
+    yield writer.writerow(fields).encode()
+    for rows in batches:
+        yield ''.join(writer.writerow(row) for row in rows).encode()
+
+
+def encode_ndjson(batches, fields):
+    encoder = DjangoJSONEncoder(ensure_ascii=False, separators=(',', ':'))
+    for rows in batches:
+        yield ''.join(encoder.encode(dict(zip(fields, row))) + '\n' for row in rows).encode()
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def stream_export(queryset, fields=None, format='csv', compress=False, filename=None):
+    """
+    Return a ``StreamingHttpResponse`` exporting ``queryset`` as CSV or
+    NDJSON, optionally gzip-compressed as it is produced.
+    """
+    fields = fields or EXPORT_FIELDS[queryset.model]
+    encode = encode_csv if format == 'csv' else encode_ndjson
+    chunks = encode(iter_rows(queryset, fields), fields)
+
+    filename = filename or '{}-{}.{}'.format(
+        queryset.model._meta.model_name, timezone.now().strftime('%Y%m%d-%H%M%S'), format
+    )
+    content_type = FORMATS[format]
+    if compress:
+        chunks = gzip_stream(chunks)
+        content_type = 'application/gzip'
+        filename += '.gz'
+
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
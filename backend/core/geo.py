@@ -0,0 +1,356 @@
+"""
+Listing coordinates: geocoding, geohashes and radius/bounding-box filters.
+
+``PropertyListing.latitude``/``longitude`` are filled in offline, in
+batches, by the ``geocode_listings`` command through the geocoder configured
+in ``settings.GEOCODER`` (``NominatimGeocoder`` or, in tests,
+``StubGeocoder``). Each geocoded listing also stores the geohash of its
+position, which is B-tree indexed. Results are only saved if the listing
+still has the address that was looked up, and an address that can't be
+resolved is left alone for a backoff that doubles with every failure.
+
+A geohash is a base-32 string whose prefixes are grid cells: every listing
+inside a cell has a geohash starting with that cell's hash, i.e. lies in one
+contiguous range of the index. ``within_bbox`` covers the requested box with
+at most ``MAX_CELLS`` cells, so a search reads a few index ranges instead of
+every row, then applies the exact latitude/longitude bounds (and, for
+``within_radius``, the great-circle distance) to the candidates only.
+"""
+import hashlib
+import json
+import logging
+import math
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from urllib.error import URLError
+from urllib.parse import urlencode
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import DEFERRED, FloatField, Q, Value
+from django.db.models.functions import ACos, Cast, Cos, Least, Radians, Sin
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models.listings import PropertyListing
+
+logger = logging.getLogger(__name__)
+
+GEOHASH_ALPHABET = '0123456789bcdefghjkmnpqrstuvwxyz'
+GEOHASH_PRECISION = 12
+# Index ranges read per bounding box; more cells fit the box more tightly.
+MAX_CELLS = 32
+EARTH_RADIUS_KM = 6371.0088
+COORDINATE_PLACES = Decimal('0.000001')
+# Seconds before an unresolved address is tried again, doubled with every
+# further failure up to the maximum.
+RETRY_BACKOFF = 3600
+MAX_RETRY_BACKOFF = 30 * 86400
+
+# Sent with ``pks`` after coordinates are written in bulk, which bypasses
+# post_save (api.signals invalidates cached responses on it).
+locations_changed = Signal()
+
+
+# -- geohashes ----------------------------------------------------------------
+
+def encode_geohash(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash of a point, e.g. ``encode_geohash(57.64911, 10.40744, 11) == 'u4pruydqqvj'``."""
+    lat_range = [-90.0, 90.0]
+    lng_range = [-180.0, 180.0]
+    latitude, longitude = float(latitude), float(longitude)
+    chars = []
+    bits = value = 0
+    even = True
+    while len(chars) < precision:
+        interval, coordinate = (lng_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = value = 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """``(height, width)`` in degrees of a geohash cell of ``precision`` characters."""
+    lng_bits = (5 * precision + 1) // 2
+    lat_bits = 5 * precision // 2
+    return 180.0 / 2 ** lat_bits, 360.0 / 2 ** lng_bits
+
+
+def _cell_span(low, high, size, origin):
+    first = math.floor((low - origin) / size)
+    last = math.floor((high - origin) / size)
+    # The upper edge of the grid belongs to the last cell.
+    last = min(last, round(-2 * origin / size) - 1)
+    return first, last
+
+
+def covering_cells(south, west, north, east):
+    """
+    Geohash prefixes whose cells together cover the box, at the longest
+    precision that needs no more than ``MAX_CELLS`` cells. Returns ``['']``
+    (everything) when even single characters would need more.
+    """
+    boxes = [(west, east)] if west <= east else [(west, 180.0), (-180.0, east)]
+    best = ['']
+    for precision in range(1, GEOHASH_PRECISION + 1):
+        height, width = cell_size(precision)
+        lat_first, lat_last = _cell_span(south, north, height, -90.0)
+        spans = [_cell_span(low, high, width, -180.0) for low, high in boxes]
+        count = (lat_last - lat_first + 1) * sum(last - first + 1 for first, last in spans)
+        if count > MAX_CELLS:
+            break
+        best = sorted({
+            encode_geohash(-90.0 + (i + 0.5) * height, -180.0 + (j + 0.5) * width, precision)
+            for i in range(lat_first, lat_last + 1)
+            for first, last in spans
+            for j in range(first, last + 1)
+        })
+    return best
+
+
+def geohash_ranges(prefixes):
+    """``Q`` matching geohashes that start with any of ``prefixes``, as index ranges."""
+    condition = Q()
+    for prefix in prefixes:
+        if not prefix:
+            return Q(geohash__gt='')
+        # '{' sorts right after 'z', the last geohash character.
+        condition |= Q(geohash__gte=prefix, geohash__lt=prefix + '{')
+    return condition
+
+
+# -- filters ------------------------------------------------------------------
+
+def within_bbox(queryset, south, west, north, east):
+    """
+    Listings inside the box. ``west > east`` means the box crosses the
+    antimeridian.
+    """
+    bounds = Q(latitude__gte=south, latitude__lte=north)
+    if west <= east:
+        bounds &= Q(longitude__gte=west, longitude__lte=east)
+    else:
+        bounds &= Q(longitude__gte=west) | Q(longitude__lte=east)
+    cells = covering_cells(float(south), float(west), float(north), float(east))
+    return queryset.filter(geohash_ranges(cells)).filter(bounds)
+
+
+def radius_bbox(latitude, longitude, radius_km):
+    """``(south, west, north, east)`` of a box containing the circle."""
+    latitude, longitude = float(latitude), float(longitude)
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    south, north = max(latitude - lat_delta, -90.0), min(latitude + lat_delta, 90.0)
+    if south == -90.0 or north == 90.0:
+        return south, -180.0, north, 180.0
+    lng_delta = math.degrees(
+        math.asin(min(1.0, math.sin(radius_km / EARTH_RADIUS_KM) / math.cos(math.radians(latitude))))
+    )
+    if lng_delta >= 180.0:
+        return south, -180.0, north, 180.0
+    west = (longitude - lng_delta + 540.0) % 360.0 - 180.0
+    east = (longitude + lng_delta + 540.0) % 360.0 - 180.0
+    return south, west, north, east
+
+
+def distance_km(latitude, longitude):
+    """Great-circle distance (spherical law of cosines) from the point to each row."""
+    lat = math.radians(float(latitude))
+    row_lat = Radians(Cast('latitude', FloatField()))
+    row_lng = Radians(Cast('longitude', FloatField()))
+    cosine = (
+        Value(math.sin(lat)) * Sin(row_lat)
+        + Value(math.cos(lat)) * Cos(row_lat) * Cos(row_lng - Value(math.radians(float(longitude))))
+    )
+    # Rounding can push the cosine of tiny distances just past 1.
+    return ACos(Least(cosine, Value(1.0))) * Value(EARTH_RADIUS_KM)
+
+
+def within_radius(queryset, latitude, longitude, radius_km):
+    """Listings within ``radius_km`` kilometres of the point."""
+    queryset = within_bbox(queryset, *radius_bbox(latitude, longitude, radius_km))
+    return queryset.alias(distance_km=distance_km(latitude, longitude)).filter(
+        distance_km__lte=radius_km
+    )
+
+
+# -- keeping coordinates in sync ---------------------------------------------
+
+def address_changed(listing):
+    # Compares against the address remembered by core.signals on load; a
+    # deferred address can't have been changed.
+    address = listing.__dict__.get('address', DEFERRED)
+    saved = getattr(listing, '_saved_address', DEFERRED)
+    return address is not DEFERRED and saved is not DEFERRED and address != saved
+
+
+def clear_locations(pks):
+    """Forget the coordinates of listings whose address changed."""
+    if pks:
+        PropertyListing.objects.filter(pk__in=pks).update(
+            latitude=None, longitude=None, geohash='', geocode_failures=0, geocode_retry_at=None,
+            updated_at=timezone.now(),
+        )
+        locations_changed.send(sender=PropertyListing, pks=list(pks))
+
+
+def set_location(listing, coordinates):
+    """Set (or, for None, clear) a listing's coordinates and geohash in memory."""
+    if coordinates is None:
+        listing.latitude = listing.longitude = None
+        listing.geohash = ''
+        return
+    latitude, longitude = (Decimal(str(value)).quantize(COORDINATE_PLACES) for value in coordinates)
+    listing.latitude, listing.longitude = latitude, longitude
+    listing.geohash = encode_geohash(latitude, longitude)
+
+
+# -- geocoders ----------------------------------------------------------------
+
+class StubGeocoder:
+    """
+    Offline geocoder for tests and development. ``known`` maps addresses to
+    ``(latitude, longitude)``; any other non-blank address gets a stable
+    pseudo-random point inside ``bounds`` ``(south, west, north, east)``.
+    """
+    batch_size = 1000
+
+    def __init__(self, known=None, bounds=(40.5, -74.3, 40.9, -73.7)):
+        self.known = {normalize_address(address): point for address, point in (known or {}).items()}
+        self.bounds = bounds
+
+    def geocode(self, addresses):
+        results = {}
+        south, west, north, east = self.bounds
+        for address in addresses:
+            key = normalize_address(address)
+            if not key:
+                continue
+            if key in self.known:
+                results[address] = self.known[key]
+                continue
+            digest = hashlib.sha256(key.encode()).digest()
+            x = int.from_bytes(digest[:8], 'big') / 2 ** 64
+            y = int.from_bytes(digest[8:16], 'big') / 2 ** 64
+            results[address] = (south + x * (north - south), west + y * (east - west))
+        return results
+
+
+class NominatimGeocoder:
+    """
+    OpenStreetMap Nominatim (or a self-hosted instance at ``url``). The
+    public service allows one request per second and requires an identifying
+    ``user_agent``; ``min_interval`` enforces the former.
+    """
+    batch_size = 50
+
+    def __init__(self, url='https://nominatim.openstreetmap.org/search',
+                 user_agent='realestate-platform', min_interval=1.0, timeout=10):
+        self.url = url
+        self.user_agent = user_agent
+        self.min_interval = min_interval
+        self.timeout = timeout
+        self._last_request = 0.0
+
+    def geocode(self, addresses):
+        results = {}
+        for address in addresses:
+            if not normalize_address(address):
+                continue
+            wait = self._last_request + self.min_interval - time.monotonic()
+            if wait > 0:
+                time.sleep(wait)
+            self._last_request = time.monotonic()
+            query = urlencode({'q': address, 'format': 'jsonv2', 'limit': 1})
+            request = Request(f'{self.url}?{query}', headers={'User-Agent': self.user_agent})
+            try:
+                with urlopen(request, timeout=self.timeout) as response:
+                    matches = json.load(response)
+            except (URLError, OSError, ValueError) as exc:
+                logger.warning('Geocoding %r failed: %s', address, exc)
+                continue
+            if matches:
+                results[address] = (float(matches[0]['lat']), float(matches[0]['lon']))
+        return results
+
+
+def normalize_address(address):
+    return ' '.join((address or '').lower().split())
+
+
+_geocoder = None
+_geocoder_lock = threading.Lock()
+
+
+def get_geocoder():
+    global _geocoder
+    if _geocoder is None:
+        with _geocoder_lock:
+            if _geocoder is None:
+                config = getattr(settings, 'GEOCODER', {})
+                geocoder_class = import_string(config.get('BACKEND', 'core.geo.StubGeocoder'))
+                _geocoder = geocoder_class(**config.get('OPTIONS', {}))
+    return _geocoder
+
+
+@receiver(setting_changed)
+def reset_geocoder(setting, **kwargs):
+    global _geocoder
+    if setting == 'GEOCODER':
+        _geocoder = None
+
+
+def retry_delay(failures):
+    return timedelta(seconds=min(MAX_RETRY_BACKOFF, RETRY_BACKOFF * 2 ** (failures - 1)))
+
+
+def due_for_geocoding(queryset, now=None):
+    """Listings of ``queryset`` without coordinates and not backing off."""
+    return queryset.filter(latitude=None).filter(
+        Q(geocode_retry_at=None) | Q(geocode_retry_at__lte=now or timezone.now())
+    )
+
+
+def geocode_listings(listings, geocoder=None):
+    """
+    Geocode ``listings`` (one geocoder call for their distinct addresses)
+    and save the results, each with an update conditional on the address
+    still being the one geocoded: a listing edited meanwhile has had its
+    location cleared and keeps it that way. Listings whose address can't
+    be resolved keep their coordinates and record the failure, to be tried
+    again after ``retry_delay``. Returns the number resolved.
+    """
+    geocoder = geocoder or get_geocoder()
+    found = geocoder.geocode(sorted({listing.address for listing in listings}))
+    now = timezone.now()
+    located = []
+    with transaction.atomic():
+        for listing in listings:
+            unchanged = PropertyListing.objects.filter(pk=listing.pk, address=listing.address)
+            if listing.address not in found:
+                failures = listing.geocode_failures + 1
+                unchanged.update(geocode_failures=failures, geocode_retry_at=now + retry_delay(failures))
+                continue
+            set_location(listing, found[listing.address])
+            if unchanged.update(
+                latitude=listing.latitude, longitude=listing.longitude, geohash=listing.geohash,
+                geocode_failures=0, geocode_retry_at=None, updated_at=now,
+            ):
+                located.append(listing.pk)
+    if located:
+        locations_changed.send(sender=PropertyListing, pks=located)
+    return len(located)
@@ -0,0 +1,128 @@
+"""
+Background generation of listing image renditions.
+
+When a listing is saved with a new ``image``, ``schedule_renditions`` queues
+a job (after the transaction commits) on a small thread pool. The job
+re-encodes the upload into WebP and JPEG at each size in ``RENDITIONS``,
+dropping EXIF/ICC metadata, stores the files under content-hashed names and
+records them in ``PropertyListing.renditions``::
+
+    {"thumbnail": {"width": 320, "height": 213,
+                   "webp": "property_images/renditions/3f2a….webp",
+                   "jpeg": "property_images/renditions/91bc….jpg"},
+     "card": {...}, "full": {...}}
+
+``settings.IMAGE_WORKERS`` sets the pool size; 0 processes images inline,
+which is what the tests use.
+"""
+import hashlib
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps
+
+from .models.listings import PropertyListing
+
+logger = logging.getLogger(__name__)
+
+RENDITIONS = (
+    ('thumbnail', 320),
+    ('card', 640),
+    ('full', 1600),
+)
+FORMATS = (
+    ('webp', 'WEBP', 'webp', {'quality': 80, 'method': 4}),
+    ('jpeg', 'JPEG', 'jpg', {'quality': 82, 'optimize': True, 'progressive': True}),
+)
+RENDITION_DIR = 'property_images/renditions'
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=settings.IMAGE_WORKERS, thread_name_prefix='listing-images'
+                )
+    return _executor
+
+
+def schedule_renditions(listing):
+    """Queue rendition generation for ``listing`` once the transaction commits."""
+    pk, name = listing.pk, listing.image.name
+
+    def submit():
+        if getattr(settings, 'IMAGE_WORKERS', 0) > 0:
+            get_executor().submit(_run_job, pk, name)
+        else:
+            process_listing_image(pk, name)
+
+    transaction.on_commit(submit)
+
+
+def _run_job(pk, name):
+    close_old_connections()
+    try:
+        process_listing_image(pk, name)
+    except Exception:
+        logger.exception('Rendition generation failed for listing %s', pk)
+    finally:
+        close_old_connections()
+
+
+def process_listing_image(pk, name):
+    """
+    Build and store the renditions of image ``name`` for listing ``pk``.
+
+    Does nothing if the listing's image has changed since the job was
+    queued; the newer upload has its own job.
+    """
+    with default_storage.open(name, 'rb') as source:
+        renditions = render_renditions(source)
+
+    listing = PropertyListing.objects.filter(pk=pk, image=name).first()
+    if listing is None:
+        return None
+    listing.renditions = renditions
+    listing.save(update_fields=['renditions', 'updated_at'])
+    return renditions
+
+
+def render_renditions(source):
+    with Image.open(source) as original:
+        # Apply the EXIF orientation before the metadata is dropped.
+        image = ImageOps.exif_transpose(original)
+        image = image.convert('RGB')
+    image.info = {}
+
+    renditions = {}
+    for label, width in RENDITIONS:
+        resized = image.copy()
+        # Never upscale; keep the aspect ratio.
+        resized.thumbnail((min(width, image.width), image.height), Image.LANCZOS)
+        rendition = {'width': resized.width, 'height': resized.height}
+        for key, pil_format, extension, options in FORMATS:
+            buffer = io.BytesIO()
+            resized.save(buffer, pil_format, **options)
+            rendition[key] = store_content_hashed(buffer.getvalue(), extension)
+        renditions[label] = rendition
+    return renditions
+
+
+def store_content_hashed(data, extension):
+    """Save ``data`` as ``<sha256>.<extension>``; identical files are stored once."""
+    digest = hashlib.sha256(data).hexdigest()[:32]
+    name = f'{RENDITION_DIR}/{digest}.{extension}'
+    if not default_storage.exists(name):
+        name = default_storage.save(name, ContentFile(data))
+    return name
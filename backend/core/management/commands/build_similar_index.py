@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.similar import build, get_config
+
+
+class Command(BaseCommand):
+    help = (
+        'Build the "similar listings" vector index (core/similar.py) from the '
+        'database and swap it in for the running processes. Saves and deletes '
+        'keep it current afterwards; rebuild now and then (e.g. nightly) to '
+        'refresh the price and term statistics it is scaled by.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        config = get_config()
+        if config['PATH'] is None:
+            raise CommandError("SIMILAR_LISTINGS['PATH'] is not set.")
+        start = time.perf_counter()
+        count = build(batch_size=options['batch_size'])
+        self.stdout.write(
+            f'Indexed {count} listing(s) in {time.perf_counter() - start:.1f}s into {config["PATH"]}.'
+        )
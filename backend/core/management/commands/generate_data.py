@@ -0,0 +1,82 @@
+import time
+from contextlib import contextmanager
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models.listings import PropertyListing
+from core.synthetic import (
+    add_confirm_argument, confirm_writes, create_bookings, create_listings, create_offers,
+    create_users, rebuild_derived,
+)
+
+# Roughly the continental United States.
+DEFAULT_BOUNDS = (25.0, -124.0, 49.0, -67.0)
+
+
+class Command(BaseCommand):
+    help = (
+        'Fill the configured database with a reproducible synthetic dataset: '
+        'users of every role, listings, bookings and service offers, written '
+        'with bulk_create. The same --seed always yields the same rows; users '
+        'are reused on reruns, everything else is added. Rebuilds the search '
+        'index and dashboard counters afterwards. Point it at a scratch schema and '
+        'pass --yes.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--listings', type=int, default=10_000)
+        parser.add_argument('--sellers', type=int, help='Defaults to one per 20 listings.')
+        parser.add_argument('--buyers', type=int, default=5000)
+        parser.add_argument('--providers', type=int, default=500)
+        parser.add_argument('--bookings', type=int, help='Defaults to twice --listings.')
+        parser.add_argument('--offers', type=int, help='Defaults to --listings.')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--bounds', type=float, nargs=4, metavar=('SOUTH', 'WEST', 'NORTH', 'EAST'),
+            default=DEFAULT_BOUNDS, help='Area listings are placed in.',
+        )
+        parser.add_argument('--no-locations', action='store_true', help='Leave listings ungeocoded.')
+        add_confirm_argument(parser)
+
+    def handle(self, *args, **options):
+        confirm_writes(options)
+        listings, seed, batch_size = options['listings'], options['seed'], options['batch_size']
+        sellers = options['sellers'] if options['sellers'] is not None else max(1, listings // 20)
+        bookings = options['bookings'] if options['bookings'] is not None else listings * 2
+        offers = options['offers'] if options['offers'] is not None else listings
+        if listings and not sellers:
+            raise CommandError('Listings need at least one seller.')
+        if bookings and not (listings and options['buyers']):
+            raise CommandError('Bookings need new listings and at least one buyer.')
+        if offers and not (listings and options['providers']):
+            raise CommandError('Service offers need new listings and at least one provider.')
+
+        last_id = PropertyListing.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        with self.step('users'):
+            seller_ids = create_users(sellers, 'seller', seed=seed, batch_size=batch_size)
+            buyer_ids = create_users(options['buyers'], 'buyer', seed=seed, batch_size=batch_size)
+            provider_ids = create_users(
+                options['providers'], 'service_provider', seed=seed, batch_size=batch_size
+            )
+        with self.step(f'{listings} listings'):
+            bounds = None if options['no_locations'] else options['bounds']
+            create_listings(listings, seller_ids, seed=seed, batch_size=batch_size, bounds=bounds)
+        listing_ids = list(
+            PropertyListing.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)
+        )
+        if bookings:
+            with self.step(f'{bookings} bookings'):
+                create_bookings(bookings, buyer_ids, listing_ids, seed=seed, batch_size=batch_size)
+        if offers:
+            with self.step(f'{offers} service offers'):
+                create_offers(offers, provider_ids, listing_ids, seed=seed, batch_size=batch_size)
+        with self.step('search index and dashboard counters'):
+            fixed = rebuild_derived(last_id, batch_size)
+        self.stdout.write(f'Reconciled {sum(fixed.values())} counter row(s).')
+
+    @contextmanager
+    def step(self, label):
+        start = time.perf_counter()
+        yield
+        self.stdout.write(f'{label}: {time.perf_counter() - start:.1f}s')
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+
+from core.geo import due_for_geocoding, geocode_listings, get_geocoder
+from core.models.listings import PropertyListing
+
+
+class Command(BaseCommand):
+    help = (
+        'Geocode listing addresses in batches with the geocoder configured in '
+        'settings.GEOCODER. Only listings without coordinates are processed, '
+        'leaving out addresses that failed recently, unless --all is given.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Re-geocode every listing.')
+        parser.add_argument('--batch-size', type=int, help="Defaults to the geocoder's batch size.")
+        parser.add_argument('--limit', type=int, help='Stop after this many listings.')
+
+    def handle(self, *args, **options):
+        geocoder = get_geocoder()
+        batch_size = options['batch_size'] or geocoder.batch_size
+        listings = PropertyListing.objects.only('pk', 'address', 'geocode_failures').order_by('pk')
+        if not options['all']:
+            listings = due_for_geocoding(listings)
+
+        done = resolved = 0
+        last_pk = 0
+        limit = options['limit']
+        while limit is None or done < limit:
+            size = batch_size if limit is None else min(batch_size, limit - done)
+            # Keyset batches, so rows updated along the way don't shift them.
+            batch = list(listings.filter(pk__gt=last_pk)[:size])
+            if not batch:
+                break
+            resolved += geocode_listings(batch, geocoder)
+            done += len(batch)
+            last_pk = batch[-1].pk
+        self.stdout.write(f'Geocoded {resolved} of {done} listing(s), {done - resolved} unresolved.')
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from core.images import process_listing_image
+from core.models.listings import PropertyListing
+
+
+class Command(BaseCommand):
+    help = 'Generate image renditions for listings that have an image but no renditions.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate renditions for every listing.')
+
+    def handle(self, *args, **options):
+        listings = PropertyListing.objects.exclude(image='').exclude(image=None)
+        if not options['all']:
+            listings = listings.filter(renditions={})
+
+        done = failed = 0
+        for pk, name in listings.values_list('pk', 'image').iterator():
+            try:
+                process_listing_image(pk, name)
+                done += 1
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'Listing {pk}: {exc}')
+        self.stdout.write(f'Processed {done} listing image(s), {failed} failed.')
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from core.changes import prune_tombstones
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete tombstones of deleted listings older than '
+        "LISTING_CHANGES['RETENTION_DAYS']; change feed tokens older than that "
+        'are answered with 410 Gone. Run it daily, e.g. from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, help='Keep this many days instead.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Deleted {prune_tombstones(options["days"])} tombstone(s).')
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from core.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = (
+        'Recompute the dashboard counters from the source tables and fix any '
+        'that drifted (e.g. after bulk writes or QuerySet.update() calls, which '
+        'send no signals). Safe to run periodically, e.g. nightly from cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report drift without fixing it.')
+
+    def handle(self, *args, **options):
+        fixed = reconcile(dry_run=options['dry_run'])
+        verb = 'Would fix' if options['dry_run'] else 'Fixed'
+        details = ', '.join(f'{table} {count}' for table, count in fixed.items())
+        self.stdout.write(f'{verb} {sum(fixed.values())} row(s) ({details}).')
@@ -0,0 +1,68 @@
+import multiprocessing
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+from core.tasks import purge_finished, run_pending, work
+
+
+class Command(BaseCommand):
+    help = (
+        'Run background tasks (core/tasks.py) until stopped with SIGINT/SIGTERM, '
+        'which lets each worker finish the task it is running. Workers claim '
+        'tasks with SELECT ... FOR UPDATE SKIP LOCKED, so several of these can '
+        'run side by side, on one host or many. SQLite allows one writer at a '
+        'time, so use a single process there.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=1, help='Worker processes to fork.')
+        parser.add_argument('--batch-size', type=int, default=10, help='Tasks claimed at a time.')
+        parser.add_argument('--once', action='store_true', help='Run the tasks that are due, then exit.')
+        parser.add_argument(
+            '--purge', action='store_true',
+            help="Delete tasks finished longer ago than TASKS['KEEP_FINISHED'], then exit.",
+        )
+
+    def handle(self, *args, **options):
+        if options['purge']:
+            self.stdout.write(f'Deleted {purge_finished()} finished task(s).')
+            return
+        if options['once']:
+            self.stdout.write(f'Ran {run_pending(batch_size=options["batch_size"])} task(s).')
+            return
+        if options['processes'] < 1:
+            raise CommandError('--processes must be at least 1.')
+
+        stop = threading.Event()
+        if options['processes'] == 1:
+            self.stop_on_signals(stop.set)
+            work(stop, options['batch_size'])
+            return
+
+        # Children must not share the parent's database connections.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        stop = context.Event()
+        workers = [
+            context.Process(target=self.child, args=(stop, options['batch_size']), daemon=True)
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stop_on_signals(stop.set)
+        self.stdout.write(f'Started {len(workers)} worker(s).')
+        for worker in workers:
+            worker.join()
+
+    def child(self, stop, batch_size):
+        # The parent relays SIGINT/SIGTERM through ``stop``.
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        work(stop, batch_size)
+
+    def stop_on_signals(self, stop):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop())
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:24
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ListingSearchTerm',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=64)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='propertylisting',
+            index=models.Index(fields=['price'], name='listing_price_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='propertylisting',
+            index=models.Index(fields=['num_bedrooms', 'num_bathrooms', 'price'], name='listing_rooms_price_idx'),
+        ),
+        migrations.AddField(
+            model_name='listingsearchterm',
+            name='listing',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='core.propertylisting'),
+        ),
+        migrations.AddConstraint(
+            model_name='listingsearchterm',
+            constraint=models.UniqueConstraint(fields=('term', 'listing'), name='unique_listing_term'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-16 22:31
+
+from django.db import migrations, models
+from django.db.models import Count
+
+REPORT_LIMIT = 100
+
+
+def check_double_bookings(apps, schema_editor):
+    """
+    Stop before adding the constraint if any slot is booked more than once.
+    Which booking keeps the slot is the operator's call, so the conflicts
+    are listed rather than resolved here.
+    """
+    Booking = apps.get_model('core', 'Booking')
+    slots = list(
+        Booking.objects.values('property', 'scheduled_date', 'scheduled_time')
+        .annotate(bookings=Count('id'))
+        .filter(bookings__gt=1)
+        .order_by('property', 'scheduled_date', 'scheduled_time')
+    )
+    if not slots:
+        return
+    lines = []
+    for slot in slots[:REPORT_LIMIT]:
+        ids = Booking.objects.filter(
+            property=slot['property'], scheduled_date=slot['scheduled_date'], scheduled_time=slot['scheduled_time'],
+        ).order_by('id').values_list('id', flat=True)
+        lines.append(
+            f"  listing {slot['property']} on {slot['scheduled_date']} at {slot['scheduled_time']}: "
+            f"bookings {', '.join(map(str, ids))}"
+        )
+    if len(slots) > REPORT_LIMIT:
+        lines.append(f'  ... and {len(slots) - REPORT_LIMIT} more')
+    raise RuntimeError(
+        f'Cannot add unique_booking_slot: {len(slots)} viewing slot(s) are booked more than once.\n'
+        + '\n'.join(lines)
+        + '\nReschedule or delete all but one booking of each slot, then run migrate again.'
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0004_listing_renditions'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_double_bookings, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.UniqueConstraint(fields=('property', 'scheduled_date', 'scheduled_time'), name='unique_booking_slot'),
+        ),
+    ]
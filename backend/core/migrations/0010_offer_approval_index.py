@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:29
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_listing_changes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='serviceoffer',
+            index=models.Index(fields=['approved', 'created_at', 'id'], name='offer_approved_created_idx'),
+        ),
+    ]
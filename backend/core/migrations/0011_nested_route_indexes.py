@@ -0,0 +1,25 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:39
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_offer_approval_index'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['property', 'created_at', 'id'], name='booking_property_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceoffer',
+            index=models.Index(fields=['property', 'approved', 'created_at', 'id'], name='offer_property_approved_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serviceoffer',
+            index=models.Index(fields=['service_provider', 'created_at', 'id'], name='offer_provider_created_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_nested_route_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='propertylisting',
+            index=models.Index(fields=['seller', 'created_at', 'id'], name='listing_seller_created_idx'),
+        ),
+    ]
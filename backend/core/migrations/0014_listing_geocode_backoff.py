@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-17 00:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0013_user_admin_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='propertylisting',
+            name='geocode_failures',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='propertylisting',
+            name='geocode_retry_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+    ]
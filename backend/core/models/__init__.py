@@ -3,4 +3,6 @@ from .users import *
 from .listings import *
 from .bookings import *
 from .services import *
-
+from .search import *
+from .stats import *
+from .tasks import *
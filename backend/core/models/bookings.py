@@ -12,5 +12,22 @@ class Booking(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        constraints = [
+            # One booking per viewing slot; enforced by the database so that
+            # concurrent requests can't double-book (see core.availability).
+            models.UniqueConstraint(
+                fields=['property', 'scheduled_date', 'scheduled_time'], name='unique_booking_slot'
+            ),
+        ]
+        indexes = [
+            # Keyset pagination order (see api.pagination.KeysetPagination);
+            # non-staff users only ever page through their own bookings.
+            models.Index(fields=['created_at', 'id'], name='booking_created_id_idx'),
+            models.Index(fields=['buyer', 'created_at', 'id'], name='booking_buyer_created_idx'),
+            # /listings/{id}/bookings/.
+            models.Index(fields=['property', 'created_at', 'id'], name='booking_property_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.buyer.username} → {self.property.title} on {self.scheduled_date}"
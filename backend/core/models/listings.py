@@ -8,12 +8,61 @@ class PropertyListing(models.Model):
     description = models.TextField()
     address = models.CharField(max_length=500)
     image = models.ImageField(upload_to='property_images/', blank=True, null=True)
+    # Resized, metadata-free copies of ``image``, filled in by core.images.
+    renditions = models.JSONField(default=dict, blank=True, editable=False)
     
     num_bedrooms = models.PositiveIntegerField()
     num_bathrooms = models.PositiveIntegerField()
     price = models.DecimalField(max_digits=12, decimal_places=2)
 
+    # Filled in offline by the ``geocode_listings`` command (see core.geo);
+    # cleared when the address changes.
+    latitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, editable=False)
+    longitude = models.DecimalField(max_digits=9, decimal_places=6, null=True, blank=True, editable=False)
+    geohash = models.CharField(max_length=12, blank=True, default='', editable=False)
+    # Failed geocoding attempts at the current address, and when
+    # geocode_listings may try it again.
+    geocode_failures = models.PositiveSmallIntegerField(default=0, editable=False)
+    geocode_retry_at = models.DateTimeField(null=True, blank=True, editable=False)
+
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped by every write, including bulk and background ones; the
+    # ``/api/listings/changes/`` feed reads it (see core.changes).
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination order (see api.pagination.KeysetPagination).
+            models.Index(fields=['created_at', 'id'], name='listing_created_id_idx'),
+            # /users/{id}/listings/.
+            models.Index(fields=['seller', 'created_at', 'id'], name='listing_seller_created_idx'),
+            # Change feed order (see core.changes).
+            models.Index(fields=['updated_at', 'id'], name='listing_updated_id_idx'),
+            # Range filters used by listing search (see core.search).
+            models.Index(fields=['price'], name='listing_price_idx'),
+            models.Index(fields=['num_bedrooms', 'num_bathrooms', 'price'], name='listing_rooms_price_idx'),
+            # Radius and bounding-box search (see core.geo).
+            models.Index(fields=['geohash'], name='listing_geohash_idx'),
+        ]
 
     def __str__(self):
         return self.title
+
+
+class ListingTombstone(models.Model):
+    """
+    Marks a deleted listing for the change feed, so clients syncing with
+    ``/api/listings/changes/`` learn to drop it. Written on ``post_delete``
+    and pruned after ``LISTING_CHANGES['RETENTION_DAYS']``.
+    """
+    # Not a foreign key: the listing is gone.
+    listing_id = models.BigIntegerField(db_index=True)
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"Listing {self.listing_id} deleted {self.deleted_at:%Y-%m-%d %H:%M}"
@@ -0,0 +1,22 @@
+# Search index for models
+from django.db import models
+from .listings import PropertyListing
+
+class ListingSearchTerm(models.Model):
+    """
+    One row per (term, listing): the inverted index behind listing text search.
+
+    Kept up to date by the signal handlers in ``core.signals``; rows go away
+    with their listing through the cascade.
+    """
+    term = models.CharField(max_length=64)
+    listing = models.ForeignKey(PropertyListing, on_delete=models.CASCADE, related_name='search_terms')
+
+    class Meta:
+        constraints = [
+            # Leading ``term`` column doubles as the posting-list index.
+            models.UniqueConstraint(fields=['term', 'listing'], name='unique_listing_term'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} → {self.listing_id}"
@@ -12,5 +12,17 @@ class ServiceOffer(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination order (see api.pagination.KeysetPagination).
+            models.Index(fields=['created_at', 'id'], name='offer_created_id_idx'),
+            # The approval queue (admin ``approved`` filter), newest first.
+            models.Index(fields=['approved', 'created_at', 'id'], name='offer_approved_created_idx'),
+            # Nested routes /listings/{id}/services/ (optionally ?approved=)
+            # and /users/{id}/services/.
+            models.Index(fields=['property', 'approved', 'created_at', 'id'], name='offer_property_approved_idx'),
+            models.Index(fields=['service_provider', 'created_at', 'id'], name='offer_provider_created_idx'),
+        ]
+
     def __str__(self):
         return f"{self.title} for {self.property.title} by {self.service_provider.username}"
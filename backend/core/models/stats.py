@@ -0,0 +1,60 @@
+# Dashboard counters for models
+from django.db import models
+from .users import User
+from .listings import PropertyListing
+
+class UserStats(models.Model):
+    """
+    Denormalized dashboard counters for one user, whatever their role.
+
+    Kept up to date by ``core.stats`` from save/delete signals and repaired
+    by the ``reconcile_stats`` command.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    # As a seller.
+    listings = models.PositiveIntegerField(default=0)
+    bookings_received = models.PositiveIntegerField(default=0)
+    offers_received = models.PositiveIntegerField(default=0)
+    # As a buyer.
+    bookings_made = models.PositiveIntegerField(default=0)
+    # As a service provider.
+    offers = models.PositiveIntegerField(default=0)
+    offers_approved = models.PositiveIntegerField(default=0)
+    properties_served = models.PositiveIntegerField(default=0)
+
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"Stats for user {self.user_id}"
+
+
+class ListingStats(models.Model):
+    """Denormalized per-listing counters, maintained like ``UserStats``."""
+    listing = models.OneToOneField(
+        PropertyListing, on_delete=models.CASCADE, primary_key=True, related_name='stats'
+    )
+    bookings = models.PositiveIntegerField(default=0)
+    offers = models.PositiveIntegerField(default=0)
+    offers_approved = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"Stats for listing {self.listing_id}"
+
+
+class ProviderListingStats(models.Model):
+    """
+    Rollup of a provider's service offers per listing. A row exists while
+    the count is positive, so a provider's rows are the properties they
+    serve (``UserStats.properties_served``).
+    """
+    provider = models.ForeignKey(User, on_delete=models.CASCADE, related_name='served_listing_stats')
+    listing = models.ForeignKey(PropertyListing, on_delete=models.CASCADE, related_name='provider_stats')
+    offers = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['provider', 'listing'], name='unique_provider_listing_stats'),
+        ]
+
+    def __str__(self):
+        return f"{self.provider_id} → {self.listing_id}: {self.offers}"
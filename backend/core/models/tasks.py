@@ -0,0 +1,49 @@
+# Background tasks for models
+from django.db import models
+
+
+class Task(models.Model):
+    """
+    One queued call of a function registered with ``core.tasks.task``.
+
+    Rows are written in the same transaction as the change that caused them
+    (a transactional outbox), so a task exists exactly when that change was
+    committed. Workers claim due rows with ``SELECT ... FOR UPDATE SKIP
+    LOCKED`` and hold them for a lease; a row whose lease ran out (its worker
+    died) is claimed again.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    name = models.CharField(max_length=200)
+    kwargs = models.JSONField(default=dict)
+    # Enqueueing a key that already exists returns the existing task.
+    idempotency_key = models.CharField(max_length=255, unique=True, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # Not before this time: now for new tasks, later when backing off.
+    run_at = models.DateTimeField()
+    locked_until = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Claim query: due queued tasks oldest first, and expired leases.
+            models.Index(fields=['status', 'run_at'], name='task_status_run_at_idx'),
+            models.Index(fields=['status', 'locked_until'], name='task_status_locked_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status}, attempt {self.attempts}/{self.max_attempts})"
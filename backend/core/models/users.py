@@ -9,6 +9,14 @@ class User(AbstractUser):
         ('service_provider', 'Service Provider'),
     )
     role = models.CharField(max_length=20, choices=ROLE_CHOICES)
-    
+
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # The admin changelist's filters, in its username order.
+            models.Index(fields=['role', 'username'], name='user_role_username_idx'),
+            models.Index(fields=['is_staff', 'username'], name='user_staff_username_idx'),
+            models.Index(fields=['is_active', 'username'], name='user_active_username_idx'),
+        ]
+
     def __str__(self):
         return f"{self.username} ({self.role})"
@@ -0,0 +1,85 @@
+"""
+Emails about bookings and service offers, sent from background tasks.
+
+The views call ``booking_created``/``offers_created`` inside the
+transaction that saves the rows; the tasks run once it commits (see
+``core.tasks``). Each task re-reads its row, so one that was deleted or
+already approved in the meantime sends nothing.
+"""
+from django.conf import settings
+from django.core.mail import send_mail, send_mass_mail
+
+from .models.bookings import Booking
+from .models.services import ServiceOffer
+from .models.users import User
+from .tasks import enqueue, enqueue_many, task
+
+
+def _booking(booking_id):
+    return Booking.objects.select_related('buyer', 'property__seller').filter(pk=booking_id).first()
+
+
+@task
+def notify_seller_of_booking(booking_id):
+    booking = _booking(booking_id)
+    if booking is None or not booking.property.seller.email:
+        return
+    body = (
+        f'{booking.buyer.username} booked a viewing of "{booking.property.title}" '
+        f'on {booking.scheduled_date:%A %d %B %Y} at {booking.scheduled_time:%H:%M}.\n'
+    )
+    if booking.message:
+        body += f'\n{booking.message}\n'
+    send_mail(
+        f'New viewing booked: {booking.property.title}', body,
+        settings.DEFAULT_FROM_EMAIL, [booking.property.seller.email],
+    )
+
+
+@task
+def confirm_booking(booking_id):
+    booking = _booking(booking_id)
+    if booking is None or not booking.buyer.email:
+        return
+    send_mail(
+        f'Viewing confirmed: {booking.property.title}',
+        f'Your viewing of "{booking.property.title}" at {booking.property.address} is booked '
+        f'for {booking.scheduled_date:%A %d %B %Y} at {booking.scheduled_time:%H:%M}.\n',
+        settings.DEFAULT_FROM_EMAIL,
+        [booking.buyer.email],
+    )
+
+
+@task
+def flag_offer_for_approval(offer_id):
+    """Ask staff to review an offer that is still waiting for approval."""
+    offer = (
+        ServiceOffer.objects.select_related('service_provider', 'property')
+        .filter(pk=offer_id, approved=False).first()
+    )
+    if offer is None:
+        return
+    recipients = list(
+        User.objects.filter(is_staff=True, is_active=True).exclude(email='').values_list('email', flat=True)
+    )
+    subject = f'Service offer awaiting approval: {offer.title}'
+    body = (
+        f'{offer.service_provider.username} offered "{offer.title}" for "{offer.property.title}".\n\n'
+        f'{offer.description}\n'
+    )
+    # One message per recipient, so staff don't see each other's addresses.
+    send_mass_mail([(subject, body, settings.DEFAULT_FROM_EMAIL, [email]) for email in recipients])
+
+
+def booking_created(booking):
+    """Queue the emails for a new booking; call inside the saving transaction."""
+    enqueue(notify_seller_of_booking, key=f'booking:{booking.pk}:notify-seller', booking_id=booking.pk)
+    enqueue(confirm_booking, key=f'booking:{booking.pk}:confirm', booking_id=booking.pk)
+
+
+def offers_created(offers):
+    """Queue approval requests for new unapproved offers; call inside the saving transaction."""
+    enqueue_many(flag_offer_for_approval, [
+        (f'offer:{offer.pk}:flag', {'offer_id': offer.pk})
+        for offer in offers if offer.pk is not None and not offer.approved
+    ])
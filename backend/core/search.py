@@ -0,0 +1,136 @@
+"""
+Listing search: an inverted index over title/description/address plus
+index-backed range filters and single-query facet counts.
+
+The index lives in ``ListingSearchTerm`` rather than a MySQL FULLTEXT index
+so that it behaves the same on every backend (including the SQLite test
+database) and can be rebuilt in bulk with ``index_listings``.
+"""
+import re
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q
+
+from .models.search import ListingSearchTerm
+
+TERM_MAX_LENGTH = 64
+STOPWORDS = frozenset(
+    'a an and are as at be by for from in is it of on or the this to with'.split()
+)
+
+# Facet buckets. Bedrooms collapse into "5+"; prices are [lower, upper).
+BEDROOM_BUCKETS = (0, 1, 2, 3, 4, 5)
+PRICE_BUCKETS = (
+    Decimal('0'), Decimal('100000'), Decimal('250000'), Decimal('500000'),
+    Decimal('750000'), Decimal('1000000'), Decimal('2000000'),
+)
+
+_TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+
+def tokenize(text):
+    """Lower-case alphanumeric terms of ``text`` without stopwords or duplicates."""
+    terms = []
+    seen = set()
+    for term in _TOKEN_RE.findall((text or '').lower()):
+        term = term[:TERM_MAX_LENGTH]
+        if len(term) < 2 or term in STOPWORDS or term in seen:
+            continue
+        seen.add(term)
+        terms.append(term)
+    return terms
+
+
+def listing_terms(listing):
+    return tokenize(' '.join((listing.title, listing.description, listing.address)))
+
+
+def index_listings(listings, batch_size=1000):
+    """
+    (Re)build the index rows for ``listings``.
+
+    Used by the post_save handler for single rows and directly after
+    ``bulk_create``/``bulk_update``, which don't send signals.
+    """
+    listings = [listing for listing in listings if listing.pk is not None]
+    if not listings:
+        return
+    rows = [
+        ListingSearchTerm(term=term, listing_id=listing.pk)
+        for listing in listings
+        for term in listing_terms(listing)
+    ]
+    with transaction.atomic():
+        ListingSearchTerm.objects.filter(listing_id__in=[l.pk for l in listings]).delete()
+        ListingSearchTerm.objects.bulk_create(rows, batch_size=batch_size)
+
+
+def filter_listings(queryset, q=None, min_price=None, max_price=None,
+                    min_bedrooms=None, max_bedrooms=None,
+                    min_bathrooms=None, max_bathrooms=None):
+    """
+    Apply the search parameters to a ``PropertyListing`` queryset.
+
+    Every query term must match (AND). Term matching is a single
+    ``IN (SELECT listing_id ... GROUP BY listing_id HAVING COUNT = n)``
+    subquery over the term index, so the database never scans listing text.
+    """
+    ranges = {
+        'price__gte': min_price,
+        'price__lte': max_price,
+        'num_bedrooms__gte': min_bedrooms,
+        'num_bedrooms__lte': max_bedrooms,
+        'num_bathrooms__gte': min_bathrooms,
+        'num_bathrooms__lte': max_bathrooms,
+    }
+    queryset = queryset.filter(**{k: v for k, v in ranges.items() if v is not None})
+
+    terms = tokenize(q)
+    if terms:
+        matches = (
+            ListingSearchTerm.objects.filter(term__in=terms)
+            .values('listing_id')
+            .annotate(matched=Count('term'))
+            .filter(matched=len(terms))
+            .values('listing_id')
+        )
+        queryset = queryset.filter(pk__in=matches)
+    return queryset
+
+
+def facet_counts(queryset):
+    """
+    Bedroom buckets and a price histogram for ``queryset`` in one aggregate.
+    """
+    aggregates = {}
+    for bedrooms in BEDROOM_BUCKETS:
+        if bedrooms == BEDROOM_BUCKETS[-1]:
+            condition = Q(num_bedrooms__gte=bedrooms)
+        else:
+            condition = Q(num_bedrooms=bedrooms)
+        aggregates[f'bedrooms_{bedrooms}'] = Count('pk', filter=condition)
+
+    for i, lower in enumerate(PRICE_BUCKETS):
+        condition = Q(price__gte=lower)
+        if i + 1 < len(PRICE_BUCKETS):
+            condition &= Q(price__lt=PRICE_BUCKETS[i + 1])
+        aggregates[f'price_{i}'] = Count('pk', filter=condition)
+
+    counts = queryset.order_by().select_related(None).aggregate(**aggregates)
+
+    bedrooms = []
+    for value in BEDROOM_BUCKETS:
+        label = f'{value}+' if value == BEDROOM_BUCKETS[-1] else str(value)
+        bedrooms.append({'bedrooms': label, 'count': counts[f'bedrooms_{value}']})
+
+    prices = []
+    for i, lower in enumerate(PRICE_BUCKETS):
+        upper = PRICE_BUCKETS[i + 1] if i + 1 < len(PRICE_BUCKETS) else None
+        prices.append({
+            'min': str(lower),
+            'max': str(upper) if upper is not None else None,
+            'count': counts[f'price_{i}'],
+        })
+
+    return {'bedrooms': bedrooms, 'price': prices}
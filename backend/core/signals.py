@@ -0,0 +1,130 @@
+from django.db.models import DEFERRED
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .geo import address_changed, clear_locations
+from . import changes, similar, stats
+from .images import schedule_renditions
+from .models.bookings import Booking
+from .models.listings import PropertyListing
+from .models.services import ServiceOffer
+from .models.stats import UserStats
+from .models.users import User
+from .search import index_listings
+
+SEARCHABLE_FIELDS = {'title', 'description', 'address'}
+
+
+@receiver(post_save, sender=PropertyListing)
+def reindex_listing(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Index rows are removed by the FK cascade when a listing is deleted.
+    if raw or (update_fields is not None and not SEARCHABLE_FIELDS & set(update_fields)):
+        return
+    index_listings([instance])
+
+
+def _image_name(instance):
+    # Read the raw attribute so a deferred ``image`` isn't fetched.
+    value = instance.__dict__.get('image', DEFERRED)
+    if value is DEFERRED:
+        return DEFERRED
+    return getattr(value, 'name', value) or None
+
+
+@receiver(post_init, sender=PropertyListing)
+def remember_image(sender, instance, **kwargs):
+    instance._saved_image_name = _image_name(instance)
+
+
+@receiver(post_save, sender=PropertyListing)
+def process_new_image(sender, instance, raw=False, **kwargs):
+    name = _image_name(instance)
+    if raw or name is DEFERRED or name == instance._saved_image_name:
+        return
+    instance._saved_image_name = name
+    if name:
+        schedule_renditions(instance)
+    elif instance.renditions:
+        instance.renditions = {}
+        instance.save(update_fields=['renditions', 'updated_at'])
+
+
+@receiver(post_init, sender=PropertyListing)
+def remember_address(sender, instance, **kwargs):
+    instance._saved_address = instance.__dict__.get('address', DEFERRED)
+
+
+@receiver(post_save, sender=PropertyListing)
+def forget_stale_location(sender, instance, raw=False, **kwargs):
+    # Coordinates and failed attempts belong to the old address;
+    # geocode_listings picks the listing up again at once.
+    if raw or not address_changed(instance):
+        return
+    instance._saved_address = instance.address
+    location = [instance.__dict__.get(name, DEFERRED) for name in ('latitude', 'geohash', 'geocode_retry_at')]
+    if any(value not in (None, '') for value in location):
+        clear_locations([instance.pk])
+        instance.latitude = instance.longitude = instance.geocode_retry_at = None
+        instance.geohash = ''
+        instance.geocode_failures = 0
+
+
+@receiver(post_init, sender=PropertyListing)
+@receiver(post_init, sender=Booking)
+@receiver(post_init, sender=ServiceOffer)
+def remember_counted_values(sender, instance, **kwargs):
+    stats.remember(instance)
+
+
+@receiver(post_save, sender=PropertyListing)
+@receiver(post_save, sender=Booking)
+@receiver(post_save, sender=ServiceOffer)
+def count_saved(sender, instance, raw=False, **kwargs):
+    if not raw:
+        stats.record_changes([instance])
+
+
+@receiver(post_delete, sender=PropertyListing)
+@receiver(post_delete, sender=Booking)
+@receiver(post_delete, sender=ServiceOffer)
+def count_deleted(sender, instance, **kwargs):
+    stats.record_deletes([instance])
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created=False, raw=False, **kwargs):
+    if created and not raw:
+        stats.create_rows(UserStats, [instance.pk])
+
+
+@receiver(post_delete, sender=PropertyListing)
+def leave_tombstone(sender, instance, **kwargs):
+    changes.record_deletes([instance.pk])
+
+
+@receiver(post_init, sender=User)
+def remember_username(sender, instance, **kwargs):
+    instance._saved_username = instance.__dict__.get('username', DEFERRED)
+
+
+@receiver(post_save, sender=User)
+def touch_seller_listings(sender, instance, created=False, raw=False, **kwargs):
+    # Listings in the change feed show their seller's username.
+    name, saved = instance.__dict__.get('username', DEFERRED), instance._saved_username
+    instance._saved_username = name
+    if created or raw or DEFERRED in (name, saved) or name == saved:
+        return
+    PropertyListing.objects.filter(seller=instance).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=PropertyListing)
+def refresh_similar_vector(sender, instance, raw=False, update_fields=None, **kwargs):
+    if raw or (update_fields is not None and not set(similar.FEATURE_FIELDS) & set(update_fields)):
+        return
+    similar.schedule_refresh([instance.pk])
+
+
+@receiver(post_delete, sender=PropertyListing)
+def remove_similar_vector(sender, instance, **kwargs):
+    similar.schedule_remove([instance.pk])
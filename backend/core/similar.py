@@ -0,0 +1,405 @@
+"""
+"Similar listings": nearest neighbours over precomputed feature vectors.
+
+Every listing is a row of one float32 matrix, stored as an ``.npy`` file
+under ``settings.SIMILAR_LISTINGS['PATH']`` and memory-mapped by every
+process, so workers share one copy through the page cache. A second file,
+``ids.npy``, holds the listing id of each row (0 for a free row), so the
+rows stay dense however sparse the ids are::
+
+    [squared norm | price, bedrooms, bathrooms | hashed TF-IDF of the text]
+
+Price is log-scaled and, like the room counts, standardized with the mean
+and deviation of the whole table; the text part is a binary TF-IDF over
+``core.search.tokenize`` terms hashed into ``TEXT_DIMENSIONS`` columns and
+scaled to unit length. Each group is then multiplied by its ``WEIGHTS``
+entry. Free rows have an infinite norm and are reused for new listings.
+
+A query is one matrix-vector product over the whole map, giving the
+squared euclidean distances ``|x|² - 2 x·q (+ |q|²)``, and an
+``argpartition`` for the top k; no database query.
+
+``manage.py build_similar_index`` computes the statistics and writes the
+matrix to a new file that replaces the old one atomically; run it after
+loading data and then now and then to refresh the statistics. Between
+builds, saves and deletes queue a task (core.tasks) with the transaction
+that rewrites their listings' rows in place (``schedule_refresh``/
+``schedule_remove``), under a file lock shared by all processes; growing
+the files, which copies them, happens there too, never in a request.
+Readers notice rebuilt or grown files by their inodes and map them again.
+"""
+import fcntl
+import json
+import math
+import os
+import threading
+import zlib
+from contextlib import contextmanager
+
+import numpy as np
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models.listings import ListingTombstone, PropertyListing
+from .search import tokenize
+from .tasks import enqueue, task
+
+DEFAULTS = {
+    # Directory of the index files; None disables the index.
+    'PATH': None,
+    'TEXT_DIMENSIONS': 32,
+    'WEIGHTS': {'price': 2.0, 'bedrooms': 1.0, 'bathrooms': 0.5, 'text': 1.0},
+    'MAX_K': 50,
+}
+# Listing fields the vectors are computed from.
+FEATURE_FIELDS = ('price', 'num_bedrooms', 'num_bathrooms', 'title', 'description')
+NUMERIC = ('price', 'bedrooms', 'bathrooms')
+# Column 0 is the squared norm; features start after it.
+FIRST_FEATURE = 1
+FIRST_TEXT = FIRST_FEATURE + len(NUMERIC)
+
+VECTORS = 'vectors.npy'
+IDS = 'ids.npy'
+META = 'meta.json'
+LOCK = 'write.lock'
+
+
+class IndexUnavailable(Exception):
+    pass
+
+
+def get_config():
+    config = {**DEFAULTS, **getattr(settings, 'SIMILAR_LISTINGS', {})}
+    config['WEIGHTS'] = {**DEFAULTS['WEIGHTS'], **config['WEIGHTS']}
+    return config
+
+
+def index_path(name):
+    directory = get_config()['PATH']
+    return None if directory is None else os.path.join(directory, name)
+
+
+def is_built():
+    path = index_path(META)
+    return path is not None and os.path.exists(path)
+
+
+# -- features -----------------------------------------------------------------
+
+_dimensions = {}
+
+
+def text_dimensions(title, description, dimensions):
+    """The hashed columns of the terms of a listing's text."""
+    columns = set()
+    for term in tokenize(f'{title} {description}'):
+        column = _dimensions.get((term, dimensions))
+        if column is None:
+            column = _dimensions[term, dimensions] = zlib.crc32(term.encode()) % dimensions
+        columns.add(column)
+    return columns
+
+
+def raw_numeric(price, bedrooms, bathrooms):
+    return (math.log1p(float(price)), float(bedrooms), float(bathrooms))
+
+
+def finish_rows(rows, meta):
+    """
+    Turn rows holding raw numbers and 0/1 term columns into feature vectors
+    in place: standardize, weight, apply IDF and fill in the norm column.
+    """
+    weights = meta['weights']
+    numeric = rows[:, FIRST_FEATURE:FIRST_TEXT]
+    numeric -= np.asarray(meta['mean'], dtype=np.float32)
+    numeric /= np.asarray(meta['std'], dtype=np.float32)
+    numeric *= np.asarray([weights[name] for name in NUMERIC], dtype=np.float32)
+
+    text = rows[:, FIRST_TEXT:]
+    text *= np.asarray(meta['idf'], dtype=np.float32)
+    lengths = np.linalg.norm(text, axis=1, keepdims=True)
+    np.divide(text, lengths, out=text, where=lengths > 0)
+    text *= weights['text']
+    rows[:, 0] = np.einsum('ij,ij->i', rows[:, FIRST_FEATURE:], rows[:, FIRST_FEATURE:])
+    return rows
+
+
+def featurize(values, meta):
+    """Feature rows for ``(price, bedrooms, bathrooms, title, description)`` tuples."""
+    rows = np.zeros((len(values), FIRST_TEXT + meta['dimensions']), dtype=np.float32)
+    for row, (price, bedrooms, bathrooms, title, description) in zip(rows, values):
+        row[FIRST_FEATURE:FIRST_TEXT] = raw_numeric(price, bedrooms, bathrooms)
+        row[FIRST_TEXT + np.fromiter(text_dimensions(title, description, meta['dimensions']), int)] = 1
+    return finish_rows(rows, meta)
+
+
+# -- reading ------------------------------------------------------------------
+
+_reader = {'inodes': None, 'index': None}
+_reader_lock = threading.Lock()
+
+
+def get_index():
+    """
+    The memory-mapped matrix and the listing id of each of its rows, mapped
+    again if either file was replaced.
+    """
+    paths = index_path(VECTORS), index_path(IDS)
+    try:
+        inodes = tuple(os.stat(path).st_ino for path in paths) if paths[0] else None
+    except FileNotFoundError:
+        inodes = None
+    if inodes is None:
+        raise IndexUnavailable('The similar listings index has not been built.')
+    if _reader['inodes'] != inodes:
+        with _reader_lock:
+            if _reader['inodes'] != inodes:
+                vectors, ids = (np.load(path, mmap_mode='r') for path in paths)
+                # Between the two replaces of a growth one file is longer;
+                # its extra rows aren't in use yet.
+                rows = min(len(vectors), len(ids))
+                _reader['index'] = vectors[:rows], ids[:rows]
+                _reader['inodes'] = inodes
+    return _reader['index']
+
+
+def get_meta():
+    path = index_path(META)
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, TypeError):
+        raise IndexUnavailable('The similar listings index has not been built.')
+
+
+@receiver(setting_changed)
+def reset_reader(setting, **kwargs):
+    if setting == 'SIMILAR_LISTINGS':
+        _reader.update(inodes=None, index=None)
+
+
+def nearest(vectors, query, k, exclude=None):
+    """Row numbers of the ``k`` rows of ``vectors`` closest to ``query`` and their distances."""
+    # One product over whole rows: [1, -2q] . [|x|², x] = |x|² - 2 x·q.
+    weights = np.empty_like(query)
+    weights[0] = 1
+    weights[FIRST_FEATURE:] = -2 * query[FIRST_FEATURE:]
+    distances = vectors @ weights
+    distances += query[0]
+    if exclude is not None and exclude < len(distances):
+        distances[exclude] = np.inf
+    k = min(k, len(distances))
+    if k <= 0:
+        return [], []
+    rows = np.argpartition(distances, k - 1)[:k]
+    rows = rows[np.argsort(distances[rows], kind='stable')]
+    rows = rows[np.isfinite(distances[rows])]
+    return rows.tolist(), np.sqrt(np.maximum(distances[rows], 0)).tolist()
+
+
+def similar_to(listing, k=10):
+    """
+    ``[(listing_id, distance)]`` of the ``k`` listings closest to
+    ``listing``, nearest first. ``listing`` needs ``FEATURE_FIELDS`` loaded
+    when it isn't in the index yet.
+    """
+    vectors, ids = get_index()
+    found = np.flatnonzero(ids == listing.pk)
+    row = int(found[0]) if len(found) else None
+    if row is not None and np.isfinite(vectors[row, 0]):
+        query = np.array(vectors[row])
+    else:
+        query = featurize([[getattr(listing, name) for name in FEATURE_FIELDS]], get_meta())[0]
+    rows, distances = nearest(vectors, query, k, exclude=row)
+    # A row being filled in has its vector before its id.
+    return [(int(ids[row]), distance) for row, distance in zip(rows, distances) if ids[row]]
+
+
+# -- writing ------------------------------------------------------------------
+
+@contextmanager
+def write_lock():
+    with open(index_path(LOCK), 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def empty_rows(path, count, width):
+    rows = np.lib.format.open_memmap(path, mode='w+', dtype=np.float32, shape=(count, width))
+    rows[:, 0] = np.inf
+    return rows
+
+
+def empty_ids(path, count):
+    return np.lib.format.open_memmap(path, mode='w+', dtype=np.int64, shape=(count,))
+
+
+def capacity_for(count):
+    return int(count * 1.25) + 1024
+
+
+def open_for_writing():
+    return np.load(index_path(VECTORS), mmap_mode='r+'), np.load(index_path(IDS), mmap_mode='r+')
+
+
+def grow(vectors, ids, needed):
+    """Copy the files into ones with room for ``needed`` more rows."""
+    capacity = capacity_for(len(ids) + needed)
+    for name, old, new in (
+        (IDS, ids, lambda path: empty_ids(path, capacity)),
+        (VECTORS, vectors, lambda path: empty_rows(path, capacity, vectors.shape[1])),
+    ):
+        path = index_path(name)
+        grown = new(path + '.tmp')
+        grown[:len(old)] = old
+        grown.flush()
+        del grown
+        os.replace(path + '.tmp', path)
+    return open_for_writing()
+
+
+def write_rows(rows):
+    """
+    Store ``{listing_id: vector or None}`` (None frees the listing's row).
+    New listings take free rows, and the files grow when none are left.
+    Call with the write lock held.
+    """
+    vectors, ids = open_for_writing()
+    found = np.flatnonzero(np.isin(ids, np.fromiter(rows, np.int64)))
+    where = dict(zip(ids[found].tolist(), found.tolist()))
+    new = [pk for pk, vector in rows.items() if vector is not None and pk not in where]
+    free = np.flatnonzero(ids == 0)
+    if len(free) < len(new):
+        vectors, ids = grow(vectors, ids, len(new) - len(free))
+        free = np.flatnonzero(ids == 0)
+    where.update(zip(new, free.tolist()))
+    for pk, vector in rows.items():
+        row = where.get(pk)
+        if row is None:
+            continue
+        # Readers skip rows with an infinite norm or no id, so the vector
+        # goes in before the id and the id goes after the norm.
+        if vector is None:
+            vectors[row, 0] = np.inf
+            ids[row] = 0
+        else:
+            vectors[row] = vector
+            ids[row] = pk
+    vectors.flush()
+    ids.flush()
+
+
+def refresh(pks):
+    """Recompute the rows of listings ``pks``; rows of deleted ones are freed."""
+    if not pks or not is_built():
+        return
+    with write_lock():
+        # Read under the lock, so of two refreshes of a listing the one
+        # that writes last saw its latest committed values.
+        values = {
+            pk: rest for pk, *rest in
+            PropertyListing.objects.filter(pk__in=pks).values_list('pk', *FEATURE_FIELDS).iterator()
+        }
+        meta = get_meta()
+        found = list(values)
+        rows = dict.fromkeys(pks)
+        if found:
+            rows.update(zip(found, featurize([values[pk] for pk in found], meta)))
+        write_rows(rows)
+
+
+def remove(pks):
+    if pks and is_built():
+        with write_lock():
+            write_rows(dict.fromkeys(pks))
+
+
+@task
+def refresh_rows(pks):
+    refresh(pks)
+
+
+def schedule_refresh(pks):
+    """Queue a refresh of the rows of ``pks`` with the current transaction."""
+    if is_built():
+        enqueue(refresh_rows, pks=list(pks))
+
+
+def schedule_remove(pks):
+    # The refresh frees the rows of listings that are gone.
+    schedule_refresh(pks)
+
+
+def build(batch_size=5000):
+    """
+    Compute the statistics and every row from the database and swap the new
+    files in. Changes made while it runs are applied afterwards from
+    ``updated_at`` and the delete tombstones (see core.changes). Returns
+    the number of listings indexed.
+    """
+    config = get_config()
+    os.makedirs(config['PATH'], exist_ok=True)
+    dimensions = config['TEXT_DIMENSIONS']
+    started = timezone.now()
+    capacity = capacity_for(PropertyListing.objects.count())
+    rows = empty_rows(index_path(VECTORS) + '.build', capacity, FIRST_TEXT + dimensions)
+    ids = empty_ids(index_path(IDS) + '.build', capacity)
+
+    # Pass 1: raw numbers and term columns; statistics.
+    filled = 0
+    listings = PropertyListing.objects.order_by('pk').values_list('pk', *FEATURE_FIELDS)
+    cursor = 0
+    while True:
+        batch = list(listings.filter(pk__gt=cursor)[:batch_size])
+        if not batch:
+            break
+        for pk, price, bedrooms, bathrooms, title, description in batch:
+            if filled == capacity:
+                # Created after the count; the refresh below adds it.
+                continue
+            row = rows[filled]
+            row[0] = 0
+            row[FIRST_FEATURE:FIRST_TEXT] = raw_numeric(price, bedrooms, bathrooms)
+            for column in text_dimensions(title, description, dimensions):
+                row[FIRST_TEXT + column] = 1
+            ids[filled] = pk
+            filled += 1
+        cursor = batch[-1][0]
+
+    numeric = np.asarray(rows[:filled, FIRST_FEATURE:FIRST_TEXT], dtype=np.float64)
+    document_frequency = np.count_nonzero(rows[:filled, FIRST_TEXT:], axis=0)
+    std = numeric.std(axis=0) if filled else np.ones(len(NUMERIC))
+    meta = {
+        'dimensions': dimensions,
+        'weights': config['WEIGHTS'],
+        'mean': (numeric.mean(axis=0) if filled else np.zeros(len(NUMERIC))).tolist(),
+        'std': np.where(std > 0, std, 1).tolist(),
+        'idf': (np.log((1 + filled) / (1 + np.asarray(document_frequency))) + 1).tolist(),
+        'listings': filled,
+        'built_at': started.isoformat(),
+    }
+
+    # Pass 2: finish the rows in place, a chunk at a time.
+    for start in range(0, filled, batch_size):
+        chunk = slice(start, min(start + batch_size, filled))
+        rows[chunk] = finish_rows(np.array(rows[chunk]), meta)
+    rows.flush()
+    ids.flush()
+    del rows, ids
+
+    with open(index_path(META) + '.build', 'w') as f:
+        json.dump(meta, f)
+    # A query between these replaces may pair the new ids with the old
+    # rows; the next one maps both files again.
+    with write_lock():
+        for name in (IDS, VECTORS, META):
+            os.replace(index_path(name) + '.build', index_path(name))
+
+    refresh(list(PropertyListing.objects.filter(updated_at__gte=started).values_list('pk', flat=True)))
+    remove(list(ListingTombstone.objects.filter(deleted_at__gte=started).values_list('listing_id', flat=True)))
+    return filled
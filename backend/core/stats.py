@@ -0,0 +1,375 @@
+"""
+Denormalized dashboard counters (``core.models.stats``).
+
+Every listing, booking and service offer adds one to a fixed set of
+counters (``contributions``): a booking, for instance, counts towards its
+buyer's ``bookings_made``, its listing's ``bookings`` and the listing's
+seller's ``bookings_received``. The values those counters depend on are
+remembered when an instance is loaded; on save, ``record_changes`` takes
+the old contributions away and adds the new ones, and on delete
+``record_deletes`` takes them away. The net changes are applied as
+``UPDATE ... SET n = n + delta``, one statement per counter row, so
+concurrent writers never lose increments.
+
+Rows that don't exist yet (new users and listings, or rows never built for
+existing data) are computed from the source tables instead, with the same
+queries ``reconcile`` uses to repair drift, e.g. from ``bulk_create`` or
+``QuerySet.update`` calls that send no signals. Run it periodically::
+
+    python manage.py reconcile_stats
+"""
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import DEFERRED, Case, Count, F, Value, When
+
+from .models.bookings import Booking
+from .models.listings import PropertyListing
+from .models.services import ServiceOffer
+from .models.stats import ListingStats, ProviderListingStats, UserStats
+from .models.users import User
+
+# Fields of each counted model that decide which counters it contributes to.
+TRACKED_FIELDS = {
+    PropertyListing: ('seller_id',),
+    Booking: ('buyer_id', 'property_id'),
+    ServiceOffer: ('service_provider_id', 'property_id', 'approved'),
+}
+# Target standing for "the UserStats of the seller of listing <key>".
+SELLER = 'seller'
+# Values of an instance loaded with some tracked field deferred.
+UNKNOWN = object()
+
+# (counter, source queryset, grouping column, distinct column) for reconcile.
+USER_SOURCES = (
+    ('listings', PropertyListing.objects.all(), 'seller_id', None),
+    ('bookings_received', Booking.objects.all(), 'property__seller_id', None),
+    ('offers_received', ServiceOffer.objects.all(), 'property__seller_id', None),
+    ('bookings_made', Booking.objects.all(), 'buyer_id', None),
+    ('offers', ServiceOffer.objects.all(), 'service_provider_id', None),
+    ('offers_approved', ServiceOffer.objects.filter(approved=True), 'service_provider_id', None),
+    ('properties_served', ServiceOffer.objects.all(), 'service_provider_id', 'property_id'),
+)
+LISTING_SOURCES = (
+    ('bookings', Booking.objects.all(), 'property_id', None),
+    ('offers', ServiceOffer.objects.all(), 'property_id', None),
+    ('offers_approved', ServiceOffer.objects.filter(approved=True), 'property_id', None),
+)
+
+
+def contributions(model, values):
+    """The ``(target, key, counter)`` triples one row with ``values`` counts towards."""
+    if model is PropertyListing:
+        return [(UserStats, values['seller_id'], 'listings')]
+    if model is Booking:
+        return [
+            (UserStats, values['buyer_id'], 'bookings_made'),
+            (ListingStats, values['property_id'], 'bookings'),
+            (SELLER, values['property_id'], 'bookings_received'),
+        ]
+    provider, listing = values['service_provider_id'], values['property_id']
+    counters = [
+        (UserStats, provider, 'offers'),
+        (ListingStats, listing, 'offers'),
+        (SELLER, listing, 'offers_received'),
+        (ProviderListingStats, (provider, listing), 'offers'),
+    ]
+    if values['approved']:
+        counters += [(UserStats, provider, 'offers_approved'), (ListingStats, listing, 'offers_approved')]
+    return counters
+
+
+def snapshot(instance):
+    values = {name: instance.__dict__.get(name, DEFERRED) for name in TRACKED_FIELDS[type(instance)]}
+    return UNKNOWN if DEFERRED in values.values() else values
+
+
+def remember(instance):
+    """Called on ``post_init``: new instances don't count towards anything yet."""
+    instance._stats_values = None if instance.pk is None else snapshot(instance)
+
+
+# -- incremental updates ------------------------------------------------------
+
+def record_changes(instances, created=False):
+    """
+    Apply the counter changes of saving ``instances``. ``created`` marks
+    rows just inserted in bulk, whatever they were loaded as.
+    """
+    deltas = Counter()
+    rebuild = set()
+    new_listings = []
+    for instance in instances:
+        model = type(instance)
+        old = None if created else getattr(instance, '_stats_values', UNKNOWN)
+        if old is None and model is PropertyListing:
+            new_listings.append(instance.pk)
+        new = snapshot(instance)
+        if new is UNKNOWN:
+            instance.refresh_from_db(fields=TRACKED_FIELDS[model])
+            new = snapshot(instance)
+        if old is UNKNOWN:
+            # We can't tell what changed: rebuild what the row counts towards now.
+            rebuild.update((target, key) for target, key, _ in contributions(model, new))
+        elif old is not None:
+            deltas.subtract(contributions(model, old))
+            if model is PropertyListing and old['seller_id'] != new['seller_id']:
+                # The listing's bookings and offers move to the new seller.
+                rebuild.update({(UserStats, old['seller_id']), (UserStats, new['seller_id'])})
+        if old is not UNKNOWN:
+            deltas.update(contributions(model, new))
+        instance._stats_values = new
+    if new_listings:
+        create_rows(ListingStats, new_listings)
+    apply(deltas, rebuild, instances)
+
+
+def create_rows(model, keys):
+    """Zeroed counter rows for new users or listings, so reads never miss."""
+    model.objects.bulk_create([model(pk=key) for key in keys], ignore_conflicts=True)
+
+
+def record_deletes(instances):
+    deltas = Counter()
+    for instance in instances:
+        values = getattr(instance, '_stats_values', None)
+        if not isinstance(values, dict):
+            values = snapshot(instance)
+        if isinstance(values, dict):
+            deltas.subtract(contributions(type(instance), values))
+    apply(deltas, set(), instances)
+
+
+def apply(deltas, rebuild, instances=()):
+    grouped = defaultdict(Counter)
+    for (target, key, counter), delta in deltas.items():
+        if delta:
+            grouped[target, key][counter] += delta
+    if not grouped and not rebuild:
+        return
+
+    with transaction.atomic():
+        _resolve_sellers(grouped, rebuild, instances)
+        recount_served = set()
+        for (target, key), counters in list(grouped.items()):
+            if target is ProviderListingStats:
+                del grouped[target, key]
+                served = _apply_rollup(*key, counters['offers'])
+                if served is None:
+                    recount_served.add(key[0])
+                elif served:
+                    grouped[UserStats, key[0]]['properties_served'] += served
+
+        for (target, key), counters in grouped.items():
+            counters = {name: delta for name, delta in counters.items() if delta}
+            if not counters or (target, key) in rebuild:
+                continue
+            updated = target.objects.filter(pk=key).update(
+                **{name: _add(name, delta) for name, delta in counters.items()}
+            )
+            # A missing row is built from the source tables, which already
+            # include this change. Not for decrements: they come from deletes,
+            # possibly cascading from the very user or listing the row is for.
+            if not updated and any(delta > 0 for delta in counters.values()):
+                rebuild.add((target, key))
+
+        for provider_id in recount_served:
+            UserStats.objects.filter(pk=provider_id).update(properties_served=(
+                ServiceOffer.objects.filter(service_provider_id=provider_id)
+                .values('property_id').distinct().count()
+            ))
+        users = [key for target, key in rebuild if target is UserStats]
+        listings = [key for target, key in rebuild if target is ListingStats]
+        if users:
+            reconcile_users(users)
+        if listings:
+            reconcile_listings(listings)
+
+
+def _resolve_sellers(grouped, rebuild, instances):
+    """Replace ``SELLER`` targets by the sellers' ``UserStats``."""
+    listing_ids = {key for target, key in list(grouped) + list(rebuild) if target is SELLER}
+    if not listing_ids:
+        return
+    sellers = {}
+    for instance in instances:
+        # Reuse listings the caller already loaded.
+        relation = type(instance)._meta.get_field('property') if type(instance) is not PropertyListing else None
+        if relation is not None and relation.is_cached(instance):
+            sellers[instance.property_id] = instance.property.seller_id
+    missing = listing_ids - sellers.keys()
+    if missing:
+        sellers.update(PropertyListing.objects.filter(pk__in=missing).values_list('pk', 'seller_id'))
+
+    for target, key in list(grouped):
+        if target is SELLER:
+            counters = grouped.pop((target, key))
+            # A listing deleted in the same cascade has no seller left to update.
+            if key in sellers:
+                grouped[UserStats, sellers[key]].update(counters)
+    for target, key in list(rebuild):
+        if target is SELLER:
+            rebuild.discard((target, key))
+            if key in sellers:
+                rebuild.add((UserStats, sellers[key]))
+
+
+def _add(name, delta):
+    if delta > 0:
+        return F(name) + delta
+    # Never below zero (and no unsigned underflow on MySQL).
+    return Case(When(**{f'{name}__gte': -delta}, then=F(name) + delta), default=Value(0))
+
+
+def _apply_rollup(provider_id, listing_id, delta):
+    """
+    Apply ``delta`` to a rollup row. Returns the change in properties
+    served, or None if it can't tell (the row was already deleted, as
+    happens when a listing is deleted with its offers).
+    """
+    rows = ProviderListingStats.objects.filter(provider_id=provider_id, listing_id=listing_id)
+    if delta < 0:
+        if not rows.update(offers=_add('offers', delta)):
+            return None
+        removed, _ = rows.filter(offers=0).delete()
+        return -removed
+    if not delta or rows.update(offers=F('offers') + delta):
+        return 0
+    count = ServiceOffer.objects.filter(service_provider_id=provider_id, property_id=listing_id).count()
+    if not count:
+        return 0
+    try:
+        with transaction.atomic():
+            ProviderListingStats.objects.create(provider_id=provider_id, listing_id=listing_id, offers=count)
+    except IntegrityError:
+        # Created concurrently; its count may predate this change.
+        rows.update(offers=count)
+        return 0
+    return 1
+
+
+# -- reconciliation -----------------------------------------------------------
+
+def expected_counts(sources, keys=None):
+    """``{key: {counter: n}}`` computed from the source tables, one query per counter."""
+    counts = defaultdict(dict)
+    for counter, queryset, group, distinct in sources:
+        if keys is not None:
+            queryset = queryset.filter(**{f'{group}__in': keys})
+        rows = (
+            queryset.order_by().values(group)
+            .annotate(n=Count(distinct or 'pk', distinct=bool(distinct)))
+            .values_list(group, 'n')
+        )
+        for key, n in rows:
+            counts[key][counter] = n
+    return counts
+
+
+def batches(queryset, batch_size, keys=None):
+    """
+    ``keys`` in chunks of ``batch_size``, or without keys the pks of
+    ``queryset`` in pk order, a page at a time.
+    """
+    if keys is not None:
+        keys = list(keys)
+        for start in range(0, len(keys), batch_size):
+            yield keys[start:start + batch_size]
+        return
+    cursor = None
+    pks = queryset.order_by('pk').values_list('pk', flat=True)
+    while True:
+        chunk = list((pks if cursor is None else pks.filter(pk__gt=cursor))[:batch_size])
+        if not chunk:
+            return
+        yield chunk
+        cursor = chunk[-1]
+
+
+def _reconcile(model, owner_model, sources, keys=None, dry_run=False, batch_size=500):
+    """
+    Recount the rows of ``keys`` (default all) a batch at a time. Each
+    batch locks its counter rows before counting, so an increment either
+    committed before the count (and is in it) or waits for the batch to
+    commit and applies on top of it.
+    """
+    counters = [counter for counter, *_ in sources]
+    fixed = 0
+    for chunk in batches(owner_model.objects.all(), batch_size, keys):
+        with transaction.atomic():
+            rows = model.objects.all() if dry_run else model.objects.select_for_update()
+            existing = rows.in_bulk(chunk)
+            expected = expected_counts(sources, chunk)
+            created, changed = [], []
+            for key in chunk:
+                values = {counter: expected.get(key, {}).get(counter, 0) for counter in counters}
+                row = existing.get(key)
+                if row is None:
+                    created.append(model(pk=key, **values))
+                elif any(getattr(row, counter) != value for counter, value in values.items()):
+                    for counter, value in values.items():
+                        setattr(row, counter, value)
+                    changed.append(row)
+            fixed += len(created) + len(changed)
+            if dry_run:
+                continue
+            # Rows built concurrently were computed the same way.
+            model.objects.bulk_create(created, ignore_conflicts=True)
+            model.objects.bulk_update(changed, counters)
+    return fixed
+
+
+def reconcile_users(user_ids=None, dry_run=False, batch_size=500):
+    return _reconcile(UserStats, User, USER_SOURCES, user_ids, dry_run, batch_size)
+
+
+def reconcile_listings(listing_ids=None, dry_run=False, batch_size=500):
+    return _reconcile(ListingStats, PropertyListing, LISTING_SOURCES, listing_ids, dry_run, batch_size)
+
+
+def reconcile_rollups(dry_run=False, batch_size=500):
+    """Recount the rollup rows a batch of providers at a time, locked like ``_reconcile``."""
+    fixed = 0
+    for providers in batches(User.objects.all(), batch_size):
+        with transaction.atomic():
+            rows = ProviderListingStats.objects.filter(provider_id__in=providers)
+            if not dry_run:
+                rows = rows.select_for_update()
+            rows = list(rows.order_by('pk'))
+            expected = {
+                (provider, listing): n for provider, listing, n in
+                ServiceOffer.objects.filter(service_provider_id__in=providers)
+                .order_by().values('service_provider_id', 'property_id')
+                .annotate(n=Count('pk')).values_list('service_provider_id', 'property_id', 'n')
+            }
+            stale, changed = [], []
+            for row in rows:
+                n = expected.pop((row.provider_id, row.listing_id), 0)
+                if not n:
+                    stale.append(row.pk)
+                elif row.offers != n:
+                    row.offers = n
+                    changed.append(row)
+            created = [
+                ProviderListingStats(provider_id=provider, listing_id=listing, offers=n)
+                for (provider, listing), n in expected.items()
+            ]
+            fixed += len(stale) + len(changed) + len(created)
+            if dry_run:
+                continue
+            ProviderListingStats.objects.filter(pk__in=stale).delete()
+            ProviderListingStats.objects.bulk_update(changed, ['offers'])
+            ProviderListingStats.objects.bulk_create(created, ignore_conflicts=True)
+    return fixed
+
+
+def reconcile(dry_run=False):
+    """
+    Repair every counter; returns the number of rows fixed per table. Runs
+    in short per-batch transactions, alongside live traffic.
+    """
+    return {
+        'rollups': reconcile_rollups(dry_run),
+        'users': reconcile_users(dry_run=dry_run),
+        'listings': reconcile_listings(dry_run=dry_run),
+    }
@@ -0,0 +1,164 @@
+"""
+Storage backends for uploads (``STORAGES['default']``).
+
+Both store files under content-hashed names: ``house.jpg`` is saved as
+``house.3f2a9c41d07be5e8.jpg``, the hash taken from the bytes. A name
+therefore always refers to the same content, which is what lets
+``api/media.py`` (and a CDN in front of S3) serve them with a one-year
+``immutable`` Cache-Control. Saving identical bytes again returns the
+stored name instead of writing a copy. Names that already carry their
+content hash (the renditions written by ``core/images.py``) are kept.
+
+``HashedFileSystemStorage`` writes under ``MEDIA_ROOT``.
+``S3Storage`` writes to a bucket on S3 or an S3-compatible server (MinIO,
+Ceph, ...) through ``boto3``, which is only needed when it is configured::
+
+    STORAGES = {'default': {
+        'BACKEND': 'core.storage.S3Storage',
+        'OPTIONS': {'bucket': 'listing-media', 'endpoint_url': 'http://localhost:9000',
+                    'custom_domain': 'https://media.example.com'},
+    }, ...}
+"""
+import hashlib
+import mimetypes
+import posixpath
+import re
+
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files import File
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage, Storage
+from django.utils.deconstruct import deconstructible
+
+HASH_LENGTH = 16
+# ``<stem>.<hash>.<ext>`` or ``<hash>.<ext>``, at least HASH_LENGTH hex digits.
+HASHED_NAME = re.compile(r'(?:^|[/.])([0-9a-f]{%d,64})\.[A-Za-z0-9]+$' % HASH_LENGTH)
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+
+def is_hashed(name):
+    return HASHED_NAME.search(name) is not None
+
+
+def content_hash(content):
+    digest = hashlib.sha256()
+    for chunk in content.chunks():
+        digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hashed_name(name, content):
+    """``name`` with the content hash of ``content`` inserted before the extension."""
+    digest = content_hash(content)
+    directory, filename = posixpath.split(name)
+    stem, extension = posixpath.splitext(filename)
+    if len(stem) >= HASH_LENGTH and digest.startswith(stem):
+        return name
+    return posixpath.join(directory, f'{stem}.{digest[:HASH_LENGTH]}{extension}')
+
+
+class HashedNameMixin:
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = hashed_name(str(name), content)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length=max_length)
+
+
+@deconstructible(path='core.storage.HashedFileSystemStorage')
+class HashedFileSystemStorage(HashedNameMixin, FileSystemStorage):
+    pass
+
+
+@deconstructible(path='core.storage.S3Storage')
+class S3Storage(HashedNameMixin, Storage):
+    """
+    Files in ``bucket`` under the key prefix ``location``. URLs are
+    ``custom_domain`` + key when set (a CDN or a public bucket), otherwise
+    presigned GET URLs valid for ``querystring_expire`` seconds.
+    """
+
+    def __init__(self, bucket=None, location='', endpoint_url=None, region_name=None,
+                 access_key=None, secret_key=None, custom_domain=None,
+                 querystring_expire=3600, client=None):
+        if not bucket:
+            raise ImproperlyConfigured("core.storage.S3Storage requires the 'bucket' option.")
+        self.bucket = bucket
+        self.location = location.strip('/')
+        self.custom_domain = custom_domain.rstrip('/') if custom_domain else None
+        self.querystring_expire = querystring_expire
+        if client is None:
+            try:
+                import boto3
+            except ImportError as exc:
+                raise ImproperlyConfigured(
+                    'core.storage.S3Storage requires the "boto3" package.'
+                ) from exc
+            client = boto3.client(
+                's3', endpoint_url=endpoint_url, region_name=region_name,
+                aws_access_key_id=access_key, aws_secret_access_key=secret_key,
+            )
+        self.client = client
+
+    def key(self, name):
+        return posixpath.join(self.location, name) if self.location else name
+
+    def head(self, name):
+        """The object's metadata, or None if there is no such object."""
+        try:
+            return self.client.head_object(Bucket=self.bucket, Key=self.key(name))
+        except self.client.exceptions.ClientError as exc:
+            if exc.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return None
+            raise
+
+    def _open(self, name, mode='rb'):
+        if 'w' in mode or 'a' in mode:
+            raise ValueError('S3Storage files are read-only; use save().')
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.key(name))
+        except self.client.exceptions.ClientError as exc:
+            if exc.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey'):
+                raise FileNotFoundError(name) from exc
+            raise
+        return ContentFile(response['Body'].read(), name=name)
+
+    def _save(self, name, content):
+        content.seek(0)
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        extra = {'CacheControl': IMMUTABLE_CACHE_CONTROL} if is_hashed(name) else {}
+        self.client.put_object(
+            Bucket=self.bucket, Key=self.key(name), Body=content, ContentType=content_type, **extra
+        )
+        return name
+
+    def exists(self, name):
+        return self.head(name) is not None
+
+    def delete(self, name):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key(name))
+
+    def size(self, name):
+        metadata = self.head(name)
+        if metadata is None:
+            raise FileNotFoundError(name)
+        return metadata['ContentLength']
+
+    def get_modified_time(self, name):
+        metadata = self.head(name)
+        if metadata is None:
+            raise FileNotFoundError(name)
+        return metadata['LastModified']
+
+    def url(self, name):
+        if self.custom_domain:
+            return f'{self.custom_domain}/{self.key(name)}'
+        return self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self.key(name)},
+            ExpiresIn=self.querystring_expire,
+        )
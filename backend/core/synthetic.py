@@ -0,0 +1,184 @@
+"""
+Reproducible synthetic data for benchmarks.
+
+Everything is written with ``bulk_create`` in batches, so signal handlers do
+not run; callers rebuild derived data afterwards (``rebuild_derived``).
+
+The rows go to the configured database, so the management commands that
+generate them refuse to run without ``--yes`` (``add_confirm_argument`` and
+``confirm_writes``).
+"""
+import datetime
+import random
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import CommandError
+from django.db import connections
+
+from .geo import set_location
+from .models.bookings import Booking
+from .models.listings import PropertyListing
+from .models.services import ServiceOffer
+from .models.users import User
+from .search import index_listings
+from .stats import reconcile
+
+ADJECTIVES = ['Bright', 'Spacious', 'Modern', 'Charming', 'Renovated', 'Quiet', 'Sunny', 'Elegant', 'Cosy', 'Classic']
+KINDS = ['apartment', 'townhouse', 'bungalow', 'villa', 'cottage', 'loft', 'duplex', 'condo']
+AREAS = ['Riverside', 'Oakwood', 'Hillcrest', 'Lakeview', 'Downtown', 'Greenfield', 'Harbour', 'Maple Park']
+STREETS = ['Main Street', 'Oak Avenue', 'Park Road', 'Elm Street', 'High Street', 'Station Road', 'Church Lane']
+FEATURES = [
+    'a private garden', 'a renovated kitchen', 'hardwood floors', 'a double garage', 'a sea view',
+    'solar panels', 'a home office', 'a swimming pool', 'underfloor heating', 'a roof terrace',
+    'an open plan living room', 'fitted wardrobes', 'a quiet cul-de-sac location', 'a large basement',
+]
+SERVICES = [
+    ('Home inspection', 'Full structural and electrical inspection with a written report.'),
+    ('Professional photography', 'Twenty edited photos and a floor plan, ready for the listing.'),
+    ('Deep cleaning', 'Whole-house clean before viewings, including windows and carpets.'),
+    ('Staging', 'Furniture and decor staging for the main living areas.'),
+    ('Mortgage advice', 'A free consultation on financing options for buyers.'),
+    ('Moving service', 'Packing, transport and unpacking with a two-person crew.'),
+    ('Garden makeover', 'Lawn, hedges and flower beds tidied for kerb appeal.'),
+]
+
+
+def add_confirm_argument(parser):
+    parser.add_argument(
+        '--yes', action='store_true',
+        help='Confirm that the configured database is a scratch one synthetic rows may be added to.',
+    )
+
+
+def confirm_writes(options, using='default'):
+    """Raise ``CommandError`` naming the target database unless ``--yes`` was given."""
+    if not options['yes']:
+        settings_dict = connections[using].settings_dict
+        raise CommandError(
+            f"This adds synthetic rows to the {connections[using].vendor} database "
+            f"{settings_dict['NAME']!r}. Pass --yes if it is a scratch database."
+        )
+
+
+def create_users(count, role, seed=0, prefix='synthetic', batch_size=5000):
+    """Create ``count`` users named ``<prefix>-<role>-<seed>-<n>`` and return their ids."""
+    # Hashing is deliberately slow; every synthetic user shares one hash.
+    password = make_password(None)
+    name = f'{prefix}-{role}-{seed}-'
+    users = (
+        User(username=f'{name}{i}', email=f'{name}{i}@example.com', role=role, password=password)
+        for i in range(count)
+    )
+    _bulk_create(User, users, batch_size, ignore_conflicts=True)
+    return list(User.objects.filter(username__startswith=name).values_list('id', flat=True))
+
+
+def listing_values(rng):
+    bedrooms = rng.choices(range(7), weights=[3, 12, 25, 28, 18, 9, 5])[0]
+    bathrooms = max(1, bedrooms - rng.randint(0, 2))
+    area = rng.choice(AREAS)
+    kind = rng.choice(KINDS)
+    price = Decimal(rng.randint(60, 400) * 1000 + bedrooms * rng.randint(40, 180) * 1000)
+    features = rng.sample(FEATURES, 3)
+    return {
+        'title': f'{rng.choice(ADJECTIVES)} {bedrooms} bedroom {kind} in {area}',
+        'description': (
+            f'This {kind} offers {bedrooms} bedrooms and {bathrooms} bathrooms, '
+            f'with {features[0]}, {features[1]} and {features[2]}.'
+        ),
+        'address': f'{rng.randint(1, 999)} {rng.choice(STREETS)}, {area}',
+        'num_bedrooms': bedrooms,
+        'num_bathrooms': bathrooms,
+        'price': price,
+    }
+
+
+def create_listings(count, seller_ids, seed=0, batch_size=5000, bounds=None):
+    """
+    Create ``count`` listings spread over ``seller_ids``. With ``bounds``
+    ``(south, west, north, east)`` each gets a random location inside it;
+    the other values don't depend on whether it's given.
+    """
+    rng = random.Random(seed)
+    locations = random.Random(seed + 1)
+
+    def listing():
+        obj = PropertyListing(seller_id=rng.choice(seller_ids), **listing_values(rng))
+        if bounds:
+            south, west, north, east = bounds
+            set_location(obj, (locations.uniform(south, north), locations.uniform(west, east)))
+        return obj
+
+    _bulk_create(PropertyListing, (listing() for _ in range(count)), batch_size)
+
+
+def create_bookings(count, buyer_ids, listing_ids, seed=0, batch_size=5000, start=None):
+    """
+    Create ``count`` bookings by random buyers. Slots are handed out in
+    order (every listing's 09:00 on day one, then 10:00 ...), so they never
+    collide with each other.
+    """
+    rng = random.Random(seed)
+    start = start or datetime.date.today() + datetime.timedelta(days=1)
+    per_day = len(listing_ids) * 8
+    bookings = (
+        Booking(
+            buyer_id=rng.choice(buyer_ids),
+            property_id=listing_ids[i % len(listing_ids)],
+            scheduled_date=start + datetime.timedelta(days=i // per_day),
+            scheduled_time=datetime.time(9 + (i // len(listing_ids)) % 8),
+            message=rng.choice(['', 'Is parking available?', 'Can I bring my partner?', None]),
+        )
+        for i in range(count)
+    )
+    _bulk_create(Booking, bookings, batch_size)
+
+
+def create_offers(count, provider_ids, listing_ids, seed=0, batch_size=5000, approved=0.6):
+    """Create ``count`` service offers; about ``approved`` of them approved."""
+    rng = random.Random(seed)
+
+    def offer():
+        title, description = rng.choice(SERVICES)
+        return ServiceOffer(
+            service_provider_id=rng.choice(provider_ids),
+            property_id=rng.choice(listing_ids),
+            title=title,
+            description=description,
+            approved=rng.random() < approved,
+        )
+
+    _bulk_create(ServiceOffer, (offer() for _ in range(count)), batch_size)
+
+
+def index_new_listings(after_listing_id=0, batch_size=5000):
+    """Build search index rows for the listings with ids above ``after_listing_id``."""
+    new_rows = PropertyListing.objects.filter(id__gt=after_listing_id).order_by('id')
+    batch = []
+    for listing in new_rows.iterator(chunk_size=batch_size):
+        batch.append(listing)
+        if len(batch) >= batch_size:
+            index_listings(batch, batch_size=batch_size * 4)
+            batch = []
+    index_listings(batch, batch_size=batch_size * 4)
+
+
+def rebuild_derived(after_listing_id=0, batch_size=5000):
+    """
+    Build what the skipped signal handlers would have: the search index for
+    new listings and every dashboard counter. Returns ``reconcile()``'s counts.
+    """
+    index_new_listings(after_listing_id, batch_size)
+    return reconcile()
+
+
+def _bulk_create(model, objects, batch_size, **kwargs):
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) >= batch_size:
+            model.objects.bulk_create(batch, **kwargs)
+            batch = []
+    if batch:
+        model.objects.bulk_create(batch, **kwargs)
@@ -0,0 +1,267 @@
+"""
+Database-backed background tasks.
+
+Side effects that don't have to finish before a response (emails,
+notifications) are registered with ``@task`` and queued with ``enqueue``::
+
+    @task
+    def notify_seller(booking_id):
+        ...
+
+    with transaction.atomic():
+        booking = Booking.objects.create(...)
+        enqueue(notify_seller, key=f'booking:{booking.pk}:seller', booking_id=booking.pk)
+
+The ``Task`` row is written in the caller's transaction, so it commits or
+rolls back together with the change that caused it (a transactional
+outbox) and survives a crash right after the commit. ``key`` makes repeated
+enqueues of the same piece of work return the existing task.
+
+Workers (``manage.py run_tasks``) claim due rows with ``SELECT ... FOR
+UPDATE SKIP LOCKED``, so any number of them share the table without
+blocking each other, and run each one in a transaction. A task that raises
+is retried after an exponential, jittered backoff until ``max_attempts``,
+then marked failed. A claimed task is leased for ``LEASE`` seconds; if its
+worker dies it's claimed again once the lease runs out. Delivery is
+therefore at least once: database writes made by a task commit with its
+completion, but anything else it does (an email) may happen twice.
+
+With ``settings.TASKS['EAGER']`` (the tests) tasks run in-process as soon
+as their transaction commits, through the same claim/execute path.
+"""
+import logging
+import random
+import threading
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connection, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models.tasks import Task
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'EAGER': False,
+    'LEASE': 300,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF': 10,
+    'MAX_BACKOFF': 3600,
+    'POLL_INTERVAL': 1.0,
+    'KEEP_FINISHED': 7 * 86400,
+}
+
+# Registered functions by task name.
+registry = {}
+
+# Set when a task commits in this process, so idle in-process workers start
+# at once instead of at their next poll.
+wakeup = threading.Event()
+
+
+def get_config():
+    return {**DEFAULTS, **getattr(settings, 'TASKS', {})}
+
+
+def task(func=None, *, name=None, max_attempts=None):
+    """
+    Register ``func`` as a task, under ``name`` (default its dotted path).
+    Its keyword arguments are stored as JSON.
+    """
+    def register(func):
+        func.task_name = name or f'{func.__module__}.{func.__qualname__}'
+        func.max_attempts = max_attempts
+        registry[func.task_name] = func
+        return func
+    return register(func) if func is not None else register
+
+
+def _new_task(func, key, delay, kwargs):
+    if getattr(func, 'task_name', None) not in registry:
+        raise ValueError(f'{func!r} is not a registered task.')
+    return Task(
+        name=func.task_name,
+        kwargs=kwargs,
+        idempotency_key=key,
+        max_attempts=func.max_attempts or get_config()['MAX_ATTEMPTS'],
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def enqueue(func, key=None, delay=0, **kwargs):
+    """
+    Queue ``func(**kwargs)`` in the current transaction, to run no sooner
+    than ``delay`` seconds after it commits. Returns the ``Task``; for a
+    ``key`` that was already queued, the existing one.
+    """
+    new = _new_task(func, key, delay, kwargs)
+    if key is None:
+        new.save()
+    else:
+        try:
+            with transaction.atomic():
+                new.save()
+        except IntegrityError:
+            return Task.objects.get(idempotency_key=key)
+    transaction.on_commit(lambda: committed([new.pk]))
+    return new
+
+
+def enqueue_many(func, calls, delay=0):
+    """
+    Queue ``func`` once per ``(key, kwargs)`` in ``calls`` with one insert
+    per batch; keys already queued are skipped. Every call needs a key.
+    """
+    tasks = [_new_task(func, key, delay, kwargs) for key, kwargs in calls]
+    if not tasks:
+        return
+    if any(new.idempotency_key is None for new in tasks):
+        raise ValueError('enqueue_many() needs an idempotency key for every call.')
+    Task.objects.bulk_create(tasks, batch_size=1000, ignore_conflicts=True)
+    # ignore_conflicts leaves pks unset; eager runs find the rows by key.
+    keys = [new.idempotency_key for new in tasks]
+    transaction.on_commit(lambda: committed(keys=keys))
+
+
+def committed(pks=(), keys=()):
+    """``on_commit`` hook for newly queued tasks."""
+    if not get_config()['EAGER']:
+        wakeup.set()
+        return
+    ids = list(pks)
+    if keys:
+        ids += Task.objects.filter(idempotency_key__in=keys).values_list('pk', flat=True)
+    for claimed in claim(len(ids), pks=ids):
+        execute(claimed)
+
+
+# -- workers ------------------------------------------------------------------
+
+def claim(limit, pks=None):
+    """
+    Lease up to ``limit`` due tasks (or, with ``pks``, those of them that are
+    due) to the caller, oldest first. Rows other workers hold are skipped.
+    """
+    if not limit:
+        return []
+    config = get_config()
+    now = timezone.now()
+    due = Q(status=Task.QUEUED, run_at__lte=now) | Q(status=Task.RUNNING, locked_until__lte=now)
+    candidates = Task.objects.filter(due)
+    if pks is not None:
+        candidates = candidates.filter(pk__in=pks)
+    lease = {
+        'status': Task.RUNNING,
+        'locked_until': now + timedelta(seconds=config['LEASE']),
+        'attempts': F('attempts') + 1,
+    }
+    if connection.features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(
+                candidates.select_for_update(skip_locked=True)
+                .order_by('run_at').values_list('pk', flat=True)[:limit]
+            )
+            Task.objects.filter(pk__in=ids).update(**lease)
+    else:
+        # No row locks (SQLite): each claim is a conditional update in its
+        # own transaction, so a row another worker took in between is left
+        # alone and no read lock is held while waiting to write.
+        ids = [
+            pk for pk in list(candidates.order_by('run_at').values_list('pk', flat=True)[:limit])
+            if Task.objects.filter(due, pk=pk).update(**lease)
+        ]
+    return list(Task.objects.filter(pk__in=ids).order_by('run_at'))
+
+
+def backoff(attempts):
+    """Seconds before retrying after ``attempts`` failures: doubling, capped, ±20% jitter."""
+    config = get_config()
+    delay = min(config['MAX_BACKOFF'], config['BACKOFF'] * 2 ** (attempts - 1))
+    return delay * random.uniform(0.8, 1.2)
+
+
+def execute(claimed):
+    """
+    Run a claimed task and record the outcome. The function's database
+    writes commit together with the task's completion.
+    """
+    # Only the holder of this claim (the attempt it bumped) may finish it.
+    mine = Task.objects.filter(pk=claimed.pk, status=Task.RUNNING, attempts=claimed.attempts)
+    func = registry.get(claimed.name)
+    try:
+        if func is None:
+            raise LookupError(f'No task registered as {claimed.name!r}.')
+        with transaction.atomic():
+            func(**claimed.kwargs)
+            mine.update(status=Task.DONE, locked_until=None, finished_at=timezone.now(), last_error='')
+    except Exception:
+        error = traceback.format_exc()[-4000:]
+        if claimed.attempts >= claimed.max_attempts:
+            logger.error('Task %s (%s) failed for good:\n%s', claimed.pk, claimed.name, error)
+            mine.update(status=Task.FAILED, locked_until=None, finished_at=timezone.now(), last_error=error)
+            return False
+        logger.warning('Task %s (%s) failed, will retry:\n%s', claimed.pk, claimed.name, error)
+        mine.update(
+            status=Task.QUEUED, locked_until=None, last_error=error,
+            run_at=timezone.now() + timedelta(seconds=backoff(claimed.attempts)),
+        )
+        return False
+    return True
+
+
+def release(tasks):
+    """Hand claimed tasks that haven't started back to the queue, attempt uncounted."""
+    for claimed in tasks:
+        Task.objects.filter(pk=claimed.pk, status=Task.RUNNING, attempts=claimed.attempts).update(
+            status=Task.QUEUED, locked_until=None, attempts=F('attempts') - 1,
+        )
+
+
+def run_pending(limit=None, batch_size=10):
+    """Run due tasks until none are left (or ``limit`` ran); returns how many ran."""
+    ran = 0
+    while limit is None or ran < limit:
+        size = batch_size if limit is None else min(batch_size, limit - ran)
+        tasks = claim(size)
+        if not tasks:
+            break
+        for claimed in tasks:
+            execute(claimed)
+        ran += len(tasks)
+    return ran
+
+
+def work(stop, batch_size=10):
+    """Worker loop: run due tasks until ``stop`` (an ``Event``) is set."""
+    poll = get_config()['POLL_INTERVAL']
+    while not stop.is_set():
+        close_old_connections()
+        try:
+            tasks = claim(batch_size)
+        except Exception:
+            logger.exception('Claiming tasks failed')
+            tasks = []
+            time.sleep(poll)
+        for i, claimed in enumerate(tasks):
+            if stop.is_set():
+                release(tasks[i:])
+                break
+            execute(claimed)
+        if not tasks:
+            wakeup.wait(poll)
+            wakeup.clear()
+    close_old_connections()
+
+
+def purge_finished(older_than=None):
+    """Delete done and failed tasks finished more than ``older_than`` seconds ago."""
+    older_than = get_config()['KEEP_FINISHED'] if older_than is None else older_than
+    deleted, _ = Task.objects.filter(
+        status__in=[Task.DONE, Task.FAILED],
+        finished_at__lt=timezone.now() - timedelta(seconds=older_than),
+    ).delete()
+    return deleted
@@ -1,3 +1,891 @@
-from django.test import TestCase
+import datetime
+import io
+import shutil
+import tempfile
+import warnings
+from decimal import Decimal
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+from django.contrib import admin
+from django.core.files.storage import default_storage
+from django.core.management import CommandError, call_command
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core import mail
+from django.core.paginator import UnorderedObjectListWarning
+from django.db import connection, transaction
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+import numpy as np
+from PIL import Image
+
+from .models.bookings import Booking
+from .models.listings import ListingTombstone, PropertyListing
+from .models.search import ListingSearchTerm
+from .models.services import ServiceOffer
+from .models.stats import ListingStats, ProviderListingStats, UserStats
+from .models.tasks import Task
+from .models.users import User
+from . import admin as core_admin
+from . import analytics
+from . import geo
+from . import similar
+from .changes import changes_since, decode_token
+from .geo import StubGeocoder, clear_locations, covering_cells, encode_geohash, radius_bbox, set_location
+from .images import RENDITIONS
+from .search import tokenize
+from .stats import reconcile, reconcile_listings, reconcile_rollups, reconcile_users
+from .storage import S3Storage
+from .notifications import offers_created
+from .tasks import backoff, claim, enqueue, execute, release, run_pending, task
+
+
+class SearchIndexTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', role='seller')
+        self.listing = PropertyListing.objects.create(
+            seller=self.seller, title='The Old Mill', description='A mill by the river.',
+            address='2 Mill Lane', num_bedrooms=3, num_bathrooms=1, price=Decimal('250000'),
+        )
+
+    def terms(self):
+        return set(ListingSearchTerm.objects.filter(listing=self.listing).values_list('term', flat=True))
+
+    def test_tokenize(self):
+        self.assertEqual(tokenize('The Old Mill, the OLD mill!'), ['old', 'mill'])
+        self.assertEqual(tokenize(None), [])
+
+    def test_index_follows_saves(self):
+        self.assertEqual(self.terms(), {'old', 'mill', 'river', 'lane'})
+        self.listing.title = 'Riverside barn'
+        self.listing.save()
+        self.assertEqual(self.terms(), {'riverside', 'barn', 'mill', 'river', 'lane'})
+
+    def test_index_rows_removed_with_listing(self):
+        self.listing.delete()
+        self.assertFalse(ListingSearchTerm.objects.exists())
+
+
+@override_settings(GEOCODER={
+    'BACKEND': 'core.geo.StubGeocoder',
+    'OPTIONS': {'known': {'2 Mill Lane': (51.5007, -0.1246)}},
+})
+class GeoTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', role='seller')
+        self.listing = PropertyListing.objects.create(
+            seller=self.seller, title='The Old Mill', description='A mill by the river.',
+            address='2 Mill Lane', num_bedrooms=3, num_bathrooms=1, price=Decimal('250000'),
+        )
+
+    def test_encode_geohash(self):
+        self.assertEqual(encode_geohash(57.64911, 10.40744, 11), 'u4pruydqqvj')
+        self.assertEqual(encode_geohash(-25.382708, -49.265506, 8), '6gkzwgjz')
+
+    def test_covering_cells_contain_the_box(self):
+        boxes = [(40.7, -74.05, 40.8, -73.9), (-1.0, 179.5, 1.0, -179.5), (-90.0, -180.0, 90.0, 180.0)]
+        for south, west, north, east in boxes:
+            cells = covering_cells(south, west, north, east)
+            self.assertLessEqual(len(cells), 32)
+            east_unwrapped = east if west <= east else east + 360
+            for i in range(11):
+                for j in range(11):
+                    lat = south + (north - south) * i / 10
+                    lng = (west + (east_unwrapped - west) * j / 10 + 180) % 360 - 180
+                    point = encode_geohash(lat, lng)
+                    self.assertTrue(any(point.startswith(cell) for cell in cells), (lat, lng, cells))
+
+    def test_radius_bbox_wraps_the_antimeridian(self):
+        south, west, north, east = radius_bbox(0, 179.9, 50)
+        self.assertGreater(west, east)
+        self.assertAlmostEqual(north - south, 2 * 50 / 111.195, places=2)
+
+    def test_geocode_command(self):
+        blank = PropertyListing.objects.create(
+            seller=self.seller, title='Plot', description='', address=' ',
+            num_bedrooms=0, num_bathrooms=0, price=Decimal('1000'),
+        )
+        out = io.StringIO()
+        call_command('geocode_listings', stdout=out)
+        self.assertIn('Geocoded 1 of 2', out.getvalue())
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.latitude, self.listing.longitude), (Decimal('51.500700'), Decimal('-0.124600')))
+        self.assertEqual(self.listing.geohash, encode_geohash(51.5007, -0.1246))
+        blank.refresh_from_db()
+        self.assertIsNone(blank.latitude)
+
+        # Only listings without coordinates are retried, and not before the backoff.
+        self.assertEqual(blank.geocode_failures, 1)
+        self.assertGreater(blank.geocode_retry_at, timezone.now())
+        out = io.StringIO()
+        call_command('geocode_listings', stdout=out)
+        self.assertIn('Geocoded 0 of 0', out.getvalue())
+
+        PropertyListing.objects.filter(pk=blank.pk).update(geocode_retry_at=timezone.now())
+        out = io.StringIO()
+        call_command('geocode_listings', stdout=out)
+        self.assertIn('Geocoded 0 of 1', out.getvalue())
+        blank.refresh_from_db()
+        self.assertEqual(blank.geocode_failures, 2)
+        self.assertEqual(geo.retry_delay(2), 2 * geo.retry_delay(1))
+
+    def test_address_edited_while_geocoding_keeps_no_location(self):
+        geocoder = StubGeocoder()
+        geocode = geocoder.geocode
+
+        def edit_then_geocode(addresses):
+            listing = PropertyListing.objects.get(pk=self.listing.pk)
+            listing.address = '9 Quay Street'
+            listing.save()
+            return geocode(addresses)
+
+        geocoder.geocode = edit_then_geocode
+        listings = list(PropertyListing.objects.only('pk', 'address', 'geocode_failures'))
+        self.assertEqual(geo.geocode_listings(listings, geocoder), 0)
+        self.listing.refresh_from_db()
+        self.assertEqual((self.listing.address, self.listing.latitude, self.listing.geohash), ('9 Quay Street', None, ''))
+
+    def test_address_change_clears_location(self):
+        set_location(self.listing, (51.5007, -0.1246))
+        self.listing.save()
+        self.listing.title = 'The New Mill'
+        self.listing.save()
+        self.assertTrue(PropertyListing.objects.get(pk=self.listing.pk).geohash)
+
+        listing = PropertyListing.objects.get(pk=self.listing.pk)
+        listing.address = '3 Mill Lane'
+        listing.save(update_fields=['address'])
+        listing = PropertyListing.objects.get(pk=self.listing.pk)
+        self.assertEqual((listing.latitude, listing.longitude, listing.geohash), (None, None, ''))
+
+
+class StatsTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', role='seller')
+        self.buyer = User.objects.create_user('buyer', role='buyer')
+        self.provider = User.objects.create_user('provider', role='service_provider')
+        self.listing = self.make_listing()
+
+    def make_listing(self, seller=None):
+        return PropertyListing.objects.create(
+            seller=seller or self.seller, title='The Old Mill', description='A mill by the river.',
+            address='2 Mill Lane', num_bedrooms=3, num_bathrooms=1, price=Decimal('250000'),
+        )
+
+    def book(self, listing, hour=10):
+        return Booking.objects.create(
+            buyer=self.buyer, property=listing,
+            scheduled_date=datetime.date(2030, 1, 1), scheduled_time=datetime.time(hour, 0),
+        )
+
+    def offer(self, listing, **kwargs):
+        return ServiceOffer.objects.create(
+            service_provider=self.provider, property=listing, title='Survey', description='', **kwargs
+        )
+
+    def counters(self, user):
+        row = UserStats.objects.get(pk=user.pk)
+        return {
+            name: getattr(row, name) for name in (
+                'listings', 'bookings_received', 'offers_received', 'bookings_made',
+                'offers', 'offers_approved', 'properties_served',
+            ) if getattr(row, name)
+        }
+
+    def assertConsistent(self):
+        self.assertEqual(reconcile(dry_run=True), {'rollups': 0, 'users': 0, 'listings': 0})
+
+    def test_counters_follow_saves_and_deletes(self):
+        other = self.make_listing()
+        first, second = self.book(self.listing), self.book(self.listing, hour=11)
+        self.book(other)
+        survey = self.offer(self.listing)
+        self.offer(self.listing, approved=True)
+        self.offer(other)
+        self.assertEqual(self.counters(self.seller), {'listings': 2, 'bookings_received': 3, 'offers_received': 3})
+        self.assertEqual(self.counters(self.buyer), {'bookings_made': 3})
+        self.assertEqual(self.counters(self.provider), {'offers': 3, 'offers_approved': 1, 'properties_served': 2})
+        stats = ListingStats.objects.get(pk=self.listing.pk)
+        self.assertEqual((stats.bookings, stats.offers, stats.offers_approved), (2, 2, 1))
+        self.assertConsistent()
+
+        survey.approved = True
+        survey.save()
+        survey.property = other
+        survey.save()
+        first.delete()
+        second.scheduled_time = datetime.time(15, 0)
+        second.save()
+        self.assertEqual(self.counters(self.provider), {'offers': 3, 'offers_approved': 2, 'properties_served': 2})
+        self.assertEqual(ProviderListingStats.objects.get(listing=other).offers, 2)
+        self.assertConsistent()
+
+        # Deleting a listing cascades to its bookings and offers.
+        other.delete()
+        self.assertEqual(self.counters(self.seller), {'listings': 1, 'bookings_received': 1, 'offers_received': 1})
+        self.assertEqual(self.counters(self.provider), {'offers': 1, 'offers_approved': 1, 'properties_served': 1})
+        self.assertConsistent()
+
+        self.provider.delete()
+        self.assertEqual(self.counters(self.seller), {'listings': 1, 'bookings_received': 1})
+        self.assertConsistent()
+
+    def test_seller_change_moves_counts(self):
+        self.book(self.listing)
+        other_seller = User.objects.create_user('other', role='seller')
+        self.listing.seller = other_seller
+        self.listing.save()
+        self.assertEqual(self.counters(self.seller), {})
+        self.assertEqual(self.counters(other_seller), {'listings': 1, 'bookings_received': 1})
+
+    def test_deferred_instances(self):
+        offer = self.offer(self.listing)
+        offer = ServiceOffer.objects.only('id', 'title').get(pk=offer.pk)
+        offer.approved = True
+        offer.save()
+        self.assertEqual(self.counters(self.provider)['offers_approved'], 1)
+        self.assertConsistent()
+
+    def test_missing_rows_are_built_from_the_source(self):
+        self.book(self.listing)
+        UserStats.objects.all().delete()
+        ListingStats.objects.all().delete()
+        self.book(self.listing, hour=11)
+        self.assertEqual(self.counters(self.buyer), {'bookings_made': 2})
+        self.assertEqual(ListingStats.objects.get(pk=self.listing.pk).bookings, 2)
+
+    def test_reconcile_command_fixes_drift(self):
+        offer = self.offer(self.listing)
+        ServiceOffer.objects.filter(pk=offer.pk).update(approved=True)
+        Booking.objects.bulk_create([Booking(
+            buyer=self.buyer, property=self.listing,
+            scheduled_date=datetime.date(2030, 1, 2), scheduled_time=datetime.time(9, 0),
+        )])
+        ProviderListingStats.objects.all().delete()
+
+        out = io.StringIO()
+        call_command('reconcile_stats', '--dry-run', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Would fix 5 row(s) (rollups 1, users 3, listings 1).')
+        call_command('reconcile_stats', stdout=io.StringIO())
+        self.assertConsistent()
+        self.assertEqual(self.counters(self.provider), {'offers': 1, 'offers_approved': 1, 'properties_served': 1})
+
+    def test_reconcile_keeps_increments_made_while_it_runs(self):
+        Booking.objects.bulk_create([Booking(
+            buyer=self.buyer, property=self.listing,
+            scheduled_date=datetime.date(2030, 1, 2), scheduled_time=datetime.time(9, 0),
+        )])
+        booked = []
+
+        def book_after_reading_counters(execute, sql, params, many, context):
+            result = execute(sql, params, many, context)
+            # Another request books once reconcile holds the buyer's row.
+            if not booked and sql.startswith('SELECT') and UserStats._meta.db_table in sql.split('FROM')[1]:
+                booked.append(self.book(self.listing, hour=11))
+            return result
+
+        with connection.execute_wrapper(book_after_reading_counters):
+            reconcile_users([self.buyer.pk])
+        self.assertTrue(booked)
+        self.assertEqual(self.counters(self.buyer), {'bookings_made': 2})
+
+    def test_reconcile_in_batches(self):
+        self.offer(self.listing)
+        extra = [self.make_listing(seller=self.provider) for _ in range(3)]
+        Booking.objects.bulk_create([Booking(
+            buyer=self.buyer, property=listing,
+            scheduled_date=datetime.date(2030, 1, 2), scheduled_time=datetime.time(9, 0),
+        ) for listing in extra])
+        ProviderListingStats.objects.all().delete()
+        self.assertEqual(reconcile_rollups(batch_size=1), 1)
+        self.assertEqual(reconcile_users(batch_size=1), 2)
+        self.assertEqual(reconcile_listings(batch_size=2), 3)
+        self.assertConsistent()
+
+
+def jpeg_upload(width=2000, height=1000):
+    exif = Image.Exif()
+    exif[0x010F] = 'Camera maker'  # Make
+    buffer = io.BytesIO()
+    Image.new('RGB', (width, height), 'teal').save(buffer, 'JPEG', exif=exif)
+    return SimpleUploadedFile('house.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+
+class ChangeFeedTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', role='seller')
+        self.listing = PropertyListing.objects.create(
+            seller=self.seller, title='The Old Mill', description='A mill by the river.',
+            address='2 Mill Lane', num_bedrooms=3, num_bathrooms=1, price=Decimal('250000'),
+        )
+
+    def test_deletes_leave_tombstones(self):
+        other = PropertyListing.objects.create(
+            seller=self.seller, title='Barn', description='', address='3 Mill Lane',
+            num_bedrooms=1, num_bathrooms=1, price=Decimal('1'),
+        )
+        pks = sorted([self.listing.pk, other.pk])
+        # Cascading from the seller too.
+        self.seller.delete()
+        self.assertEqual(sorted(ListingTombstone.objects.values_list('listing_id', flat=True)), pks)
+
+    def test_background_writes_bump_updated_at(self):
+        _, _, token, _ = changes_since(PropertyListing.objects.all())
+        clear_locations([self.listing.pk])
+        listings, _, token, _ = changes_since(PropertyListing.objects.all(), token)
+        self.assertEqual(listings, [self.listing])
+        self.assertGreater(listings[0].updated_at, self.listing.updated_at)
+
+        call_command('geocode_listings', '--all', stdout=io.StringIO())
+        listings, _, _, _ = changes_since(PropertyListing.objects.all(), token)
+        self.assertEqual(listings, [self.listing])
+
+    def test_next_token_moves_past_returned_changes(self):
+        _, _, token, has_more = changes_since(PropertyListing.objects.all(), limit=1)
+        self.assertFalse(has_more)
+        self.assertGreaterEqual(decode_token(token)[0], self.listing.updated_at)
+
+    def test_prune_command(self):
+        self.listing.delete()
+        out = io.StringIO()
+        call_command('prune_tombstones', stdout=out)
+        self.assertEqual(ListingTombstone.objects.count(), 1)
+        ListingTombstone.objects.update(deleted_at=timezone.now() - datetime.timedelta(days=31))
+        call_command('prune_tombstones', stdout=out)
+        self.assertIn('Deleted 1 tombstone(s).', out.getvalue())
+        self.assertFalse(ListingTombstone.objects.exists())
+
+
+class AdminTests(TestCase):
+
+    def setUp(self):
+        self.admin = User.objects.create_superuser('admin', 'admin@example.com', 'pw')
+        self.client.force_login(self.admin)
+        self.seller = User.objects.create_user('seller', role='seller')
+        self.provider = User.objects.create_user('provider', role='service_provider')
+        self.listing = PropertyListing.objects.create(
+            seller=self.seller, title='The Old Mill', description='A mill by the river.',
+            address='2 Mill Lane', num_bedrooms=3, num_bathrooms=1, price=Decimal('250000'),
+        )
+
+    def offers(self, n, **kwargs):
+        return [
+            ServiceOffer.objects.create(
+                service_provider=self.provider, property=self.listing, title=f'Survey {i}',
+                description='Full survey.', **kwargs,
+            )
+            for i in range(n)
+        ]
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        urls = ['/admin/core/booking/', '/admin/core/serviceoffer/', '/admin/core/propertylisting/']
+
+        def get(url):
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.client.get(url).status_code, 200)
+            return len(queries)
+
+        def add_rows(n, start):
+            self.offers(n)
+            for day in range(start, start + n):
+                Booking.objects.create(
+                    buyer=self.provider, property=self.listing,
+                    scheduled_date=datetime.date(2030, 1, day), scheduled_time=datetime.time(10, 0),
+                )
+
+        add_rows(1, 1)
+        before = [get(url) for url in urls]
+        add_rows(20, 2)
+        self.assertEqual([get(url) for url in urls], before)
+
+    def test_approve_action_updates_counters(self):
+        pending = self.offers(3)
+        self.offers(1, approved=True)
+        response = self.client.post('/admin/core/serviceoffer/', {
+            'action': 'approve_offers',
+            '_selected_action': [offer.pk for offer in pending[:2]],
+        }, follow=True)
+        self.assertContains(response, 'Approved 2 service offer(s).')
+        self.assertEqual(ServiceOffer.objects.filter(approved=True).count(), 3)
+        self.assertEqual(UserStats.objects.get(pk=self.provider.pk).offers_approved, 3)
+        self.assertEqual(ListingStats.objects.get(pk=self.listing.pk).offers_approved, 3)
+        self.assertEqual(reconcile(dry_run=True), {'rollups': 0, 'users': 0, 'listings': 0})
+
+    def test_search_uses_term_index(self):
+        response = self.client.get('/admin/core/propertylisting/?q=mill')
+        self.assertContains(response, 'The Old Mill')
+        response = self.client.get('/admin/core/propertylisting/?q=barn')
+        self.assertNotContains(response, 'The Old Mill')
+
+    def test_changelist_filters_are_indexed(self):
+        for model, model_admin in admin.site._registry.items():
+            if model._meta.app_label != 'core':
+                continue
+            leading = {index.fields[0] for index in model._meta.indexes}
+            for name in model_admin.list_filter:
+                with self.subTest(model=model.__name__, filter=name):
+                    field = model._meta.get_field(name)
+                    self.assertTrue(field.db_index or field.unique or name in leading)
+
+    def test_estimated_count_for_unfiltered_large_tables(self):
+        with mock.patch.object(core_admin, 'estimate_rows', return_value=5_000_000):
+            offers = ServiceOffer.objects.order_by('-created_at', '-id')
+            self.assertEqual(core_admin.EstimatedCountPaginator(offers, 100).count, 5_000_000)
+            self.assertEqual(core_admin.EstimatedCountPaginator(offers.filter(approved=True), 100).count, 0)
+        self.assertEqual(core_admin.EstimatedCountPaginator(User.objects.order_by('pk'), 100).count, 3)
+
+    def test_paginated_querysets_are_ordered(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', UnorderedObjectListWarning)
+            page = core_admin.EstimatedCountPaginator(User.objects.all(), 2).page(1)
+            self.assertEqual([user.pk for user in page], [self.admin.pk, self.seller.pk])
+            for url in (
+                '/admin/core/user/', '/admin/core/propertylisting/?q=mill',
+                '/admin/autocomplete/?app_label=core&model_name=booking&field_name=buyer&term=sel',
+                '/admin/autocomplete/?app_label=core&model_name=booking&field_name=property&term=mill',
+            ):
+                with self.subTest(url=url):
+                    self.assertEqual(self.client.get(url).status_code, 200)
+
+
+class SimilarIndexTests(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_override = override_settings(SIMILAR_LISTINGS={'PATH': directory})
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.seller = User.objects.create_user('seller', role='seller')
+        self.listing = self.create_listing()
+
+    def create_listing(self, **kwargs):
+        values = {
+            'seller': self.seller, 'title': 'The Old Mill', 'description': 'A mill by the river.',
+            'address': '2 Mill Lane', 'num_bedrooms': 3, 'num_bathrooms': 1, 'price': Decimal('250000'),
+        }
+        values.update(kwargs)
+        return PropertyListing.objects.create(**values)
+
+    def test_rows_match_featurize(self):
+        self.create_listing(title='Barn', description='Hay loft.', price=Decimal('90000'), num_bedrooms=1)
+        self.assertEqual(similar.build(), 2)
+        vectors, ids = similar.get_index()
+        values = [getattr(self.listing, name) for name in similar.FEATURE_FIELDS]
+        expected = similar.featurize([values], similar.get_meta())[0]
+        row = ids.tolist().index(self.listing.pk)
+        self.assertTrue(np.allclose(vectors[row], expected, atol=1e-5))
+        self.assertEqual(np.isfinite(vectors[:, 0]).sum(), 2)
+
+    def test_rows_stay_dense_for_sparse_ids(self):
+        similar.build()
+        with self.captureOnCommitCallbacks(execute=True):
+            far = self.create_listing(pk=10_000_000)
+        vectors, ids = similar.get_index()
+        self.assertEqual(len(vectors), similar.capacity_for(1))
+        self.assertEqual(similar.similar_to(self.listing, k=5), [(far.pk, 0.0)])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            far.delete()
+            near = self.create_listing()
+        self.assertEqual(np.count_nonzero(similar.get_index()[1]), 2)
+        self.assertEqual(similar.similar_to(self.listing, k=5), [(near.pk, 0.0)])
+
+    def test_saves_queue_the_refresh(self):
+        similar.build()
+        with self.captureOnCommitCallbacks() as callbacks:
+            other = self.create_listing()
+        self.assertEqual(similar.similar_to(self.listing, k=5), [])
+        refresh = Task.objects.get(name=similar.refresh_rows.task_name)
+        self.assertEqual(refresh.kwargs, {'pks': [other.pk]})
+        for callback in callbacks:
+            callback()
+        self.assertEqual(similar.similar_to(self.listing, k=5), [(other.pk, 0.0)])
+
+    def test_grows_when_full_and_readers_remap(self):
+        with mock.patch.object(similar, 'capacity_for', lambda count: count + 1):
+            similar.build()
+            before, _ = similar.get_index()
+            with self.captureOnCommitCallbacks(execute=True):
+                added = [self.create_listing(), self.create_listing()]
+        after, ids = similar.get_index()
+        self.assertEqual((len(before), len(after)), (2, 4))
+        self.assertEqual(sorted(ids[ids > 0].tolist()), [self.listing.pk] + [listing.pk for listing in added])
+        self.assertEqual(sorted(similar.similar_to(self.listing, k=5)), [(listing.pk, 0.0) for listing in added])
+
+    def test_disabled_without_path(self):
+        with override_settings(SIMILAR_LISTINGS={'PATH': None}):
+            self.assertFalse(similar.is_built())
+            with self.assertRaises(similar.IndexUnavailable):
+                similar.similar_to(self.listing)
+
+
+class AnalyticsTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', role='seller')
+
+    def create_listing(self, price, bedrooms, bathrooms=1):
+        return PropertyListing.objects.create(
+            seller=self.seller, title='Flat', description='', address='1 High Street',
+            num_bedrooms=bedrooms, num_bathrooms=bathrooms, price=Decimal(price),
+        )
+
+    def test_grouped_percentiles_match_numpy(self):
+        rng = np.random.default_rng(0)
+        keys = rng.integers(0, 5, 1000)
+        values = rng.normal(100, 30, 1000)
+        groups, counts, table = analytics.grouped_percentiles(keys, values, [0, 10, 50, 95, 100])
+        self.assertEqual(groups.tolist(), [0, 1, 2, 3, 4])
+        for group, count, row in zip(groups, counts, table):
+            self.assertEqual(count, (keys == group).sum())
+            np.testing.assert_allclose(row, np.percentile(values[keys == group], [0, 10, 50, 95, 100]))
+
+    def test_buckets_and_weeks(self):
+        self.create_listing('100000', 1)
+        self.create_listing('700000', 7, bathrooms=6)
+        self.create_listing('900000', 9, bathrooms=2)
+        old = self.create_listing('200000', 2)
+        with override_settings(LISTING_ANALYTICS={'WEEKS': 4, 'MAX_BEDROOMS': 6, 'MAX_BATHROOMS': 4}):
+            PropertyListing.objects.filter(pk=old.pk).update(created_at=timezone.now() - datetime.timedelta(weeks=2))
+            stats = analytics.compute_stats()
+
+        self.assertEqual(stats['count'], 4)
+        top = stats['bedrooms'][-1]
+        self.assertEqual((top['bedrooms'], top['count'], top['median_price']), (6, 2, 800000))
+        self.assertEqual(top['median_price_per_bedroom'], 100000)
+        self.assertEqual(
+            [(row['bedrooms'], row['bathrooms'], row['count']) for row in stats['rooms']],
+            [(1, 1, 1), (2, 1, 1), (6, 2, 1), (6, 4, 1)],
+        )
+        weeks = stats['weekly']
+        self.assertEqual(len(weeks), 4)
+        self.assertEqual([week['count'] for week in weeks], [0, 1, 0, 3])
+        self.assertEqual(weeks[1]['median_price'], 200000)
+        self.assertIsNone(weeks[0]['median_price'])
+        self.assertEqual({week['week'].weekday() for week in weeks}, {0})
+        self.assertLessEqual(weeks[-1]['week'], timezone.now().date())
+
+    def test_results_cached_for_ttl(self):
+        self.create_listing('100000', 1)
+        clock = mock.patch('core.analytics.time.monotonic', return_value=1000.0)
+        with override_settings(LISTING_ANALYTICS={'TTL': 60}), clock as monotonic:
+            self.assertEqual(analytics.listing_stats()['count'], 1)
+            self.create_listing('200000', 2)
+            monotonic.return_value = 1059.0
+            self.assertEqual(analytics.listing_stats()['count'], 1)
+            monotonic.return_value = 1061.0
+            self.assertEqual(analytics.listing_stats()['count'], 2)
+
+
+class GenerateDataTests(TestCase):
+
+    def generate(self, *args):
+        call_command(
+            'generate_data', '--listings', '40', '--buyers', '5', '--providers', '3',
+            '--bookings', '60', '--offers', '30', '--yes', *args, stdout=io.StringIO(),
+        )
+
+    def test_requires_confirmation(self):
+        with self.assertRaisesMessage(CommandError, 'Pass --yes if it is a scratch database.'):
+            call_command('generate_data', '--listings', '40', stdout=io.StringIO())
+        self.assertFalse(User.objects.exists())
+
+    def test_counts_and_derived_data(self):
+        self.generate()
+        self.assertEqual(User.objects.filter(role='seller').count(), 2)
+        self.assertEqual(PropertyListing.objects.exclude(geohash='').count(), 40)
+        self.assertEqual(Booking.objects.count(), 60)
+        self.assertEqual(ServiceOffer.objects.count(), 30)
+        self.assertTrue(ListingSearchTerm.objects.exists())
+        self.assertEqual(UserStats.objects.count(), User.objects.count())
+        self.assertEqual(sum(reconcile(dry_run=True).values()), 0)
+
+    def test_seed_is_reproducible(self):
+        def snapshot():
+            return list(PropertyListing.objects.order_by('id').values_list(
+                'seller__username', 'title', 'address', 'price', 'latitude',
+            ))
+
+        self.generate('--seed', '7')
+        first = snapshot()
+        PropertyListing.objects.all().delete()
+        self.generate('--seed', '7')
+        self.assertEqual(snapshot(), first)
+        # Users are reused rather than duplicated.
+        self.assertEqual(User.objects.count(), 10)
+
+
+calls = []
+
+
+@task(name='tests.record', max_attempts=2)
+def record(value, fail=False):
+    calls.append(value)
+    if fail:
+        raise RuntimeError('boom')
+
+
+@override_settings(TASKS={'EAGER': False, 'BACKOFF': 10, 'MAX_BACKOFF': 60})
+class TaskQueueTests(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_runs_after_commit_only(self):
+        with override_settings(TASKS={'EAGER': True}):
+            with self.captureOnCommitCallbacks(execute=True):
+                enqueue(record, value=1)
+                self.assertEqual(calls, [])
+        self.assertEqual(calls, [1])
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    def test_rollback_drops_the_task(self):
+        with self.assertRaises(ValueError):
+            with transaction.atomic():
+                enqueue(record, value=1)
+                raise ValueError
+        self.assertFalse(Task.objects.exists())
+
+    def test_idempotency_key(self):
+        first = enqueue(record, key='once', value=1)
+        self.assertEqual(enqueue(record, key='once', value=2).pk, first.pk)
+        self.assertEqual(run_pending(), 1)
+        self.assertEqual(calls, [1])
+        self.assertEqual(enqueue(record, key='once', value=3).status, Task.DONE)
+
+    def test_unregistered_function(self):
+        with self.assertRaises(ValueError):
+            enqueue(print)
+
+    def test_retries_with_backoff_then_fails(self):
+        queued = enqueue(record, value=1, fail=True)
+        with self.assertLogs('core.tasks', 'WARNING'):
+            self.assertEqual(run_pending(), 1)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Task.QUEUED, 1))
+        self.assertIn('RuntimeError: boom', queued.last_error)
+        delay = (queued.run_at - timezone.now()).total_seconds()
+        self.assertTrue(7 < delay <= 12, delay)
+        # Not due yet.
+        self.assertEqual(run_pending(), 0)
+
+        Task.objects.update(run_at=timezone.now())
+        with self.assertLogs('core.tasks', 'ERROR'):
+            self.assertEqual(run_pending(), 1)
+        queued.refresh_from_db()
+        self.assertEqual((queued.status, queued.attempts), (Task.FAILED, 2))
+        self.assertEqual(calls, [1, 1])
+
+    def test_backoff_doubles_up_to_the_cap(self):
+        self.assertTrue(16 <= backoff(2) <= 24)
+        self.assertTrue(48 <= backoff(10) <= 72)
+
+    def test_claims_dont_overlap(self):
+        for value in range(3):
+            enqueue(record, value=value)
+        first, second = claim(2), claim(2)
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 1)
+        self.assertFalse({t.pk for t in first} & {t.pk for t in second})
+
+    def test_expired_lease_is_reclaimed(self):
+        enqueue(record, value=1)
+        [stale] = claim(1)
+        self.assertEqual(claim(1), [])
+        Task.objects.update(locked_until=timezone.now())
+        [again] = claim(1)
+        self.assertEqual(again.attempts, 2)
+        # The first worker's late result is ignored; the new claim finishes it.
+        execute(stale)
+        self.assertEqual(Task.objects.get().status, Task.RUNNING)
+        execute(again)
+        self.assertEqual(Task.objects.get().status, Task.DONE)
+
+    def test_release(self):
+        enqueue(record, value=1)
+        release(claim(1))
+        queued = Task.objects.get()
+        self.assertEqual((queued.status, queued.attempts), (Task.QUEUED, 0))
+
+    def test_command(self):
+        enqueue(record, value=1)
+        out = io.StringIO()
+        call_command('run_tasks', '--once', stdout=out)
+        self.assertEqual(out.getvalue().strip(), 'Ran 1 task(s).')
+        Task.objects.update(finished_at=timezone.now() - datetime.timedelta(days=30))
+        call_command('run_tasks', '--purge', stdout=out)
+        self.assertFalse(Task.objects.exists())
+
+
+class NotificationTests(TestCase):
+
+    def setUp(self):
+        self.seller = User.objects.create_user('seller', 'seller@example.com', 'pw', role='seller')
+        self.provider = User.objects.create_user('provider', 'provider@example.com', 'pw', role='service_provider')
+        User.objects.create_user('staff', 'staff@example.com', 'pw', is_staff=True)
+        self.listing = PropertyListing.objects.create(
+            seller=self.seller, title='Home', description='Nice.', address='1 Main Street',
+            num_bedrooms=2, num_bathrooms=1, price=Decimal('100000.00'),
+        )
+
+    def test_offers_are_flagged_once(self):
+        offers = [
+            ServiceOffer.objects.create(
+                service_provider=self.provider, property=self.listing, title=title,
+                description='Details.', approved=approved,
+            )
+            for title, approved in (('Cleaning', False), ('Staging', True))
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            offers_created(offers)
+            offers_created(offers)
+        self.assertEqual(Task.objects.count(), 1)
+        self.assertEqual([message.to for message in mail.outbox], [['staff@example.com']])
+        self.assertIn('Cleaning', mail.outbox[0].subject)
+
+
+class ImagePipelineTests(TestCase):
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_WORKERS=0)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        self.seller = User.objects.create_user('seller', role='seller')
+
+    def create_listing(self, **kwargs):
+        return PropertyListing.objects.create(
+            seller=self.seller, title='Loft', description='Open plan.', address='3 Dock Road',
+            num_bedrooms=1, num_bathrooms=1, price=Decimal('150000'), **kwargs
+        )
+
+    def test_renditions_generated_after_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            listing = self.create_listing(image=jpeg_upload())
+        listing.refresh_from_db()
+
+        self.assertEqual(list(listing.renditions), [label for label, _ in RENDITIONS])
+        for label, width in RENDITIONS:
+            rendition = listing.renditions[label]
+            self.assertEqual(rendition['width'], width)
+            self.assertEqual(rendition['height'], width // 2)
+            for key in ('webp', 'jpeg'):
+                with default_storage.open(rendition[key]) as stored, Image.open(stored) as image:
+                    self.assertEqual(image.width, width)
+                    self.assertFalse(image.getexif())
+
+    def test_small_images_are_not_upscaled(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            listing = self.create_listing(image=jpeg_upload(400, 300))
+        listing.refresh_from_db()
+        self.assertEqual(listing.renditions['card']['width'], 400)
+        self.assertEqual(listing.renditions['full']['jpeg'], listing.renditions['card']['jpeg'])
+
+    def test_nothing_queued_without_a_new_image(self):
+        listing = self.create_listing()
+        with mock.patch('core.images.process_listing_image') as process:
+            with self.captureOnCommitCallbacks(execute=True):
+                listing.title = 'Renamed'
+                listing.save()
+        process.assert_not_called()
+
+
+class FakeClientError(Exception):
+
+    def __init__(self, code):
+        super().__init__(code)
+        self.response = {'Error': {'Code': code}}
+
+
+class FakeS3:
+    """An in-memory stand-in for the S3 API calls ``S3Storage`` makes through boto3."""
+
+    exceptions = SimpleNamespace(ClientError=FakeClientError)
+
+    def __init__(self):
+        self.objects = {}
+
+    def object(self, Bucket, Key):
+        try:
+            return self.objects[Bucket, Key]
+        except KeyError:
+            raise FakeClientError('404')
+
+    def put_object(self, Bucket, Key, Body, **metadata):
+        self.objects[Bucket, Key] = {
+            'Body': Body.read(), 'LastModified': timezone.now(), **metadata,
+        }
+
+    def head_object(self, Bucket, Key):
+        stored = self.object(Bucket, Key)
+        return {'ContentLength': len(stored['Body']), **{k: v for k, v in stored.items() if k != 'Body'}}
+
+    def get_object(self, Bucket, Key):
+        return {'Body': io.BytesIO(self.object(Bucket, Key)['Body'])}
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+    def generate_presigned_url(self, operation, Params, ExpiresIn):
+        return f'https://{Params["Bucket"]}.s3.example.com/{Params["Key"]}?Expires={ExpiresIn}'
+
+
+class S3StorageTests(TestCase):
+
+    def setUp(self):
+        self.s3 = FakeS3()
+        self.storage = S3Storage(bucket='media', location='uploads', client=self.s3)
+
+    def test_save_open_and_delete(self):
+        name = self.storage.save('property_images/house.jpg', io.BytesIO(b'jpeg bytes'))
+        self.assertRegex(name, r'^property_images/house\.[0-9a-f]{16}\.jpg$')
+        stored = self.s3.objects['media', f'uploads/{name}']
+        self.assertEqual(stored['ContentType'], 'image/jpeg')
+        self.assertEqual(stored['CacheControl'], 'public, max-age=31536000, immutable')
+        self.assertTrue(self.storage.exists(name))
+        self.assertEqual(self.storage.size(name), 10)
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), b'jpeg bytes')
+
+        # Identical bytes are stored once.
+        self.assertEqual(self.storage.save('property_images/house.jpg', io.BytesIO(b'jpeg bytes')), name)
+        self.storage.delete(name)
+        self.assertFalse(self.storage.exists(name))
+        with self.assertRaises(FileNotFoundError):
+            self.storage.open(name)
+
+    def test_urls(self):
+        self.assertEqual(
+            self.storage.url('a.jpg'), 'https://media.s3.example.com/uploads/a.jpg?Expires=3600'
+        )
+        storage = S3Storage(bucket='media', custom_domain='https://cdn.example.com/', client=self.s3)
+        self.assertEqual(storage.url('a.jpg'), 'https://cdn.example.com/a.jpg')
+
+    def test_renditions_written_to_bucket(self):
+        storages = {
+            'default': {'BACKEND': 'core.storage.S3Storage', 'OPTIONS': {'bucket': 'media', 'client': self.s3}},
+            'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+        }
+        seller = User.objects.create_user('seller', role='seller')
+        with override_settings(STORAGES=storages, IMAGE_WORKERS=0):
+            with self.captureOnCommitCallbacks(execute=True):
+                listing = PropertyListing.objects.create(
+                    seller=seller, title='Loft', description='Open plan.', address='3 Dock Road',
+                    num_bedrooms=1, num_bathrooms=1, price=Decimal('150000'), image=jpeg_upload(),
+                )
+            listing.refresh_from_db()
+            self.assertTrue(default_storage.exists(listing.image.name))
+            self.assertTrue(default_storage.exists(listing.renditions['card']['webp']))
+        self.assertEqual(
+            {key for _, key in self.s3.objects},
+            {listing.image.name} | {
+                rendition[key] for rendition in listing.renditions.values() for key in ('webp', 'jpeg')
+            },
+        )
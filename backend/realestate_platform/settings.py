@@ -10,6 +10,9 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
+import sys
+from datetime import timedelta
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -39,14 +42,164 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'core',
     'rest_framework',
+    'rest_framework_simplejwt.token_blacklist',
     'corsheaders',
     'api'
 ]
 
 AUTH_USER_MODEL = 'core.User'
 
+REST_FRAMEWORK = {
+    # Keyset pagination on (created_at, id); see api/pagination.py
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.KeysetPagination',
+    'PAGE_SIZE': 20,
+    # Bearer JWTs for the frontend (api/auth.py); sessions for the browsable API and admin.
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'api.auth.CachedJWTAuthentication',
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    # Reverse proxies in front of Django (1 behind nginx). Clients are told
+    # apart by the address the last of them saw; with 0, REMOTE_ADDR. Left
+    # unset, DRF would key throttles on the client-supplied X-Forwarded-For.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
+}
+
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
+    'REFRESH_TOKEN_LIFETIME': timedelta(days=7),
+    # Every refresh returns a new refresh token and blacklists the old one.
+    'ROTATE_REFRESH_TOKENS': True,
+    'BLACKLIST_AFTER_ROTATION': True,
+    'UPDATE_LAST_LOGIN': False,
+}
+
+# Users resolved from access tokens, cached per process (api/auth.py).
+AUTH_USER_CACHE = {
+    'TIMEOUT': 60,
+    'OPTIONS': {'max_entries': 10000},
+}
+
+TESTING = sys.argv[1:2] == ['test']
+
+# Maximum queries per endpoint (api/instrumentation.py). Over-budget requests
+# are logged, and fail outright under the test runner.
+QUERY_BUDGETS = {
+    'propertylisting.list': 3,
+    'propertylisting.retrieve': 3,
+    'propertylisting.search': 3,
+    'propertylisting.availability': 1,
+    'propertylisting.changes': 3,
+    'propertylisting.similar': 2,
+    'propertylisting.stats': 1,
+    'booking.list': 3,
+    'booking.retrieve': 3,
+    'serviceoffer.list': 3,
+    'serviceoffer.retrieve': 3,
+    'listing-serviceoffer.list': 3,
+    'listing-booking.list': 3,
+    'user-serviceoffer.list': 3,
+    'user-propertylisting.list': 3,
+    'user.list': 3,
+    'user.retrieve': 3,
+    'user.me': 2,
+    'user.stats': 4,
+    # Plus the bearer token's user when it isn't in AUTH_USER_CACHE.
+    'async-listing-list': 2,
+    'async-listing-detail': 2,
+    'async-serviceoffer-list': 2,
+    'async-serviceoffer-detail': 2,
+}
+QUERY_BUDGETS_STRICT = TESTING
+# /api/metrics/ is open to staff sessions and to scrapers sending
+# ``Authorization: Bearer $METRICS_TOKEN``.
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Daily grid of bookable viewing slots (core/availability.py)
+BOOKING_SLOTS = {'start': '09:00', 'end': '17:00', 'minutes': 60}
+
+# Geocoder used by ``manage.py geocode_listings`` (core/geo.py). Nominatim's
+# usage policy asks for an identifying User-Agent and at most 1 request/s.
+GEOCODER = {
+    'BACKEND': 'core.geo.StubGeocoder' if TESTING else 'core.geo.NominatimGeocoder',
+    'OPTIONS': {} if TESTING else {'user_agent': 'realestate-platform/1.0'},
+}
+
+# Background tasks (core/tasks.py), run by ``manage.py run_tasks`` workers.
+# EAGER runs them in-process when their transaction commits instead.
+TASKS = {
+    'EAGER': TESTING,
+    'LEASE': 300,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF': 10,
+    'MAX_BACKOFF': 3600,
+}
+DEFAULT_FROM_EMAIL = os.environ.get('DEFAULT_FROM_EMAIL', 'no-reply@realestate.local')
+
+# Listing change feed (core/changes.py): changes younger than SETTLE_SECONDS
+# wait for the next poll; tombstones of deleted listings are pruned after
+# RETENTION_DAYS by ``manage.py prune_tombstones``.
+LISTING_CHANGES = {
+    'SETTLE_SECONDS': 0 if TESTING else 2,
+    'RETENTION_DAYS': 30,
+    'PAGE_SIZE': 500,
+}
+
+# "Similar listings" vector index (core/similar.py), built by
+# ``manage.py build_similar_index`` and memory-mapped by every process.
+# PATH None disables it (the tests point it at a temporary directory).
+SIMILAR_LISTINGS = {
+    'PATH': None if TESTING else BASE_DIR / 'var' / 'similar',
+    'TEXT_DIMENSIONS': 32,
+    'WEIGHTS': {'price': 2.0, 'bedrooms': 1.0, 'bathrooms': 0.5, 'text': 1.0},
+    'MAX_K': 50,
+}
+
+# Market statistics at /api/listings/stats/ (core/analytics.py), recomputed
+# at most every TTL seconds; bedroom/bathroom counts above the MAX_ values
+# share the top bucket.
+LISTING_ANALYTICS = {
+    'TTL': 0 if TESTING else 300,
+    'PERCENTILES': (10, 25, 50, 75, 90),
+    'MAX_BEDROOMS': 6,
+    'MAX_BATHROOMS': 4,
+    'HISTOGRAM_BINS': 20,
+    'WEEKS': 26,
+}
+
+# Rendered listing responses; see api/cache.py. Set LISTING_CACHE_REDIS_URL
+# (e.g. redis://localhost:6379/1) to share them between processes. Without
+# it each process keeps its own entries and generations, so a write only
+# invalidates the process that handled it: the others serve the old
+# response until TIMEOUT, hence the short one.
+LISTING_CACHE_REDIS_URL = os.environ.get('LISTING_CACHE_REDIS_URL')
+LISTING_CACHE = {
+    'BACKEND': 'api.cache.RedisBackend',
+    'TIMEOUT': 300,
+    # How long concurrent misses wait for another process's render.
+    'LOCK_TIMEOUT': 5,
+    'OPTIONS': {'url': LISTING_CACHE_REDIS_URL},
+} if LISTING_CACHE_REDIS_URL and not TESTING else {
+    'BACKEND': 'api.cache.LocMemBackend',
+    'TIMEOUT': 15,
+    'OPTIONS': {'max_entries': 2048},
+}
+
+# Token buckets for anonymous/authenticated reads of listings and service
+# offers (api/throttling.py). 'api.throttling.RedisBuckets' with OPTIONS
+# {'url': 'redis://...'} shares them between processes.
+READ_THROTTLE = {
+    'BACKEND': 'api.throttling.LocMemBuckets',
+    'RATES': {} if TESTING else {
+        'anon': {'rate': '120/min', 'burst': 60},
+        'user': {'rate': '600/min', 'burst': 120},
+    },
+    'OPTIONS': {'max_entries': 100_000},
+}
+
 
 MIDDLEWARE = [
+    'api.instrumentation.InstrumentationMiddleware',
+    'api.replicas.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -97,9 +250,28 @@ DATABASES = {
         'PASSWORD': '123456789',    # ✅ Your MySQL root password
         'HOST': 'localhost',            # ✅ or '127.0.0.1'
         'PORT': '3306',                 # ✅ default MySQL port
+        # Keep connections open between requests (MySQL has no built-in
+        # pool in Django) and ping them before reuse. asgi.py turns this off:
+        # under ASGI each request's ORM calls run on their own thread.
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# Read replicas, e.g. DB_REPLICA_HOSTS=10.0.0.2,10.0.0.3. Safe-method reads
+# from views with ``replica_reads = True`` go to them (api/replicas.py).
+for i, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    DATABASES[f'replica{i + 1}'] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+REPLICA_DATABASES = [alias for alias in DATABASES if alias != 'default']
+DATABASE_ROUTERS = ['api.replicas.ReplicaRouter']
+# After a write, keep that client's reads on the primary for this long.
+REPLICA_PIN_SECONDS = 5
+
 
 
 
@@ -139,6 +311,31 @@ USE_TZ = True
 
 STATIC_URL = 'static/'
 
+# User uploads (listing images and their renditions)
+
+MEDIA_URL = 'media/'
+MEDIA_ROOT = BASE_DIR / 'media'
+
+# Uploads are saved under content-hashed names (core/storage.py). For S3 or
+# an S3-compatible server, use 'core.storage.S3Storage' with OPTIONS
+# {'bucket': ..., 'endpoint_url': ..., 'custom_domain': ...}.
+STORAGES = {
+    'default': {'BACKEND': 'core.storage.HashedFileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Serving of MEDIA_URL (api/media.py). Behind nginx set OFFLOAD to
+# 'x-accel-redirect' with an internal location at ACCEL_PREFIX aliased to
+# MEDIA_ROOT ('x-sendfile' for Apache/lighttpd); None sends files from Django.
+MEDIA_DELIVERY = {
+    'OFFLOAD': os.environ.get('MEDIA_OFFLOAD') or None,
+    'ACCEL_PREFIX': '/protected-media/',
+    'MAX_AGE': 3600,
+}
+
+# Threads generating listing image renditions (core/images.py); 0 = inline.
+IMAGE_WORKERS = 2
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
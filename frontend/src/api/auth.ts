@@ -3,8 +3,8 @@ import type { User, UserRole } from '../lib/types';
 
 export interface AuthResponse {
   access: string;
-  refresh?: string; // Refresh token might not always be present or used by frontend directly
-  user?: User; // Some endpoints might return user data on login/register
+  refresh?: string; // Rotated on every /token/refresh/
+  user?: User; // Returned by /token/, saving a /users/me/ round trip
 }
 
 export interface LoginCredentials {
@@ -23,16 +23,11 @@ export interface RegisterData {
   role: UserRole; // Or this might be set by default/admin
 }
 
-// Assumes backend uses Simple JWT at /api/token/ for login
+// Simple JWT at /api/token/; the backend accepts either 'username' or 'email'
 export const loginUser = async (credentials: LoginCredentials): Promise<AuthResponse> => {
   try {
-    // Django Simple JWT typically expects 'username' or 'email' and 'password'.
-    // Adjust field names if your backend User model uses email as username field.
-    // For now, assuming 'email' can be sent as 'username' if DRF User model is configured that way,
-    // or that the login serializer handles email. Often, it's just 'username'.
-    // Let's assume the backend login serializer takes 'email' and 'password'.
     const response = await api.post<AuthResponse>('/token/', {
-      email: credentials.email, // Or username: credentials.email if email is the USERNAME_FIELD
+      email: credentials.email,
       password: credentials.password,
     });
     return response.data;
@@ -69,18 +64,14 @@ export const getCurrentUser = async (): Promise<User> => {
   }
 };
 
-// Logout: Simple JWT doesn't have a mandatory server-side logout endpoint by default.
-// Token blacklisting is optional. If implemented, call it here.
-// For now, this function might only be responsible for client-side token removal,
-// handled in AuthContext. If a backend logout endpoint exists (e.g. /api/token/logout/),
-// it can be called here.
-// export const logoutUser = async (): Promise<void> => {
-//   try {
-//     // Example: if you have a blacklist endpoint
-//     // await api.post('/auth/token/logout/', { refresh: localStorage.getItem('refreshToken') });
-//   } catch (error) {
-//     console.error('Logout failed:', error);
-//     // Even if server logout fails, client should clear tokens
-//     throw error;
-//   }
-// };
+// Blacklists the refresh token so it can't mint new access tokens.
+// Access tokens already issued stay valid until they expire (15 minutes).
+export const logoutUser = async (refresh: string): Promise<void> => {
+  try {
+    await api.post('/token/blacklist/', { refresh });
+  } catch (error) {
+    console.error('Logout failed:', error);
+    // Even if server logout fails, client should clear tokens
+    throw error;
+  }
+};
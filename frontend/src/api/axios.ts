@@ -1,5 +1,6 @@
 // frontend/src/api/axios.ts
-import axios from "axios";
+import axios, { AxiosError, InternalAxiosRequestConfig } from "axios";
+import type { Paginated } from "../lib/types";
 
 const BASE_URL = "http://localhost:8000/api"; // adjust if using different host/port
 
@@ -11,4 +12,53 @@ const axiosInstance = axios.create({
   },
 });
 
+// Access tokens are short-lived: on a 401, trade the refresh token for a new
+// pair (the backend rotates it) and replay the request once. Concurrent 401s
+// share one refresh, since a rotated refresh token can't be used twice.
+let refreshing: Promise<string> | null = null;
+
+const refreshAccessToken = async (): Promise<string> => {
+  const refresh = localStorage.getItem('refreshToken');
+  if (!refresh) throw new Error('No refresh token');
+  const { data } = await axios.post<{ access: string; refresh?: string }>(
+    `${BASE_URL}/token/refresh/`, { refresh },
+  );
+  localStorage.setItem('accessToken', data.access);
+  if (data.refresh) localStorage.setItem('refreshToken', data.refresh);
+  axiosInstance.defaults.headers.common['Authorization'] = `Bearer ${data.access}`;
+  return data.access;
+};
+
+axiosInstance.interceptors.response.use(undefined, async (error: AxiosError) => {
+  const config = error.config as (InternalAxiosRequestConfig & { _retried?: boolean }) | undefined;
+  if (error.response?.status !== 401 || !config || config._retried || config.url?.startsWith('/token/')) {
+    throw error;
+  }
+  config._retried = true;
+  try {
+    refreshing = refreshing ?? refreshAccessToken();
+    const access = await refreshing;
+    config.headers['Authorization'] = `Bearer ${access}`;
+  } catch {
+    throw error;
+  } finally {
+    refreshing = null;
+  }
+  return axiosInstance(config);
+});
+
+// Every item of a paginated list: follows `next` (an absolute URL that keeps
+// the query string) until the last page.
+export const getAllPages = async <T>(url: string, params?: Record<string, unknown>): Promise<T[]> => {
+  const items: T[] = [];
+  let response = await axiosInstance.get<Paginated<T>>(url, { params });
+  items.push(...response.data.results);
+  while (response.data.next) {
+    response = await axiosInstance.get<Paginated<T>>(response.data.next);
+    items.push(...response.data.results);
+  }
+  return items;
+};
+
+export const api = axiosInstance;
 export default axiosInstance;
@@ -1,11 +1,12 @@
-import { api } from './axios';
+import { api, getAllPages } from './axios';
 import type { Booking, PropertyListing, User } from '../lib/types';
 
 // Interface for data needed to create a Booking
 // Buyer is automatically set by the backend based on the authenticated user.
 // Property is an ID.
+// A slot that is already taken is rejected with 409 Conflict.
 export interface BookingCreateData {
-  property: number; // ID of the PropertyListing
+  property_id: number; // ID of the PropertyListing
   scheduled_date: string; // YYYY-MM-DD
   scheduled_time: string; // HH:MM:SS or HH:MM
   message?: string;
@@ -23,15 +24,26 @@ export interface BookingUpdateData {
 export const getBookings = async (): Promise<Booking[]> => {
   try {
     // This will fetch bookings based on the backend's get_queryset logic
-    // (e.g., bookings for the current user)
-    const response = await api.get<Booking[]>('/bookings/');
-    return response.data;
+    // (e.g., bookings for the current user). Lists collapse the listing to a
+    // summary by default; the dashboard shows its seller, so expand it.
+    return await getAllPages<Booking>('/bookings/', { expand: 'property' });
   } catch (error) {
     console.error('Failed to fetch bookings:', error);
     throw error;
   }
 };
 
+// Bookings of one listing (GET /api/listings/{id}/bookings/): all of them for
+// its seller, otherwise only the requester's own.
+export const getListingBookings = async (listingId: number): Promise<Booking[]> => {
+  try {
+    return await getAllPages<Booking>(`/listings/${listingId}/bookings/`);
+  } catch (error) {
+    console.error(`Failed to fetch bookings for listing ${listingId}:`, error);
+    throw error;
+  }
+};
+
 // Note: getBookingById might not be needed if users only see their own bookings via getBookings.
 // If admins need to fetch specific bookings, this could be added.
 // export const getBooking = async (id: number): Promise<Booking> => {
@@ -1,5 +1,5 @@
-import { api } from './axios';
-import type { PropertyListing, User } from '../lib/types';
+import { api, getAllPages } from './axios';
+import type { Paginated, PropertyListing, User } from '../lib/types';
 
 // Interface for data needed to create a PropertyListing (excluding seller, which is set by backend)
 export interface PropertyListingCreateData {
@@ -18,16 +18,79 @@ export interface PropertyListingUpdateData extends Partial<PropertyListingCreate
   // Seller cannot be changed via this type, typically managed by backend logic
 }
 
+// The newest page of listings sitewide (use getSellerListings for one seller's)
 export const getListings = async (): Promise<PropertyListing[]> => {
   try {
-    const response = await api.get<PropertyListing[]>('/listings/');
-    return response.data;
+    const response = await api.get<Paginated<PropertyListing>>('/listings/');
+    return response.data.results;
   } catch (error) {
     console.error('Failed to fetch listings:', error);
     throw error;
   }
 };
 
+// All listings of one seller (GET /api/users/{id}/listings/), newest first
+export const getSellerListings = async (sellerId: number): Promise<PropertyListing[]> => {
+  try {
+    return await getAllPages<PropertyListing>(`/users/${sellerId}/listings/`);
+  } catch (error) {
+    console.error(`Failed to fetch listings of seller ${sellerId}:`, error);
+    throw error;
+  }
+};
+
+export interface ListingSearchParams {
+  q?: string;
+  min_price?: number;
+  max_price?: number;
+  min_bedrooms?: number;
+  max_bedrooms?: number;
+  min_bathrooms?: number;
+  max_bathrooms?: number;
+}
+
+export interface FacetBucket {
+  count: number;
+}
+
+export interface ListingSearchResponse extends Paginated<PropertyListing> {
+  facets: {
+    bedrooms: (FacetBucket & { bedrooms: string })[];
+    price: (FacetBucket & { min: string; max: string | null })[];
+  };
+}
+
+// Filtering happens on the server (GET /api/listings/search/)
+export const searchListings = async (params: ListingSearchParams): Promise<ListingSearchResponse> => {
+  try {
+    const response = await api.get<ListingSearchResponse>('/listings/search/', { params });
+    return response.data;
+  } catch (error) {
+    console.error('Failed to search listings:', error);
+    throw error;
+  }
+};
+
+export interface ListingChanges {
+  changes: PropertyListing[];
+  deleted: number[];
+  next: string; // Pass back as `since` on the next poll
+  has_more: boolean;
+}
+
+// Delta sync (GET /api/listings/changes/): listings created, updated or deleted
+// since the token from the previous poll; the whole set without one. A 410
+// means the token expired and the local copy must be rebuilt from scratch.
+export const getListingChanges = async (since?: string): Promise<ListingChanges> => {
+  try {
+    const response = await api.get<ListingChanges>('/listings/changes/', { params: since ? { since } : {} });
+    return response.data;
+  } catch (error) {
+    console.error('Failed to fetch listing changes:', error);
+    throw error;
+  }
+};
+
 export const getProperty = async (id: number): Promise<PropertyListing> => {
   try {
     const response = await api.get<PropertyListing>(`/listings/${id}/`);
@@ -38,6 +101,49 @@ export const getProperty = async (id: number): Promise<PropertyListing> => {
   }
 };
 
+export interface SimilarListingsResponse {
+  property: number;
+  results: PropertyListing[]; // Nearest first, list representation
+}
+
+// Comparable homes by price, rooms and description (GET /api/listings/{id}/similar/)
+export const getSimilarListings = async (id: number, k = 6): Promise<SimilarListingsResponse> => {
+  try {
+    const response = await api.get<SimilarListingsResponse>(`/listings/${id}/similar/`, { params: { k } });
+    return response.data;
+  } catch (error) {
+    console.error(`Failed to fetch listings similar to ${id}:`, error);
+    throw error;
+  }
+};
+
+export type PricePercentiles = Record<string, number>; // "p10", "p25", "p50", ...
+
+export interface ListingStats {
+  count: number;
+  generated_at: string;
+  price: {
+    mean: number | null;
+    percentiles: PricePercentiles;
+    histogram: { edges: number[]; counts: number[]; above: number }; // `above`: past the last edge
+  };
+  // The highest bedroom/bathroom buckets include every larger count.
+  bedrooms: { bedrooms: number; count: number; median_price: number; median_price_per_bedroom: number | null }[];
+  rooms: { bedrooms: number; bathrooms: number; count: number; percentiles: PricePercentiles }[];
+  weekly: { week: string; count: number; median_price: number | null }[]; // Oldest first, weeks start on Monday
+}
+
+// Market statistics over all listings (GET /api/listings/stats/), refreshed every few minutes
+export const getListingStats = async (): Promise<ListingStats> => {
+  try {
+    const response = await api.get<ListingStats>('/listings/stats/');
+    return response.data;
+  } catch (error) {
+    console.error('Failed to fetch listing stats:', error);
+    throw error;
+  }
+};
+
 export const createProperty = async (data: PropertyListingCreateData): Promise<PropertyListing> => {
   try {
     // If data.image is a File, use FormData. Otherwise, send as JSON.
@@ -1,11 +1,11 @@
-import { api } from './axios';
+import { api, getAllPages } from './axios';
 import type { ServiceOffer, PropertyListing, User } from '../lib/types';
 
 // Interface for data needed to create a ServiceOffer
 // service_provider is automatically set by the backend.
-// property is an ID.
+// property_id is the ID of the listing; responses nest it as `property`.
 export interface ServiceOfferCreateData {
-  property: number; // ID of the PropertyListing
+  property_id: number; // ID of the PropertyListing
   title: string;
   description: string;
   // approved status is likely handled by backend, not set on creation by user
@@ -17,19 +17,41 @@ export interface ServiceOfferUpdateData {
   title?: string;
   description?: string;
   approved?: boolean; // Potentially updatable by admin or a specific workflow
-  property?: number; // Usually not changed, but depends on rules
+  property_id?: number; // Usually not changed, but depends on rules
 }
 
 export const getServices = async (): Promise<ServiceOffer[]> => {
   try {
-    const response = await api.get<ServiceOffer[]>('/services/');
-    return response.data;
+    return await getAllPages<ServiceOffer>('/services/');
   } catch (error) {
     console.error('Failed to fetch service offers:', error);
     throw error;
   }
 };
 
+// Offers of one provider (GET /api/users/{id}/services/), optionally only
+// approved or pending ones; served from an index instead of the full list.
+export const getProviderServices = async (providerId: number, approved?: boolean): Promise<ServiceOffer[]> => {
+  try {
+    const params = approved === undefined ? {} : { approved };
+    return await getAllPages<ServiceOffer>(`/users/${providerId}/services/`, params);
+  } catch (error) {
+    console.error(`Failed to fetch service offers of provider ${providerId}:`, error);
+    throw error;
+  }
+};
+
+// Offers made for one listing (GET /api/listings/{id}/services/)
+export const getListingServices = async (listingId: number, approved?: boolean): Promise<ServiceOffer[]> => {
+  try {
+    const params = approved === undefined ? {} : { approved };
+    return await getAllPages<ServiceOffer>(`/listings/${listingId}/services/`, params);
+  } catch (error) {
+    console.error(`Failed to fetch service offers for listing ${listingId}:`, error);
+    throw error;
+  }
+};
+
 export const getService = async (id: number): Promise<ServiceOffer> => {
   try {
     const response = await api.get<ServiceOffer>(`/services/${id}/`);
@@ -1,5 +1,5 @@
-import { api } from './axios'; // Corrected import to use the shared 'api' instance
-import type { User } from '../lib/types';
+import { api, getAllPages } from './axios'; // Corrected import to use the shared 'api' instance
+import type { User, UserStats } from '../lib/types';
 
 // Interface for data that can be used to update a user
 // For user creation, DRF UserViewSet typically expects username, password, email etc.
@@ -26,8 +26,7 @@ export interface UserCreateData {
 
 export const getUsers = async (): Promise<User[]> => {
   try {
-    const response = await api.get<User[]>('/users/');
-    return response.data;
+    return await getAllPages<User>('/users/');
   } catch (error) {
     console.error('Failed to fetch users:', error);
     throw error;
@@ -89,3 +88,16 @@ export const deleteUser = async (id: number): Promise<void> => {
     throw error;
   }
 };
+
+// Dashboard counters for the logged-in user, served from one precomputed row.
+export const getMyStats = async (withListings = false): Promise<UserStats> => {
+  try {
+    const response = await api.get<UserStats>('/users/me/stats/', {
+      params: withListings ? { listings: 1 } : undefined,
+    });
+    return response.data;
+  } catch (error) {
+    console.error('Failed to fetch dashboard stats:', error);
+    throw error;
+  }
+};
@@ -2,7 +2,7 @@
 import React, { createContext, useContext, useState, useEffect, useCallback } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { User, UserRole } from './types';
-import { loginUser, registerUser, getCurrentUser } from '../api/auth'; // Adjusted path
+import { loginUser, logoutUser, registerUser, getCurrentUser } from '../api/auth'; // Adjusted path
 import { api } from '../api/axios'; // For setting auth header
 import { useToast } from "@/components/ui/use-toast";
 
@@ -53,8 +53,8 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
       }
       api.defaults.headers.common['Authorization'] = `Bearer ${data.access}`;
       
-      // Fetch user details after successful token retrieval
-      const currentUser = await getCurrentUser();
+      // The login response carries the user; fetch it only if it doesn't
+      const currentUser = data.user ?? await getCurrentUser();
       setUser(currentUser);
       
       toast({
@@ -82,6 +82,10 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
   };
 
   const logout = () => {
+    const refresh = localStorage.getItem('refreshToken');
+    if (refresh) {
+      logoutUser(refresh).catch(() => undefined);
+    }
     setUser(null);
     localStorage.removeItem('accessToken');
     localStorage.removeItem('refreshToken');
@@ -91,7 +95,6 @@ export const AuthProvider: React.FC<{ children: React.ReactNode }> = ({ children
       description: "You have been successfully logged out.",
     });
     navigate('/login');
-    // Consider calling backend logoutUser() if it exists and handles token blacklisting
   };
 
   const register = async (username: string, email: string, password: string, role: UserRole) => {
@@ -10,26 +10,42 @@ export interface User {
   // Add other fields if they are present in your UserSerializer and needed by frontend
 }
 
+// Compact user rendered inside list responses (the backend's UserSerializer summary)
+export type UserSummary = Pick<User, 'id' | 'username'>;
+
+// Envelope returned by the backend's keyset-paginated list endpoints
+export interface Paginated<T> {
+  next: string | null; // Absolute URL of the next page, or null on the last page
+  previous: string | null;
+  results: T[];
+}
+
 // Represents the PropertyListing structure from the backend
 export interface PropertyListing {
   id: number;
-  seller: User; // Nested User object
+  seller: User | UserSummary; // Full user on detail, summary in lists (unless ?expand=seller)
   title: string;
-  description: string;
+  description?: string; // Left out of list responses; request ?fields=...,description if needed
   address: string;
   image: string | null; // Assuming image can be null and is a URL string
   num_bedrooms: number;
   num_bathrooms: number;
   price: string; // Django DecimalField often comes as string
+  latitude: string | null; // Decimal string; null until the listing is geocoded
+  longitude: string | null;
   created_at: string; // DateTimeField comes as string
+  updated_at?: string; // Detail responses only
   // Add other fields if present in your PropertyListingSerializer
 }
 
+// Compact listing rendered inside list responses of bookings and service offers
+export type PropertyListingSummary = Pick<PropertyListing, 'id' | 'title' | 'address' | 'image' | 'price'>;
+
 // Represents the Booking structure from the backend
 export interface Booking {
   id: number;
-  buyer: User; // Nested User object
-  property: PropertyListing; // Nested PropertyListing object
+  buyer: User | UserSummary; // Summary in lists
+  property: PropertyListing & { seller: User }; // Full listing; lists are fetched with ?expand=property
   scheduled_date: string; // DateField
   scheduled_time: string; // TimeField
   message?: string | null;
@@ -39,14 +55,36 @@ export interface Booking {
 // Represents the ServiceOffer structure from the backend
 export interface ServiceOffer {
   id: number;
-  service_provider: User; // Nested User object for the provider
-  property: PropertyListing; // Nested PropertyListing object
+  service_provider: User | UserSummary; // Summary in lists
+  property: PropertyListing | PropertyListingSummary; // Summary in lists
   title: string;
   description: string;
   approved: boolean;
   created_at: string; // DateTimeField
 }
 
+// Dashboard counters from /api/users/me/stats/
+export interface ListingStats {
+  id: number;
+  title: string;
+  bookings: number;
+  offers: number;
+  offers_approved: number;
+}
+
+export interface UserStats {
+  listings: number; // As a seller
+  bookings_received: number;
+  offers_received: number;
+  bookings_made: number; // As a buyer
+  offers: number; // As a service provider
+  offers_approved: number;
+  offers_pending: number;
+  properties_served: number;
+  updated_at: string;
+  by_listing?: ListingStats[]; // Only with ?listings=1
+}
+
 export interface BundledOffer {
   propertyId: string;
   offerId: string;
@@ -3,8 +3,7 @@ import React, { useState, useEffect, useMemo } from "react";
 import { useQuery } from "@tanstack/react-query";
 import { MainLayout } from "@/components/layout/MainLayout";
 import { PropertyCard } from "@/components/properties/PropertyCard";
-import { getListings } from "@/api/listings";
-import type { PropertyListing } from "@/lib/types";
+import { searchListings } from "@/api/listings";
 import { Input } from "@/components/ui/input";
 import { Label } from "@/components/ui/label";
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from "@/components/ui/select";
@@ -71,30 +70,21 @@ const PropertiesPage = () => {
     setActiveFilters([]);
   };
 
-  const { data: allProperties, isLoading, isError, error } = useQuery<PropertyListing[], Error>({
-    queryKey: ['listings'],
-    queryFn: getListings,
+  // Filtering is done server-side by /api/listings/search/
+  const searchParams = {
+    q: searchTerm || undefined,
+    min_price: priceRange[0] > 0 ? priceRange[0] : undefined,
+    max_price: priceRange[1] < 1500000 ? priceRange[1] : undefined,
+    min_bedrooms: bedrooms ? parseInt(bedrooms) : undefined,
+    max_bedrooms: bedrooms ? parseInt(bedrooms) : undefined,
+  };
+
+  const { data: searchResults, isLoading, isError, error } = useQuery({
+    queryKey: ['listings', 'search', searchParams],
+    queryFn: () => searchListings(searchParams),
   });
 
-  // Filter properties based on search criteria
-  const filteredProperties = useMemo(() => {
-    if (!allProperties) return [];
-    return allProperties.filter((property) => {
-      const matchesSearch =
-        property.title.toLowerCase().includes(searchTerm.toLowerCase()) ||
-        property.address.toLowerCase().includes(searchTerm.toLowerCase()) || // Changed location to address
-        property.description.toLowerCase().includes(searchTerm.toLowerCase());
-        
-      const propertyPrice = parseFloat(property.price); // Parse price string
-      const matchesPrice = 
-        propertyPrice >= priceRange[0] && propertyPrice <= priceRange[1];
-        
-      const matchesBedrooms = 
-        !bedrooms || property.num_bedrooms === parseInt(bedrooms); // Changed bedrooms to num_bedrooms
-        
-      return matchesSearch && matchesPrice && matchesBedrooms;
-    });
-  }, [allProperties, searchTerm, priceRange, bedrooms]);
+  const filteredProperties = useMemo(() => searchResults?.results ?? [], [searchResults]);
 
   // Sort properties
   const sortedProperties = useMemo(() => {
@@ -3,7 +3,7 @@ import React, { useState } from "react";
 import { useParams, Link } from "react-router-dom";
 import { useQuery } from "@tanstack/react-query";
 import { MainLayout } from "@/components/layout/MainLayout";
-import { getProperty } from "@/api/listings";
+import { getProperty, getSimilarListings } from "@/api/listings";
 import type { PropertyListing } from "@/lib/types";
 // import { ServiceCard } from "@/components/services/ServiceCard"; // ServiceCard might be unused if bundledOffers are removed
 import { formatCurrency } from "@/lib/utils";
@@ -31,6 +31,14 @@ const PropertyDetail = () => {
     enabled: !!id, // Only run query if id is available
   });
 
+  // Optional: the section is simply left out if the index isn't available.
+  const { data: similar } = useQuery({
+    queryKey: ['property', id, 'similar'],
+    queryFn: () => getSimilarListings(Number(id)),
+    enabled: !!id,
+    retry: false,
+  });
+
   if (isLoading) {
     return (
       <MainLayout>
@@ -190,6 +198,31 @@ const PropertyDetail = () => {
                 </TabsContent>
                 */}
               </Tabs>
+
+              {similar && similar.results.length > 0 && (
+                <div className="mt-8">
+                  <h2 className="text-xl font-semibold mb-4">Similar homes</h2>
+                  <div className="grid grid-cols-1 sm:grid-cols-2 gap-4">
+                    {similar.results.map((listing) => (
+                      <Link key={listing.id} to={`/properties/${listing.id}`}>
+                        <Card className="h-full hover:shadow-md transition-shadow">
+                          <CardContent className="p-4 space-y-1">
+                            <p className="font-medium">{listing.title}</p>
+                            <p className="text-sm text-muted-foreground">{listing.address}</p>
+                            <div className="flex items-center justify-between text-sm">
+                              <span className="flex items-center gap-3 text-muted-foreground">
+                                <span className="flex items-center gap-1"><Bed className="h-4 w-4" />{listing.num_bedrooms}</span>
+                                <span className="flex items-center gap-1"><Bath className="h-4 w-4" />{listing.num_bathrooms}</span>
+                              </span>
+                              <span className="font-semibold text-estate-600">{formatCurrency(parseFloat(listing.price))}</span>
+                            </div>
+                          </CardContent>
+                        </Card>
+                      </Link>
+                    ))}
+                  </div>
+                </div>
+              )}
             </div>
           </div>
 
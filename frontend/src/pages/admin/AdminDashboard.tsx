@@ -3,7 +3,7 @@ import { useQuery } from "@tanstack/react-query";
 import { DashboardLayout } from "@/components/layout/DashboardLayout";
 import { Link } from "react-router-dom";
 import { getUsers } from "@/api/users";
-import { getListings } from "@/api/listings";
+import { getListings, getListingStats } from "@/api/listings";
 import { getServices } from "@/api/services";
 import type { User, PropertyListing, ServiceOffer } from "@/lib/types";
 import { Button } from "@/components/ui/button";
@@ -40,6 +40,11 @@ const AdminDashboard = () => {
     queryKey: ['listingsAdmin'],
     queryFn: getListings,
   });
+  // Totals over every listing; propertiesData is only the newest page.
+  const { data: listingStats } = useQuery({
+    queryKey: ['listingStatsAdmin'],
+    queryFn: getListingStats,
+  });
   const { data: servicesData, isLoading: isLoadingServices } = useQuery<ServiceOffer[], Error>({
     queryKey: ['servicesAdmin'],
     queryFn: getServices,
@@ -62,10 +67,7 @@ const AdminDashboard = () => {
     return [...servicesData].sort((a, b) => new Date(b.created_at).getTime() - new Date(a.created_at).getTime()).slice(0, 3);
   }, [servicesData]);
   
-  const totalPropertyValue = useMemo(() => {
-    if (!propertiesData) return 0;
-    return propertiesData.reduce((sum, property) => sum + parseFloat(property.price), 0);
-  }, [propertiesData]);
+  const totalPropertyValue = listingStats ? (listingStats.price.mean ?? 0) * listingStats.count : 0;
 
   // AI Usage and Contact Requests related mock data removed or will be marked as mock
   const aiContents: any[] = []; // Mock data for sections not being updated
@@ -270,7 +272,7 @@ const AdminDashboard = () => {
                       <CardDescription>Listed on platform</CardDescription>
                     </CardHeader>
                     <CardContent>
-                      {isLoadingProperties ? <Loader2 className="h-6 w-6 animate-spin" /> : <div className="text-3xl font-bold text-estate-600">{propertiesData?.length || 0}</div>}
+                      {isLoadingProperties ? <Loader2 className="h-6 w-6 animate-spin" /> : <div className="text-3xl font-bold text-estate-600">{listingStats?.count ?? propertiesData?.length ?? 0}</div>}
                       <p className="text-sm text-muted-foreground flex items-center mt-1">
                         <ArrowUp className="h-4 w-4 mr-1 text-green-600" />
                         <span className="text-green-600 font-medium">8%</span> from last month
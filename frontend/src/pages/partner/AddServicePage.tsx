@@ -36,8 +36,11 @@ const AddServicePage = () => {
   );
 
   const handleSubmit = async (formData: ServiceFormValues) => {
-    // ServiceFormValues matches ServiceOfferCreateData if property is property_id
-    mutate(formData as ServiceOfferCreateData);
+    mutate({
+      title: formData.title,
+      description: formData.description,
+      property_id: formData.property,
+    });
   };
 
   return (
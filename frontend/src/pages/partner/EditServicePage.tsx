@@ -53,7 +53,7 @@ const EditServicePage = () => {
     const updateData: ServiceOfferUpdateData = { 
         title: formData.title,
         description: formData.description,
-        property: formData.property, // Property ID
+        property_id: formData.property,
         approved: formData.approved,
     };
     updateMutate(updateData);
@@ -3,8 +3,9 @@ import React, { useMemo } from "react";
 import { useQuery } from "@tanstack/react-query";
 import { DashboardLayout } from "@/components/layout/DashboardLayout";
 import { Link } from "react-router-dom";
-import { getServices } from "@/api/services";
-import type { ServiceOffer, PropertyListing } from "@/lib/types";
+import { getProviderServices } from "@/api/services";
+import { getMyStats } from "@/api/users";
+import type { ServiceOffer, PropertyListing, UserStats } from "@/lib/types";
 import { useAuth } from "@/hooks/useAuth";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { Button } from "@/components/ui/button";
@@ -20,15 +21,24 @@ const PartnerDashboard = () => {
   const { toast } = useToast();
   const queryClient = useQueryClient();
 
-  const { data: allServices, isLoading: isLoadingServices, isError: isErrorServices, error: servicesError } = useQuery<ServiceOffer[], Error>({
-    queryKey: ['allServicesForPartnerDashboard'],
-    queryFn: getServices,
+  // Only this provider's offers, via /api/users/{id}/services/.
+  const { data: myServices = [], isLoading: isLoadingServices, isError: isErrorServices, error: servicesError } = useQuery<ServiceOffer[], Error>({
+    queryKey: ['allServicesForPartnerDashboard', user?.id],
+    queryFn: () => getProviderServices(user!.id),
+    enabled: !!user,
+  });
+
+  // Counters come precomputed from the backend; no need to count client-side.
+  const { data: stats, isLoading: isLoadingStats } = useQuery<UserStats, Error>({
+    queryKey: ['myStats'],
+    queryFn: () => getMyStats(),
   });
 
   const deleteServiceMutation = useMutation(deleteService, {
     onSuccess: () => {
       toast({ title: 'Service Offer Deleted', description: 'The service offer has been successfully deleted.' });
       queryClient.invalidateQueries(['allServicesForPartnerDashboard']);
+      queryClient.invalidateQueries(['myStats']);
       queryClient.invalidateQueries(['servicesAdmin']); // For admin dashboard
     },
     onError: (error: any) => {
@@ -46,11 +56,6 @@ const PartnerDashboard = () => {
     }
   };
 
-  const myServices = useMemo(() => {
-    if (!allServices || !user) return [];
-    return allServices.filter(service => service.service_provider.id === user.id);
-  }, [allServices, user]);
-
   const propertiesWithMyServices = useMemo(() => {
     if (!myServices) return [];
     const propertyMap = new Map<number, PropertyListing>();
@@ -79,7 +84,7 @@ const PartnerDashboard = () => {
               <CardDescription>Total service offerings</CardDescription>
             </CardHeader>
             <CardContent>
-              {isLoadingServices ? <Loader2 className="h-6 w-6 animate-spin" /> : <div className="text-3xl font-bold text-estate-600">{myServices.length}</div>}
+              {isLoadingStats ? <Loader2 className="h-6 w-6 animate-spin" /> : <div className="text-3xl font-bold text-estate-600">{stats?.offers ?? 0}</div>}
             </CardContent>
           </Card>
           <Card>
@@ -88,7 +93,7 @@ const PartnerDashboard = () => {
               <CardDescription>Unique properties using your services</CardDescription>
             </CardHeader>
             <CardContent>
-              {isLoadingServices ? <Loader2 className="h-6 w-6 animate-spin" /> : <div className="text-3xl font-bold text-estate-600">{propertiesWithMyServices.length}</div>}
+              {isLoadingStats ? <Loader2 className="h-6 w-6 animate-spin" /> : <div className="text-3xl font-bold text-estate-600">{stats?.properties_served ?? 0}</div>}
             </CardContent>
           </Card>
           {/* Potential Revenue card removed */}
@@ -99,9 +104,9 @@ const PartnerDashboard = () => {
                 <CardDescription>Services awaiting approval</CardDescription>
             </CardHeader>
             <CardContent>
-                {isLoadingServices ? <Loader2 className="h-6 w-6 animate-spin" /> : 
+                {isLoadingStats ? <Loader2 className="h-6 w-6 animate-spin" /> : 
                     <div className="text-3xl font-bold text-estate-600">
-                        {myServices.filter(s => !s.approved).length}
+                        {stats?.offers_pending ?? 0}
                     </div>
                 }
             </CardContent>
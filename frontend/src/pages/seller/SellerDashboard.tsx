@@ -2,8 +2,9 @@ import React, { useState, useMemo } from "react";
 import { useQuery } from "@tanstack/react-query";
 import { DashboardLayout } from "@/components/layout/DashboardLayout";
 import { Link } from "react-router-dom";
-import { getListings } from "@/api/listings";
-import type { PropertyListing } from "@/lib/types";
+import { getSellerListings } from "@/api/listings";
+import { getMyStats } from "@/api/users";
+import type { PropertyListing, UserStats } from "@/lib/types";
 import { useAuth } from "@/hooks/useAuth";
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from "@/components/ui/card";
 import { formatDate, formatCurrency } from "@/lib/utils";
@@ -24,15 +25,17 @@ const SellerDashboard = () => {
   const { toast } = useToast(); 
   const queryClient = useQueryClient(); 
 
-  const { data: allProperties, isLoading: isLoadingProperties, isError: isErrorProperties, error: propertiesError } = useQuery<PropertyListing[], Error>({
-    queryKey: ['allListingsForSellerDashboard'], 
-    queryFn: getListings,
+  const { data: myProperties = [], isLoading: isLoadingProperties, isError: isErrorProperties, error: propertiesError } = useQuery<PropertyListing[], Error>({
+    queryKey: ['sellerListings', user?.id],
+    queryFn: () => getSellerListings(user!.id),
+    enabled: !!user,
   });
 
-  const myProperties = useMemo(() => {
-    if (!allProperties || !user) return [];
-    return allProperties.filter(property => property.seller.id === user.id);
-  }, [allProperties, user]);
+  // Counters come precomputed from the backend; no need to count client-side.
+  const { data: stats, isLoading: isLoadingStats } = useQuery<UserStats, Error>({
+    queryKey: ['myStats'],
+    queryFn: () => getMyStats(),
+  });
 
   // Placeholder for inquiries - will be removed or refactored if API becomes available
   const myRequests: any[] = []; // Empty array for now
@@ -127,7 +130,8 @@ const SellerDashboard = () => {
   const deleteMutation = useMutation(deleteProperty, {
     onSuccess: () => {
       toast({ title: 'Property Deleted', description: 'The property has been successfully deleted.' });
-      queryClient.invalidateQueries(['allListingsForSellerDashboard']);
+      queryClient.invalidateQueries(['sellerListings']);
+      queryClient.invalidateQueries(['myStats']);
       queryClient.invalidateQueries(['listings']); // Invalidate public listings too
     },
     onError: (error: any) => {
@@ -174,7 +178,7 @@ const SellerDashboard = () => {
                 <CardDescription>Total active listings</CardDescription>
               </CardHeader>
               <CardContent>
-                {isLoadingProperties ? <Loader2 className="h-6 w-6 animate-spin" /> : <div className="text-3xl font-bold text-estate-600">{myProperties.length}</div>}
+                {isLoadingStats ? <Loader2 className="h-6 w-6 animate-spin" /> : <div className="text-3xl font-bold text-estate-600">{stats?.listings ?? 0}</div>}
                 <div className="text-sm text-muted-foreground mt-1">
                   <span className="inline-flex items-center text-green-600">
                     <TrendingUp className="h-3 w-3 mr-1" />
@@ -191,11 +195,10 @@ const SellerDashboard = () => {
                   <CardTitle className="text-lg">Inquiries</CardTitle>
                   <MessageSquare className="h-4 w-4 text-estate-600" />
                 </div>
-                <CardDescription>Contact requests</CardDescription>
+                <CardDescription>Viewing requests</CardDescription>
               </CardHeader>
               <CardContent>
-                {/* Inquiries data removed for now */}
-                <div className="text-3xl font-bold text-estate-600">N/A</div>
+                {isLoadingStats ? <Loader2 className="h-6 w-6 animate-spin" /> : <div className="text-3xl font-bold text-estate-600">{stats?.bookings_received ?? 0}</div>}
                 <div className="text-sm text-muted-foreground mt-1">
                   <span className="inline-flex items-center text-green-600">
                     <TrendingUp className="h-3 w-3 mr-1" />